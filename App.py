@@ -1,10 +1,5 @@
 import streamlit as st
-import datetime
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
+from quote_store import get_store
 
 # ------------------------------
 # SESSION STATE SETUP
@@ -15,10 +10,6 @@ if "logged_in" not in st.session_state:
     st.session_state["logged_in"] = False
 if "current_user" not in st.session_state:
     st.session_state["current_user"] = None
-if "quotes" not in st.session_state:
-    st.session_state["quotes"] = []
-if "quote_counter" not in st.session_state:
-    st.session_state["quote_counter"] = 1
 
 # ------------------------------
 # LOGIN / REGISTER MOCKUP
@@ -29,7 +20,7 @@ def login_screen():
     with tab1:
         st.subheader("Login to your account")
         email = st.text_input("Email")
-        password = st.text_input("Password", type="password")
+        password = st.text_input("Password", type="password", key="login_password")
         if st.button("Login"):
             if email in st.session_state["users"] and st.session_state["users"][email] == password:
                 st.session_state["logged_in"] = True
@@ -41,7 +32,7 @@ def login_screen():
     with tab2:
         st.subheader("Create a new account")
         new_email = st.text_input("Justice Email (must end with @justice.gov.uk)")
-        new_password = st.text_input("Password", type="password")
+        new_password = st.text_input("Password", type="password", key="register_password")
         if st.button("Register"):
             if not new_email.endswith("@justice.gov.uk"):
                 st.error("Only @justice.gov.uk emails are allowed")
@@ -55,63 +46,64 @@ def login_screen():
 # PDF GENERATION
 # ------------------------------
 def generate_pdf(quote_num, region, prison, customer, workshop_mode, breakdown, production_results, supervisor_justification):
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # Header GOV.UK style
-    c.setFillColor(colors.HexColor("#005ea5"))  # Blue
-    c.rect(0, height-40, width, 40, fill=True, stroke=False)
-    c.setFillColor(colors.white)
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(10*mm, height-30, "Ministry of Justice - Official Prison Workshop Quote")
+    from pdf_export import quote_pdf_bytes   # reportlab is only loaded when a PDF is exported
+    rows = None
+    if production_results:
+        rows = (
+            (item, f"£{v['Unit cost']}", v["Max units/month"], v["Min units/month to cover costs"])
+            for item, v in production_results.items()
+        )
+    return quote_pdf_bytes(
+        quote_num=quote_num, region=region, prison=prison, customer=customer, workshop_mode=workshop_mode,
+        breakdown=breakdown, supervisor_justification=supervisor_justification,
+        production_headers=["Item", "Unit Cost", "Max Units/Month", "Min Units/Month"], production_rows=rows,
+    )
 
-    c.setFont("Helvetica-Bold", 12)
-    c.setFillColor(colors.black)
-    c.drawString(10*mm, height-60, f"Quote Number: {quote_num}")
-    c.drawString(10*mm, height-75, f"Date: {datetime.date.today()}")
-    c.drawString(10*mm, height-90, f"Prison: {prison}")
-    c.drawString(10*mm, height-105, f"Region: {region}")
-    c.drawString(10*mm, height-120, f"Customer: {customer}")
-    c.drawString(10*mm, height-135, f"Workshop Mode: {workshop_mode}")
+# ------------------------------
+# MY QUOTES (paginated history)
+# ------------------------------
+QUOTES_PAGE_SIZE = 20
 
-    y = height - 160
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(10*mm, y, "Cost Breakdown:")
-    y -= 15
-    c.setFont("Helvetica", 10)
-    for k, v in breakdown.items():
-        c.drawString(15*mm, y, f"{k}: £{v:,.2f}")
-        y -= 12
+@st.cache_data(max_entries=256, show_spinner=False)
+def _quotes_page(user, filters, before_id, version):
+    # `version` (latest quote id) makes new quotes invalidate cached pages
+    return get_store().list_quotes(user, limit=QUOTES_PAGE_SIZE + 1, before_id=before_id, **dict(filters))
 
-    if supervisor_justification:
-        y -= 5
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(10*mm, y, "Supervisor Justification:")
-        y -= 12
-        c.setFont("Helvetica", 10)
-        c.drawString(15*mm, y, supervisor_justification)
-        y -= 15
+def my_quotes_view(user):
+    st.subheader("My Quotes")
+    c1, c2, c3 = st.columns(3)
+    prison_f = c1.text_input("Prison", key="mq_prison").strip()
+    region_f = c2.selectbox("Region", ["", "National", "Inner London", "Outer London"], key="mq_region")
+    customer_f = c3.text_input("Customer starts with", key="mq_customer").strip()
+    d1, d2 = st.columns(2)
+    date_from = d1.date_input("From", value=None, key="mq_from")
+    date_to = d2.date_input("To", value=None, key="mq_to")
+    filters = tuple(sorted({
+        "prison": prison_f or None, "region": region_f or None, "customer": customer_f or None,
+        "date_from": date_from, "date_to": date_to,
+    }.items()))
 
-    if production_results:
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(10*mm, y, "Production Details:")
-        y -= 15
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(15*mm, y, "Item | Unit Cost | Max Units/Month | Min Units/Month")
-        y -= 12
-        c.setFont("Helvetica", 10)
-        for item, v in production_results.items():
-            line = f"{item} | £{v['Unit cost']} | {v['Max units/month']} | {v['Min units/month to cover costs']}"
-            c.drawString(15*mm, y, line)
-            y -= 12
+    # Keyset pages: a stack of before_id cursors, reset whenever the filters change
+    if st.session_state.get("mq_filters") != filters:
+        st.session_state["mq_filters"] = filters
+        st.session_state["mq_cursors"] = [None]
+    cursors = st.session_state["mq_cursors"]
+    rows = _quotes_page(user, filters, cursors[-1], get_store().latest_id())
+    has_next = len(rows) > QUOTES_PAGE_SIZE
+    rows = rows[:QUOTES_PAGE_SIZE]
 
-    c.setFont("Helvetica-Oblique", 8)
-    c.drawString(10*mm, 15*mm, "Official – Ministry of Justice")
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
+    if not rows:
+        st.info("No quotes yet." if len(cursors) == 1 and not any(v for _, v in filters) else "No quotes match these filters.")
+        return
+    st.dataframe(
+        [{"Quote": q["quote_num"], "Prison": q["prison"], "Region": q["region"], "Customer": q["customer"],
+          "Total (£)": f"£{q['total']:,.2f}", "Date": q["created"]} for q in rows],
+        hide_index=True,
+    )
+    p1, p2, p3 = st.columns([1, 1, 2])
+    p1.button("◀ Newer", disabled=len(cursors) == 1, key="mq_prev", on_click=cursors.pop)
+    p2.button("Older ▶", disabled=not has_next, key="mq_next", on_click=cursors.append, args=(rows[-1]["id"],))
+    p3.caption(f"Page {len(cursors)}")
 
 # ------------------------------
 # START COSTING TOOL
@@ -245,22 +237,24 @@ def costing_tool():
                     }
 
             # Generate PDF
-            quote_num = f"HMPPS{st.session_state['quote_counter']:04d}"
-            st.session_state["quote_counter"] += 1
+            store = get_store()
+            quote_num = store.next_quote_number()
             pdf_buffer = generate_pdf(
                 quote_num, region, prison_name, customer_name, workshop_mode, breakdown,
                 production_results, supervisor_justification
             )
 
-            # Save quote in session
-            st.session_state["quotes"].append({
-                "quote_num": quote_num,
-                "region": region,
-                "prison": prison_name,
-                "customer": customer_name,
-                "total": total,
-                "date": datetime.date.today()
-            })
+            # Save quote to the shared store
+            store.add_quote(
+                quote_num=quote_num,
+                user=st.session_state["current_user"],
+                region=region,
+                prison=prison_name,
+                customer=customer_name,
+                workshop_mode=workshop_mode,
+                total=total,
+                payload={"breakdown": breakdown, "production_results": production_results},
+            )
 
             # MOCK EMAIL SEND
             st.success(f"Quote {quote_num} generated and would be emailed to customer with CC Dan.smith1@justice.gov.uk ✅")
@@ -274,12 +268,7 @@ def costing_tool():
     # ------------------------------
     # MY QUOTES
     # ------------------------------
-    st.subheader("My Quotes")
-    if len(st.session_state["quotes"]) == 0:
-        st.info("No quotes yet.")
-    else:
-        for q in st.session_state["quotes"]:
-            st.write(f"📌 {q['quote_num']} | {q['prison']} | {q['region']} | £{q['total']:,.2f} | {q['date']}")
+    my_quotes_view(st.session_state["current_user"])
 
 # ------------------------------
 # MAIN APP
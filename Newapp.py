@@ -4,22 +4,26 @@
 # - Contractual supports “Maximum units from capacity” and “Target units/week”.
 # - VAT: always 20% (no checkbox); always show ex VAT and inc VAT prices.
 # - Development charge does not apply to Another Government Department.
+from __future__ import annotations
 
-from io import BytesIO
+from io import BytesIO, StringIO
 from datetime import date
-import pandas as pd
+from typing import TYPE_CHECKING
 import streamlit as st
 
 from config import CFG
 from style import inject_govuk_css
-from tariff import PRISON_TO_REGION, SUPERVISOR_PAY
+from tariff import PRISON_TO_REGION, SUPERVISOR_PAY, tariffs_from_state
 from sidebar import draw_sidebar
-from production import (
-    labour_minutes_budget,
-    calculate_production_contractual,
-    calculate_adhoc,
-)
-from host import generate_host_quote
+import tracing
+
+# Pricing engines, numpy/pandas and the table renderer are imported where first used,
+# so the first paint (inputs + sidebar) never waits for them (see coldstart.py).
+if TYPE_CHECKING:
+    import pandas as pd
+
+# One span report per rerun; no-ops unless COSTING_TRACE is set (see tracing.py)
+tracing.begin_run("rerun")
 
 # -----------------------------------------------------------------------------
 # Page config + CSS
@@ -35,51 +39,26 @@ st.markdown("## Cost and Price Calculator")
 # -----------------------------------------------------------------------------
 # Helpers: formatting + HTML export
 # -----------------------------------------------------------------------------
-def _currency(v) -> str:
-    try:
-        return f"£{float(v):,.2f}"
-    except Exception:
-        return ""
-
 def render_host_df_to_html(host_df: pd.DataFrame) -> str:
-    rows_html = []
-    for _, row in host_df.iterrows():
-        item = str(row["Item"])
-        val = row["Amount (£)"]
-        neg_cls = ""
-        try:
-            neg_cls = " class='neg'" if float(val) < 0 else ""
-        except Exception:
-            pass
-        grand_cls = " class='grand'" if "Grand Total" in item else ""
-        rows_html.append(f"<tr{grand_cls}><td>{item}</td><td{neg_cls}>{_currency(val)}</td></tr>")
-    header = "<tr><th>Item</th><th>Amount (£)</th></tr>"
-    return f"<table>{header}{''.join(rows_html)}</table>"
+    from render import render_host_table
+    return render_host_table(host_df)
 
 def render_generic_df_to_html(df: pd.DataFrame) -> str:
-    cols = list(df.columns)
-    thead = "<tr>" + "".join([f"<th>{c}</th>" for c in cols]) + "</tr>"
-    body_rows = []
-    for _, row in df.iterrows():
-        tds = []
-        for col in cols:
-            val = row[col]
-            if isinstance(val, (int, float)) and pd.notna(val):
-                tds.append(f"<td>{_currency(val) if '£' in col else f'{float(val):,.2f}'}</td>")
-            else:
-                tds.append(f"<td>{val}</td>")
-        body_rows.append("<tr>" + "".join(tds) + "</tr>")
-    return f"<table>{thead}{''.join(body_rows)}</table>"
+    from render import render_table
+    return render_table(df)
 
+@tracing.traced("export.csv")
 def export_csv_bytes(df: pd.DataFrame) -> BytesIO:
     b = BytesIO()
     df.to_csv(b, index=False)
     b.seek(0)
     return b
 
+@tracing.traced("export.html_download")
 def export_html(host_df: pd.DataFrame | None,
                 prod_df: pd.DataFrame | None,
                 title: str = "Quote") -> BytesIO:
+    from render import write_host_table, write_table
     css = """
       <style>
         body{font-family:Arial,Helvetica,sans-serif;color:#0b0c0c;}
@@ -94,25 +73,26 @@ def export_html(host_df: pd.DataFrame | None,
             f"Customer: {st.session_state.get('customer_name','')}<br/>"
             f"Prison: {st.session_state.get('prison_choice','')}<br/>"
             f"Region: {st.session_state.get('region','')}</p>")
-    parts = [css, header_html, meta]
-    if host_df is not None:
-        parts += ["<h3>Host Costs</h3>", render_host_df_to_html(host_df)]
-    if prod_df is not None:
-        section_title = "Ad‑hoc Items" if "Ad‑hoc" in str(title) else "Production Items"
-        parts += [f"<h3>{section_title}</h3>", render_generic_df_to_html(prod_df)]
-    parts.append("<p>Prices are indicative and may change based on final scope and site conditions.</p>")
-
-    html_doc = f"""<!doctype html>
+    out = StringIO()
+    out.write(f"""<!doctype html>
 <html lang="en">
 <head>
 <meta charset="utf-8" />
 <title>{title}</title>
 </head>
 <body>
-{''.join(parts)}
-</body>
-</html>"""
-    b = BytesIO(html_doc.encode("utf-8"))
+""")
+    out.write(css + header_html + meta)
+    if host_df is not None:
+        out.write("<h3>Host Costs</h3>")
+        write_host_table(host_df, out)
+    if prod_df is not None:
+        section_title = "Ad‑hoc Items" if "Ad‑hoc" in str(title) else "Production Items"
+        out.write(f"<h3>{section_title}</h3>")
+        write_table(prod_df, out)
+    out.write("<p>Prices are indicative and may change based on final scope and site conditions.</p>")
+    out.write("\n</body>\n</html>")
+    b = BytesIO(out.getvalue().encode("utf-8"))
     b.seek(0)
     return b
 
@@ -120,7 +100,24 @@ def export_html(host_df: pd.DataFrame | None,
 # -----------------------------------------------------------------------------
 # Base inputs
 # -----------------------------------------------------------------------------
-prisons_sorted = ["Select"] + sorted(PRISON_TO_REGION.keys())
+@st.cache_resource
+def _static_options():
+    # Built once per process: dropdown lists and lookups that never change between reruns
+    size_map = {"Small (500 ft²)": 500, "Medium (2,500 ft²)": 2500, "Large (5,000 ft²)": 5000}
+    return {
+        "prisons": ["Select"] + sorted(PRISON_TO_REGION.keys()),
+        "size_labels": ["Select", *size_map, "Enter dimensions in ft"],
+        "size_map": size_map,
+        # region -> (instructor titles, {title: avg_total})
+        "titles": {
+            r: ([t["title"] for t in rows], {t["title"]: float(t["avg_total"]) for t in rows})
+            for r, rows in SUPERVISOR_PAY.items()
+        },
+    }
+
+_trace = tracing.start("widgets.quote_inputs")
+STATIC = _static_options()
+prisons_sorted = STATIC["prisons"]
 prison_choice = st.selectbox("Prison Name", prisons_sorted, index=0, key="prison_choice")
 region = PRISON_TO_REGION.get(prison_choice, "Select") if prison_choice != "Select" else "Select"
 st.session_state["region"] = region
@@ -130,8 +127,8 @@ customer_name = st.text_input("Customer Name", key="customer_name")
 workshop_mode = st.selectbox("Contract type?", ["Select", "Host", "Production"], key="workshop_mode")
 
 # Workshop size (ft²)
-size_labels = ["Select", "Small (500 ft²)", "Medium (2,500 ft²)", "Large (5,000 ft²)", "Enter dimensions in ft"]
-size_map = {"Small (500 ft²)": 500, "Medium (2,500 ft²)": 2500, "Large (5,000 ft²)": 5000}
+size_labels = STATIC["size_labels"]
+size_map = STATIC["size_map"]
 workshop_size = st.selectbox("Workshop size (sq ft)?", size_labels, key="workshop_size")
 if workshop_size == "Enter dimensions in ft":
     width = st.number_input("Width (ft)", min_value=0.0, format="%.2f", key="width")
@@ -169,9 +166,13 @@ workshop_usage = st.radio(
 )
 USAGE_KEY = ("low" if "Low" in workshop_usage else "medium" if "Medium" in workshop_usage else "high")
 
+tracing.stop(_trace)
+
 # Tariffs/overheads sidebar
-draw_sidebar(USAGE_KEY)
+with tracing.span("widgets.sidebar"):
+    draw_sidebar(USAGE_KEY)
 
+_trace = tracing.start("widgets.staffing")
 # Hours / staffing & instructors
 workshop_hours = st.number_input("How many hours per week is the workshop open?", min_value=0.0, format="%.2f", key="workshop_hours")
 num_prisoners   = st.number_input("How many prisoners employed?", min_value=0, step=1, key="num_prisoners")
@@ -181,14 +182,13 @@ customer_covers_supervisors = st.checkbox("Customer provides instructor(s)?", ke
 
 supervisor_salaries = []
 if not customer_covers_supervisors:
-    titles_for_region = SUPERVISOR_PAY.get(region, [])
-    if region == "Select" or not titles_for_region:
+    options, pay_by_title = STATIC["titles"].get(region, ([], {}))
+    if region == "Select" or not options:
         st.warning("Select a prison to derive the Region before assigning instructor titles.")
     else:
         for i in range(int(num_supervisors)):
-            options = [t["title"] for t in titles_for_region]
             sel = st.selectbox(f"Instructor {i+1} title", options, key=f"inst_title_{i}")
-            pay = next(t["avg_total"] for t in titles_for_region if t["title"] == sel)
+            pay = pay_by_title[sel]
             st.caption(f"Avg Total for {region}: **£{pay:,.0f}** per year")
             supervisor_salaries.append(float(pay))
 
@@ -217,10 +217,12 @@ if customer_type == "Commercial":
         dev_rate = 0.10
     else:
         dev_rate = 0.00
+tracing.stop(_trace)
 
 # -----------------------------------------------------------------------------
 # Validation
 # -----------------------------------------------------------------------------
+@tracing.traced("validate_inputs")
 def validate_inputs():
     errors = []
     if prison_choice == "Select": errors.append("Select prison")
@@ -242,7 +244,9 @@ def validate_inputs():
 # -----------------------------------------------------------------------------
 # HOST
 # -----------------------------------------------------------------------------
+@tracing.traced("run_host")
 def run_host():
+    from host import generate_host_quote
     errors_top = validate_inputs()
     if st.button("Generate Costs"):
         if errors_top:
@@ -261,6 +265,7 @@ def run_host():
             apply_vat=True,          # <— VAT always on
             vat_rate=20.0,           # <— 20%
             dev_rate=float(dev_rate),
+            tariffs=tariffs_from_state(st.session_state),
         )
         st.markdown(render_host_df_to_html(host_df), unsafe_allow_html=True)
         c1, c2 = st.columns(2)
@@ -276,7 +281,302 @@ def run_host():
 # -----------------------------------------------------------------------------
 # PRODUCTION
 # -----------------------------------------------------------------------------
+def _contractual_kwargs(pricing_mode, targets):
+    # Inputs shared by pricing, Monte Carlo, tornado and break-even (VAT always 20%)
+    return dict(
+        workshop_hours=float(workshop_hours),
+        prisoner_salary=float(prisoner_salary),
+        supervisor_salaries=supervisor_salaries,
+        effective_pct=float(effective_pct),
+        customer_covers_supervisors=bool(customer_covers_supervisors),
+        customer_type=customer_type,
+        apply_vat=True,          # <— force VAT on
+        vat_rate=20.0,           # <— 20%
+        area_m2=float(area_m2),
+        usage_key=USAGE_KEY,
+        num_prisoners=int(num_prisoners),
+        num_supervisors=int(num_supervisors),
+        dev_rate=float(dev_rate),
+        pricing_mode=pricing_mode,
+        targets=targets if pricing_mode == "target" else None,
+        tariffs=tariffs_from_state(st.session_state),
+    )
+
+ENTRY_MODES = ["One by one", "Table / CSV"]
+
+def _table_mode(kind):
+    return st.session_state.get(f"{kind}_entry") == ENTRY_MODES[1]
+
+@tracing.traced("items.current")
+def _current_items(pricing_mode):
+    # (typed items frame, errors) from the grid or the per-item widgets; read from
+    # session state so fragments see fresh values
+    import pandas as pd
+    import bulk_items
+    ss = st.session_state
+    if _table_mode("items"):
+        raw = ss.get("items_grid_df", bulk_items.blank_items())
+    else:
+        n = range(int(ss.get("num_items_prod", 1)))
+        raw = pd.DataFrame({
+            "name": [ss.get(f"name_{i}", "") for i in n],
+            "required": [ss.get(f"req_{i}", 1) for i in n],
+            "minutes": [ss.get(f"mins_{i}", 10.0) for i in n],
+            "assigned": [ss.get(f"assigned_{i}", 0) or 0 for i in n],
+            "target": [ss.get(f"target_{i}", 0) or 0 for i in n],
+        })
+    return bulk_items.items_frame(raw, pricing_mode=pricing_mode, num_prisoners=int(num_prisoners))
+
+def _assigned_total():
+    ss = st.session_state
+    return sum(int(ss.get(f"assigned_{j}", 0) or 0) for j in range(int(ss.get("num_items_prod", 1))))
+
+@tracing.traced("callback.optimise")
+def _apply_optimised_assignments(pricing_mode, output_pct):
+    # Button callback: runs before the next rerun, so the assigned widgets/grid pick up the values
+    from allocation import optimise_allocation
+    import bulk_items
+    ss = st.session_state
+    items, _errs = _current_items(pricing_mode)
+    result = optimise_allocation(
+        bulk_items.items_to_dicts(items), int(num_prisoners),
+        workshop_hours=float(workshop_hours), output_pct=float(output_pct),
+        objective="min_cost" if pricing_mode == "target" else "max_units",
+        targets=items["target"].tolist() if pricing_mode == "target" else None,
+    )
+    ss["optimise_note"] = result["note"]
+    if not result["feasible"]:
+        return
+    if _table_mode("items"):
+        ss["items_table"] = items.assign(assigned=[int(a) for a in result["assigned"]])
+        ss["items_table_ver"] = ss.get("items_table_ver", 0) + 1
+    else:
+        for i, a in enumerate(result["assigned"]):
+            ss[f"assigned_{i}"] = int(a)
+
+def _rerun_item(i, all_items=False):
+    # Widget callback: redraw only this item and the results, not the whole page.
+    # An assignment moves every other item's cap, so that redraws all the items.
+    ss = st.session_state
+    ss["assigned_total"] = _assigned_total()
+    items = range(int(ss.get("num_items_prod", 1))) if all_items else (i,)
+    st.rerun([*(f"prod_item_{j}" for j in items), "prod_results"])
+
+@tracing.traced("widgets.item")
+def _item_inputs(i, pricing_mode, planned_output_pct):
+    output_scale = float(planned_output_pct) / 100.0
+    with st.expander(f"Item {i+1} details", expanded=(i == 0)):
+        name = st.text_input(f"Item {i+1} Name", key=f"name_{i}", on_change=_rerun_item, args=(i,))
+        disp = (name.strip() or f"Item {i+1}") if isinstance(name, str) else f"Item {i+1}"
+        required = st.number_input(f"Prisoners required to make 1 item ({disp})", min_value=1, value=1, step=1, key=f"req_{i}", on_change=_rerun_item, args=(i,))
+        minutes_per = st.number_input(f"How many minutes to make 1 item ({disp})", min_value=1.0, value=10.0, format="%.2f", key=f"mins_{i}", on_change=_rerun_item, args=(i,))
+
+        # Prisoners not already on another item (running total kept by the full run and _rerun_item).
+        # Never below the current value: fewer prisoners leaves it over, reported by the results.
+        own = int(st.session_state.get(f"assigned_{i}", 0) or 0)
+        remaining = max(0, int(num_prisoners) - (int(st.session_state.get("assigned_total", own)) - own))
+        assigned = st.number_input(
+            f"How many prisoners work solely on this item ({disp})",
+            min_value=0, max_value=max(remaining, own), value=own,
+            step=1, key=f"assigned_{i}", on_change=_rerun_item, args=(i, True)
+        )
+
+        # Capacity preview
+        if assigned > 0 and minutes_per > 0 and required > 0 and workshop_hours > 0:
+            cap_100 = (assigned * workshop_hours * 60.0) / (minutes_per * required)
+        else:
+            cap_100 = 0.0
+        cap_planned = cap_100 * output_scale
+        st.markdown(f"{disp} capacity @ 100%: **{cap_100:.0f} units/week** · @ {planned_output_pct}%: **{cap_planned:.0f}**")
+
+        # Target input — ONLY when pricing_mode == "target"
+        if pricing_mode == "target":
+            tgt_default = int(round(cap_planned)) if cap_planned > 0 else 0
+            st.number_input(f"Target units per week ({disp})", min_value=0, value=tgt_default, step=1, key=f"target_{i}", on_change=_rerun_item, args=(i,))
+
+def _grid_config(columns):
+    cfg = {}
+    for k, h in columns.items():
+        if k == "name":
+            cfg[k] = st.column_config.TextColumn(h)
+        elif k == "deadline":
+            cfg[k] = st.column_config.DateColumn(h, format="YYYY-MM-DD")
+        elif k == "minutes":
+            cfg[k] = st.column_config.NumberColumn(h, min_value=0.0, format="%.2f")
+        else:
+            cfg[k] = st.column_config.NumberColumn(h, min_value=0, step=1, format="%d")
+    return cfg
+
+@tracing.traced("callback.load_table")
+def _load_table(kind, source):
+    # Upload / paste callback: replace the grid contents with the loaded rows
+    import bulk_items
+    ss = st.session_state
+    src = ss.get(f"{kind}_{source}")
+    if not src:
+        return
+    columns, defaults = (
+        (bulk_items.ITEM_COLUMNS, bulk_items.ITEM_DEFAULTS) if kind == "items"
+        else (bulk_items.ADHOC_COLUMNS, bulk_items.ADHOC_DEFAULTS)
+    )
+    try:
+        table, errs = bulk_items.editable(bulk_items.read_table(src), columns, defaults)
+    except Exception as e:
+        ss[f"{kind}_load_errors"] = [f"Could not read the table: {e}"]
+        return
+    ss[f"{kind}_table"] = table
+    ss[f"{kind}_table_ver"] = ss.get(f"{kind}_table_ver", 0) + 1   # new editor key drops old edits
+    ss[f"{kind}_load_errors"] = errs
+
+@tracing.traced("widgets.table_loader")
+def _table_loader(kind, columns):
+    import bulk_items
+    with st.expander("Load from CSV or spreadsheet", expanded=False):
+        st.file_uploader("Upload CSV", type=["csv", "tsv", "txt"], key=f"{kind}_upload", on_change=_load_table, args=(kind, "upload"))
+        st.text_area("…or paste rows copied from a spreadsheet (include the header row)", key=f"{kind}_paste", on_change=_load_table, args=(kind, "paste"))
+        st.download_button("Download CSV template", data=bulk_items.template_csv(columns), file_name=f"{kind}_template.csv", mime="text/csv", key=f"{kind}_template")
+    errs = st.session_state.get(f"{kind}_load_errors")
+    if errs:
+        st.warning("Some values could not be read and were left blank:\n- " + "\n- ".join(errs))
+
+@tracing.traced("widgets.items_grid")
+def _items_grid(pricing_mode):
+    import bulk_items
+    ss = st.session_state
+    if "items_table" not in ss:
+        ss["items_table"] = bulk_items.blank_items()
+    cols = [k for k in bulk_items.ITEM_COLUMNS if pricing_mode == "target" or k != "target"]
+    ss["items_grid_df"] = st.data_editor(
+        ss["items_table"], key=f"items_grid_{ss.get('items_table_ver', 0)}",
+        num_rows="dynamic", hide_index=True, column_order=cols,
+        column_config=_grid_config(bulk_items.ITEM_COLUMNS),
+        on_change=lambda: st.rerun(["prod_items_grid", "prod_results"]),
+    )
+    st.caption(f"{len(ss['items_grid_df'])} item(s). Blank cells use the defaults (1 prisoner, 10 minutes, 0 assigned).")
+
+@st.fragment(key="prod_results")
+@tracing.traced("results")
+def _production_results(pricing_mode, planned_output_pct, budget_minutes_planned):
+    import bulk_items
+    output_scale = float(planned_output_pct) / 100.0
+    items, item_errors = _current_items(pricing_mode)
+    if item_errors:
+        st.error("Fix item errors:\n- " + "\n- ".join(item_errors)); return
+
+    total_assigned = int(items["assigned"].sum())
+
+    used_minutes_raw = total_assigned * workshop_hours * 60.0
+    used_minutes_planned = used_minutes_raw * output_scale
+    st.markdown(f"**Planned used Labour minutes @ {planned_output_pct}%:** {used_minutes_planned:,.0f}")
+
+    if pricing_mode == "as-is" and used_minutes_planned > budget_minutes_planned:
+        st.error("Planned used minutes exceed planned available minutes. Adjust assignments, add prisoners, increase hours, or lower Output%."); return
+
+    # === Always apply VAT 20% in calculations ===
+    kw = _contractual_kwargs(pricing_mode, items["target"].tolist())
+    if "prod_quote" not in st.session_state:
+        from incremental import IncrementalContractual
+        st.session_state["prod_quote"] = IncrementalContractual()   # reprices only what changed between reruns
+    results = bulk_items.price_items(items, planned_output_pct, quote=st.session_state["prod_quote"], **kw)
+
+    # Minutes safety + target warnings
+    mins_per_unit = items["minutes"].to_numpy() * items["required"].to_numpy()
+    units_minutes = float((results["Units/week"].to_numpy(dtype=float) * mins_per_unit).sum())
+    rounding = 0.5 * float(mins_per_unit.sum())   # Units/week is rounded per item
+    warnings = []
+    if pricing_mode == "target":
+        late = results[results["Feasible"].eq(False)]
+        warnings = [f"• {n}: {note}" for n, note in zip(late["Item"], late["Note"])]
+
+    if pricing_mode == "as-is":
+        if units_minutes > used_minutes_planned + rounding + 1e-6:
+            st.error("Total minutes implied by units exceed planned labour minutes. Re-check Output% and timings."); return
+    else:
+        if warnings:
+            st.warning("Some targets exceed available minutes at the current plan:\n" + "\n".join(warnings))
+
+    # Build display — always show ex VAT and inc VAT; hide target-only cols in max mode
+    display_cols = ["Item", "Output %", "Capacity (units/week)", "Units/week",
+                    "Unit Cost (£)", "Unit Price ex VAT (£)", "Unit Price inc VAT (£)"]
+    if pricing_mode == "target":
+        display_cols += ["Feasible", "Note"]  # shown only in target mode
+
+    prod_df = results[display_cols].round(2)
+
+    st.markdown(render_generic_df_to_html(prod_df), unsafe_allow_html=True)
+    d1, d2 = st.columns(2)
+    with d1:
+        st.download_button("Download CSV (Production)", data=export_csv_bytes(prod_df), file_name="production_quote.csv", mime="text/csv")
+    with d2:
+        st.download_button(
+            "Download PDF-ready HTML (Production)",
+            data=export_html(None, prod_df, title="Production Quote"),
+            file_name="production_quote.html", mime="text/html"
+        )
+
+    item_dicts = bulk_items.items_to_dicts(items)
+    with st.expander("Tariff uncertainty (Monte Carlo)"):
+        _monte_carlo_panel(item_dicts, planned_output_pct, kw)
+    with st.expander("Sensitivity (tornado)"):
+        _tornado_panel(item_dicts, planned_output_pct, kw)
+    with st.expander("Break-even / reverse pricing"):
+        _breakeven_panel(item_dicts, planned_output_pct, kw)
+
+# Analysis panels: their own widgets rerun only the panel
+@st.fragment
+@tracing.traced("widgets.monte_carlo")
+def _monte_carlo_panel(items, planned_output_pct, kw):
+    from montecarlo import default_uncertainty, simulate_contractual
+    spread_pct = st.slider("Tariff spread (± %)", 0, 50, 15, key="mc_spread")
+    n_draws = st.select_slider("Draws", [10_000, 50_000, 100_000], value=100_000, key="mc_draws")
+    if st.button("Run simulation", key="mc_run"):
+        mc_df = simulate_contractual(
+            items, planned_output_pct,
+            uncertainty=default_uncertainty(kw["tariffs"], planned_output_pct, spread=spread_pct / 100.0, usage_key=kw["usage_key"]),
+            n_draws=int(n_draws),
+            **kw,
+        )
+        st.markdown(render_generic_df_to_html(mc_df), unsafe_allow_html=True)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _tornado(items, planned_output_pct, pct, **kw):
+    from sensitivity import tornado_contractual
+    return tornado_contractual(items, planned_output_pct, pct=pct, **kw)
+
+@st.fragment
+@tracing.traced("widgets.tornado")
+def _tornado_panel(items, planned_output_pct, kw):
+    swing_pct = st.slider("Perturb each input by (± %)", 1, 50, 10, key="tornado_pct")
+    tornado_df = _tornado(items, planned_output_pct, swing_pct / 100.0, **kw)
+    st.caption("Unit price inc VAT (£) with each input moved down / up; largest swing first.")
+    st.dataframe(tornado_df, hide_index=True)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _break_even(items, planned_output_pct, variable, target_price, **kw):
+    from breakeven import solve_contractual
+    return solve_contractual(items, planned_output_pct, variable=variable, target_price=target_price, **kw)
+
+@st.fragment
+@tracing.traced("widgets.break_even")
+def _breakeven_panel(items, planned_output_pct, kw):
+    be_labels = {
+        "Output % needed": "output_pct",
+        "Weekly hours needed": "workshop_hours",
+        "Prisoners on the item": "assigned",
+        "Units/week to cover costs": "units",
+    }
+    be_choice = st.selectbox("Solve for", list(be_labels), key="be_variable")
+    be_target = st.number_input("Target unit price ex VAT (£)", min_value=0.0, value=1.0, format="%.2f", key="be_target")
+    be_df = _break_even(items, planned_output_pct, be_labels[be_choice], float(be_target), **kw)
+    st.dataframe(be_df, hide_index=True)
+
+@tracing.traced("run_production")
 def run_production():
+    import pandas as pd
+    import bulk_items
+    from production import labour_minutes_budget, calculate_adhoc
+    from render import render_table
+    from workdays import get_calendar
     errors_top = validate_inputs()
     if errors_top:
         st.error("Fix errors before production:\n- " + "\n- ".join(errors_top)); return
@@ -311,132 +611,74 @@ def run_production():
         budget_minutes_planned = budget_minutes_raw * output_scale
         st.markdown(f"**Planned available Labour minutes @ {planned_output_pct}%:** {budget_minutes_planned:,.0f}")
 
-        # Items
-        num_items = st.number_input("Number of items produced?", min_value=1, value=1, step=1, key="num_items_prod")
-        items, targets = [], []
-        for i in range(int(num_items)):
-            with st.expander(f"Item {i+1} details", expanded=(i == 0)):
-                name = st.text_input(f"Item {i+1} Name", key=f"name_{i}")
-                disp = (name.strip() or f"Item {i+1}") if isinstance(name, str) else f"Item {i+1}"
-                required = st.number_input(f"Prisoners required to make 1 item ({disp})", min_value=1, value=1, step=1, key=f"req_{i}")
-                minutes_per = st.number_input(f"How many minutes to make 1 item ({disp})", min_value=1.0, value=10.0, format="%.2f", key=f"mins_{i}")
-
-                total_assigned_before = sum(int(st.session_state.get(f"assigned_{j}", 0)) for j in range(i))
-                remaining = max(0, int(num_prisoners) - total_assigned_before)
-                assigned = st.number_input(
-                    f"How many prisoners work solely on this item ({disp})",
-                    min_value=0, max_value=remaining, value=int(st.session_state.get(f"assigned_{i}", 0)),
-                    step=1, key=f"assigned_{i}"
-                )
-
-                # Capacity preview
-                if assigned > 0 and minutes_per > 0 and required > 0 and workshop_hours > 0:
-                    cap_100 = (assigned * workshop_hours * 60.0) / (minutes_per * required)
-                else:
-                    cap_100 = 0.0
-                cap_planned = cap_100 * output_scale
-                st.markdown(f"{disp} capacity @ 100%: **{cap_100:.0f} units/week** · @ {planned_output_pct}%: **{cap_planned:.0f}**")
-
-                # Target input — ONLY when pricing_mode == "target"
-                if pricing_mode == "target":
-                    tgt_default = int(round(cap_planned)) if cap_planned > 0 else 0
-                    tgt = st.number_input(f"Target units per week ({disp})", min_value=0, value=tgt_default, step=1, key=f"target_{i}")
-                    targets.append(int(tgt))
-
-                items.append({"name": name, "required": int(required), "minutes": float(minutes_per), "assigned": int(assigned)})
-
-        total_assigned = sum(it["assigned"] for it in items)
-        if total_assigned > int(num_prisoners):
-            st.error(f"Prisoners assigned across items ({total_assigned}) exceed total prisoners ({int(num_prisoners)})."); return
-
-        used_minutes_raw = total_assigned * workshop_hours * 60.0
-        used_minutes_planned = used_minutes_raw * output_scale
-        st.markdown(f"**Planned used Labour minutes @ {planned_output_pct}%:** {used_minutes_planned:,.0f}")
-
-        if pricing_mode == "as-is" and used_minutes_planned > budget_minutes_planned:
-            st.error("Planned used minutes exceed planned available minutes. Adjust assignments, add prisoners, increase hours, or lower Output%."); return
-
-        # === Always apply VAT 20% in calculations ===
-        results = calculate_production_contractual(
-            items, planned_output_pct,
-            workshop_hours=float(workshop_hours),
-            prisoner_salary=float(prisoner_salary),
-            supervisor_salaries=supervisor_salaries,
-            effective_pct=float(effective_pct),
-            customer_covers_supervisors=bool(customer_covers_supervisors),
-            customer_type=customer_type,
-            apply_vat=True,          # <— force VAT on
-            vat_rate=20.0,           # <— 20%
-            area_m2=float(area_m2),
-            usage_key=USAGE_KEY,
-            num_prisoners=int(num_prisoners),
-            num_supervisors=int(num_supervisors),
-            dev_rate=float(dev_rate),
-            pricing_mode=pricing_mode,
-            targets=targets if pricing_mode == "target" else None,
+        # Items: one expander per item, or one editable grid (CSV upload/paste) for long lists
+        st.radio("Enter items", ENTRY_MODES, horizontal=True, key="items_entry")
+        if _table_mode("items"):
+            _table_loader("items", bulk_items.ITEM_COLUMNS)
+            st.fragment(_items_grid, key="prod_items_grid")(pricing_mode)
+        else:
+            # Each expander is its own fragment, so an edit reruns that item and the results only
+            num_items = st.number_input("Number of items produced?", min_value=1, value=1, step=1, key="num_items_prod")
+            st.session_state["assigned_total"] = _assigned_total()
+            for i in range(int(num_items)):
+                st.fragment(_item_inputs, key=f"prod_item_{i}")(i, pricing_mode, planned_output_pct)
+
+        st.button(
+            "Optimise prisoner assignments",
+            key="optimise_assigned",
+            on_click=_apply_optimised_assignments,
+            args=(pricing_mode, planned_output_pct),
+            help="Target mode: fewest prisoners that meet every target. Maximum units mode: most units from the prisoners available.",
         )
+        if st.session_state.get("optimise_note"):
+            st.warning(st.session_state["optimise_note"])
 
-        # Minutes safety + target warnings
-        units_minutes = 0.0
-        warnings = []
-        for r, it in zip(results, items):
-            units = r.get("Units/week", 0) or 0
-            units_minutes += float(units) * float(it["minutes"]) * float(it["required"])
-            if pricing_mode == "target" and r.get("Feasible") is False:
-                warnings.append(f"• {r['Item']}: {r.get('Note')}")
-
-        if pricing_mode == "as-is":
-            if units_minutes > used_minutes_planned + 1e-6:
-                st.error("Total minutes implied by units exceed planned labour minutes. Re-check Output% and timings."); return
-        else:
-            if warnings:
-                st.warning("Some targets exceed available minutes at the current plan:\n" + "\n".join(warnings))
-
-        # Build display — always show ex VAT and inc VAT; hide target-only cols in max mode
-        display_cols = ["Item", "Output %", "Capacity (units/week)", "Units/week",
-                        "Unit Cost (£)", "Unit Price ex VAT (£)", "Unit Price inc VAT (£)"]
-        if pricing_mode == "target":
-            display_cols += ["Feasible", "Note"]  # shown only in target mode
-
-        prod_df = pd.DataFrame([{
-            k: (None if r.get(k) is None else (round(float(r.get(k)), 2) if isinstance(r.get(k), (int, float)) else r.get(k)))
-            for k in display_cols
-        } for r in results])
-
-        st.markdown(render_generic_df_to_html(prod_df), unsafe_allow_html=True)
-        d1, d2 = st.columns(2)
-        with d1:
-            st.download_button("Download CSV (Production)", data=export_csv_bytes(prod_df), file_name="production_quote.csv", mime="text/csv")
-        with d2:
-            st.download_button(
-                "Download PDF-ready HTML (Production)",
-                data=export_html(None, prod_df, title="Production Quote"),
-                file_name="production_quote.html", mime="text/html"
-            )
+        _production_results(pricing_mode, planned_output_pct, budget_minutes_planned)
 
     else:  # Ad‑hoc
-        num_lines = st.number_input("How many product lines are needed?", min_value=1, value=1, step=1, key="adhoc_num_lines")
-        lines = []
-        for i in range(int(num_lines)):
-            with st.expander(f"Product line {i+1}", expanded=(i == 0)):
-                c1, c2, c3 = st.columns([2, 1, 1])
-                with c1: item_name = st.text_input("Item name", key=f"adhoc_name_{i}")
-                with c2: units_requested = st.number_input("Units requested", min_value=1, value=100, step=1, key=f"adhoc_units_{i}")
-                with c3: deadline = st.date_input("Deadline", value=date.today(), key=f"adhoc_deadline_{i}")
-                c4, c5 = st.columns([1, 1])
-                with c4: pris_per_item = st.number_input("Prisoners to make one", min_value=1, value=1, step=1, key=f"adhoc_pris_req_{i}")
-                with c5: minutes_per_item = st.number_input("Minutes to make one", min_value=1.0, value=10.0, format="%.2f", key=f"adhoc_mins_{i}")
-                lines.append({
-                    "name": (item_name.strip() or f"Item {i+1}") if isinstance(item_name, str) else f"Item {i+1}",
-                    "units": int(units_requested),
-                    "deadline": deadline,
-                    "pris_per_item": int(pris_per_item),
-                    "mins_per_item": float(minutes_per_item),
-                })
-
-        if st.button("Calculate Ad‑hoc Cost", key="calc_adhoc"):
+        st.radio("Enter lines", ENTRY_MODES, horizontal=True, key="adhoc_entry")
+        table_mode = _table_mode("adhoc")
+        if table_mode:
+            _table_loader("adhoc", bulk_items.ADHOC_COLUMNS)
+            if "adhoc_table" not in st.session_state:
+                st.session_state["adhoc_table"] = bulk_items.blank_adhoc()
+        else:
+            num_lines = st.number_input("How many product lines are needed?", min_value=1, value=1, step=1, key="adhoc_num_lines")
+        # Lines are batched in a form: typing reruns nothing until "Calculate Ad‑hoc Cost"
+        _trace = tracing.start("widgets.adhoc_form")
+        with st.form("adhoc_lines", border=False):
+            if table_mode:
+                adhoc_grid = st.data_editor(
+                    st.session_state["adhoc_table"], key=f"adhoc_grid_{st.session_state.get('adhoc_table_ver', 0)}",
+                    num_rows="dynamic", hide_index=True, column_config=_grid_config(bulk_items.ADHOC_COLUMNS),
+                )
+            else:
+                lines = []
+                for i in range(int(num_lines)):
+                    with st.expander(f"Product line {i+1}", expanded=(i == 0)):
+                        c1, c2, c3 = st.columns([2, 1, 1])
+                        with c1: item_name = st.text_input("Item name", key=f"adhoc_name_{i}")
+                        with c2: units_requested = st.number_input("Units requested", min_value=1, value=100, step=1, key=f"adhoc_units_{i}")
+                        with c3: deadline = st.date_input("Deadline", value=date.today(), key=f"adhoc_deadline_{i}")
+                        c4, c5 = st.columns([1, 1])
+                        with c4: pris_per_item = st.number_input("Prisoners to make one", min_value=1, value=1, step=1, key=f"adhoc_pris_req_{i}")
+                        with c5: minutes_per_item = st.number_input("Minutes to make one", min_value=1.0, value=10.0, format="%.2f", key=f"adhoc_mins_{i}")
+                        lines.append({
+                            "name": (item_name.strip() or f"Item {i+1}") if isinstance(item_name, str) else f"Item {i+1}",
+                            "units": int(units_requested),
+                            "deadline": deadline,
+                            "pris_per_item": int(pris_per_item),
+                            "mins_per_item": float(minutes_per_item),
+                        })
+            submitted = st.form_submit_button("Calculate Ad‑hoc Cost", key="calc_adhoc")
+        tracing.stop(_trace)
+
+        if submitted:
             errs = validate_inputs()
             if workshop_hours <= 0: errs.append("Hours per week must be > 0 for Ad‑hoc")
+            if table_mode:
+                lines, line_errs = bulk_items.adhoc_lines(adhoc_grid)
+                errs += line_errs
             for i, ln in enumerate(lines):
                 if ln["units"] <= 0: errs.append(f"Line {i+1}: Units requested must be > 0")
                 if ln["pris_per_item"] <= 0: errs.append(f"Line {i+1}: Prisoners to make one must be > 0")
@@ -460,6 +702,8 @@ def run_production():
                 usage_key=USAGE_KEY,
                 dev_rate=float(dev_rate),
                 today=date.today(),
+                tariffs=tariffs_from_state(st.session_state),
+                calendar=get_calendar(prison_choice),
             )
             if result["feasibility"]["hard_block"]:
                 st.error(result["feasibility"]["reason"]); return
@@ -467,24 +711,38 @@ def run_production():
             # Build table with BOTH ex VAT and inc VAT columns
             col_headers = ["Item", "Units",
                            "Unit Cost (ex VAT £)", "Unit Cost (inc VAT £)",
-                           "Line Total (ex VAT £)", "Line Total (inc VAT £)"]
-            data_rows = []
-            for p in result["per_line"]:
-                data_rows.append([
-                    p["name"], f"{p['units']:,}",
-                    f"{p['unit_cost_ex_vat']:.2f}", f"{p['unit_cost_inc_vat']:.2f}",
-                    f"{p['line_total_ex_vat']:.2f}", f"{p['line_total_inc_vat']:.2f}",
-                ])
-            table_html = ["<table><tr>"] + [f"<th>{h}</th>" for h in col_headers] + ["</tr>"]
-            for r in data_rows:
-                table_html.append("<tr>" + "".join(f"<td>{c}</td>" for c in r) + "</tr>")
-            table_html.append("</table>")
-            st.markdown("".join(table_html), unsafe_allow_html=True)
+                           "Line Total (ex VAT £)", "Line Total (inc VAT £)",
+                           "Est. completion", "Slack (working days)"]
+            pl = result["per_line"]
+            adhoc_df = pd.DataFrame({
+                col_headers[0]: [p["name"] for p in pl],
+                col_headers[1]: [p["units"] for p in pl],
+                col_headers[2]: [p["unit_cost_ex_vat"] for p in pl],
+                col_headers[3]: [p["unit_cost_inc_vat"] for p in pl],
+                col_headers[4]: [p["line_total_ex_vat"] for p in pl],
+                col_headers[5]: [p["line_total_inc_vat"] for p in pl],
+                col_headers[6]: [p["completion_date"].isoformat() if p["completion_date"] else "" for p in pl],
+                col_headers[7]: ["" if p["slack_wd"] is None else str(p["slack_wd"]) for p in pl],
+            }, columns=col_headers)
+            money = "{:.2f}"
+            st.markdown(render_table(adhoc_df, formats={
+                "Units": "{:,}", col_headers[2]: money, col_headers[3]: money, col_headers[4]: money, col_headers[5]: money,
+            }), unsafe_allow_html=True)
 
             totals = result["totals"]
             st.markdown(f"**Total Job Cost (ex VAT): £{totals['ex_vat']:,.2f}**")
             st.markdown(f"**Total Job Cost (inc VAT): £{totals['inc_vat']:,.2f}**")
 
+            plan = result["schedule"]["plan"]
+            if plan:
+                with st.expander("Daily production plan"):
+                    st.dataframe(
+                        pd.DataFrame(plan)[["date", "name", "minutes"]].rename(
+                            columns={"date": "Date", "name": "Item", "minutes": "Minutes"}
+                        ),
+                        hide_index=True,
+                    )
+
 
 # -----------------------------------------------------------------------------
 # MAIN
@@ -506,3 +764,6 @@ if st.button("Reset Selections", key="reset_app_footer"):
     except Exception:
         st.experimental_rerun()
 st.markdown('\n', unsafe_allow_html=True)
+
+# Span report for this rerun (debug panel only when COSTING_TRACE is set)
+tracing.show_panel(tracing.end_run())
@@ -0,0 +1,149 @@
+# allocation.py
+# Integer prisoner allocation across contractual items.
+#   objective="min_cost":  meet every item's target units/week with the fewest prisoners.
+#                          Instructor, overhead and development costs are shared out by
+#                          labour share and do not depend on the split, so minimising
+#                          prisoners minimises total weekly cost.
+#   objective="max_units": maximise total units/week (each item capped at its target, if
+#                          given) within the num_prisoners limit.
+# Capacity uses the same formula as calculate_production_contractual. With
+# whole_teams=True assignments are multiples of each item's `required` team size.
+import heapq
+import math
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from production_engine import contractual_kernel
+from tracing import traced
+
+_EXACT_LIMIT = 5_000_000   # DP cells (items × budget × options) for method="auto"
+
+def _capacity(minutes, required, assigned, workshop_hours: float, output_pct: float) -> np.ndarray:
+    return contractual_kernel(
+        minutes, required, assigned, workshop_hours=workshop_hours, output_pct=output_pct,
+        prisoner_salary=0.0, inst_weekly_total=0.0, overheads_weekly=0.0, dev_weekly_total=0.0,
+    )["capacity_units"]
+
+def _min_assigned_for_targets(minutes, required, steps, targets, workshop_hours, output_pct) -> np.ndarray:
+    per_prisoner = _capacity(minutes, required, np.ones_like(steps), workshop_hours, output_pct)
+    need = np.zeros(len(steps), dtype=np.int64)
+    for i in range(len(steps)):
+        if targets[i] <= 0:
+            continue
+        if per_prisoner[i] <= 0:
+            need[i] = -1   # cannot produce anything
+            continue
+        a = math.ceil(targets[i] / per_prisoner[i] - 1e-9)
+        a = int(math.ceil(a / steps[i]) * steps[i])
+        # guard against float fuzz with the exact capacity formula
+        while _capacity(minutes[i:i+1], required[i:i+1], np.array([a]), workshop_hours, output_pct)[0] < targets[i] - 1e-9:
+            a += int(steps[i])
+        need[i] = a
+    return need
+
+def _value(per_prisoner: float, cap_units: float, a: np.ndarray) -> np.ndarray:
+    return np.minimum(per_prisoner * a, cap_units)
+
+def _solve_exact(per_prisoner, caps, steps, budget: int) -> np.ndarray:
+    # Multiple-choice knapsack DP: best[b] = max units using at most b prisoners.
+    n = len(steps)
+    best = np.zeros(budget + 1)
+    choice = np.zeros((n, budget + 1), dtype=np.int64)
+    for i in range(n):
+        new = best.copy()
+        pick = np.zeros(budget + 1, dtype=np.int64)
+        for a in range(int(steps[i]), budget + 1, int(steps[i])):
+            v = _value(per_prisoner[i], caps[i], np.array([a]))[0]
+            cand = np.full(budget + 1, -np.inf)
+            cand[a:] = best[:budget + 1 - a] + v
+            better = cand > new + 1e-12
+            new = np.where(better, cand, new)
+            pick = np.where(better, a, pick)
+            if v >= caps[i]:
+                break   # more prisoners cannot add units to this item
+        best, choice[i] = new, pick
+    out = np.zeros(n, dtype=np.int64)
+    b = int(np.argmax(best))
+    for i in range(n - 1, -1, -1):
+        out[i] = choice[i, b]
+        b -= out[i]
+    return out
+
+def _solve_greedy(per_prisoner, caps, steps, budget: int) -> np.ndarray:
+    # Repeatedly add the team with the best marginal units per prisoner.
+    n = len(steps)
+    out = np.zeros(n, dtype=np.int64)
+    heap = []
+    for i in range(n):
+        gain = _value(per_prisoner[i], caps[i], np.array([steps[i]]))[0]
+        if gain > 0:
+            heap.append((-gain / steps[i], i))
+    heapq.heapify(heap)
+    left = int(budget)
+    while heap:
+        _, i = heapq.heappop(heap)
+        if steps[i] > left:
+            continue   # this item's team no longer fits; smaller teams may
+        out[i] += steps[i]
+        left -= int(steps[i])
+        nxt = _value(per_prisoner[i], caps[i], np.array([out[i] + steps[i]]))[0]
+        cur = _value(per_prisoner[i], caps[i], np.array([out[i]]))[0]
+        if nxt - cur > 1e-12:
+            heapq.heappush(heap, (-(nxt - cur) / steps[i], i))
+    return out
+
+@traced("analysis.optimise")
+def optimise_allocation(
+    items: List[Dict],
+    num_prisoners: int,
+    *,
+    workshop_hours: float,
+    output_pct: float,
+    objective: str = "min_cost",      # "min_cost" or "max_units"
+    targets: Optional[Sequence[int]] = None,
+    method: str = "auto",             # "auto", "exact" or "greedy" (max_units only)
+    whole_teams: bool = True,
+    prisoner_salary: float = 0.0,
+) -> Dict:
+    n = len(items)
+    minutes = np.array([float(it.get("minutes", 0)) for it in items])
+    required = np.array([int(it.get("required", 1)) for it in items])
+    steps = np.maximum(1, required) if whole_teams else np.ones(n, dtype=np.int64)
+    tgt = np.zeros(n) if targets is None else np.array([float(t or 0) for t in list(targets)[:n]] + [0.0] * max(0, n - len(targets)))
+    budget = max(0, int(num_prisoners))
+
+    if objective == "min_cost":
+        need = _min_assigned_for_targets(minutes, required, steps, tgt, workshop_hours, output_pct)
+        impossible = [i for i in range(n) if need[i] < 0]
+        assigned = np.maximum(need, 0)
+        feasible = not impossible and int(assigned.sum()) <= budget
+        used_method = "exact"
+        note = None
+        if impossible:
+            note = "No capacity for: " + ", ".join(str(items[i].get("name") or f"Item {i+1}") for i in impossible)
+        elif not feasible:
+            note = f"Targets need {int(assigned.sum())} prisoners but only {budget} are available."
+    elif objective == "max_units":
+        per_prisoner = _capacity(minutes, required, np.ones(n, dtype=np.int64), workshop_hours, output_pct)
+        caps = np.where(tgt > 0, tgt, np.inf)
+        options = sum(budget // int(s) for s in steps)
+        use_exact = method == "exact" or (method == "auto" and options * (budget + 1) <= _EXACT_LIMIT)
+        assigned = (_solve_exact if use_exact else _solve_greedy)(per_prisoner, caps, steps, budget)
+        used_method = "exact" if use_exact else "greedy"
+        feasible, note = True, None
+    else:
+        raise ValueError("objective must be 'min_cost' or 'max_units'")
+
+    capacity = _capacity(minutes, required, assigned, workshop_hours, output_pct)
+    units = np.minimum(capacity, np.where(tgt > 0, tgt, np.inf)) if objective == "max_units" else capacity
+    return {
+        "assigned": assigned.tolist(),
+        "items": [dict(it, assigned=int(a)) for it, a in zip(items, assigned)],  # feed back into pricing
+        "capacity_units": capacity.tolist(),
+        "total_units": float(units.sum()),
+        "total_assigned": int(assigned.sum()),
+        "prisoner_weekly_cost": float(assigned.sum()) * float(prisoner_salary),
+        "feasible": feasible,
+        "method": used_method,
+        "note": note,
+    }
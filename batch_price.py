@@ -0,0 +1,324 @@
+# batch_price.py
+# Unattended batch pricing: stream a CSV or Parquet file of quote lines through the
+# pricing core and write one result row per input line (CSV or Parquet). Host quotes
+# have no lines: each writes a single row, and any extra input rows it has are noted
+# in its Note and otherwise ignored.
+#
+#   python batch_price.py book.csv priced.parquet --workers 8 --chunk-rows 5000
+#
+# Input: one row per line, rows of the same quote contiguous.
+#   quote_id, type                 "host" | "contractual" | "adhoc"
+#   Quote level (read from the first row of each quote):
+#     workshop_hours, area_m2, usage_key, num_prisoners, prisoner_salary, num_supervisors,
+#     customer_covers_supervisors, supervisor_salaries ("42248;48969" or a list),
+#     effective_pct, customer_type, dev_rate, vat_rate, apply_vat, output_pct,
+#     pricing_mode, prison (closure calendar / instructor pay), instructor_titles
+#     ("title;title", used with prison when supervisor_salaries is blank),
+#     and any Tariffs field (electricity_rate, gas_rate, ...) to override band defaults.
+#   Line level:
+#     name, minutes, required (prisoners per unit), assigned, target  (contractual)
+#     name, units, minutes, required, deadline                       (adhoc)
+# Output columns are the same for every type; Period says what the totals cover
+# (host = month, contractual = week, adhoc = whole job). Quotes that fail to price
+# get Feasible = False and the error in Note; the exit status is 1 if any failed.
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+
+from tariff import Tariffs, tariffs_for_band
+from tariff_tables import supervisor_pay_for_prison
+from host import generate_host_quotes
+from production import calculate_adhoc
+from production_engine import price_contractual_frame
+from workdays import get_calendar
+
+QUOTE_TYPES = ("host", "contractual", "adhoc")
+OUTPUT_COLUMNS = [
+    "quote_id", "type", "line", "Item", "Period", "Units",
+    "Unit Price ex VAT (£)", "Unit Price inc VAT (£)", "Total ex VAT (£)", "Total inc VAT (£)",
+    "Feasible", "Note",
+]
+TARIFF_FIELDS = tuple(Tariffs.__dataclass_fields__)
+DEFAULTS = {
+    "workshop_hours": 37.5, "area_m2": 0.0, "usage_key": "low", "num_prisoners": 0, "prisoner_salary": 0.0,
+    "num_supervisors": 0, "customer_covers_supervisors": False, "effective_pct": 100.0,
+    "customer_type": "Commercial", "dev_rate": 0.0, "vat_rate": 20.0, "apply_vat": True, "output_pct": 100,
+    "pricing_mode": "as-is", "prison": None,
+}
+
+# ---------- Row parsing ----------
+def _blank(v) -> bool:
+    return v is None or (isinstance(v, float) and np.isnan(v)) or (isinstance(v, str) and not v.strip())
+
+def _bool(v) -> bool:
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true", "yes", "y")
+    return bool(v)
+
+def _num(r: Dict, key: str, default, cast=float):
+    v = r.get(key)
+    return cast(default if _blank(v) else v)
+
+def _split(v) -> list:
+    if isinstance(v, (list, tuple, np.ndarray)):
+        return list(v)
+    if _blank(v):
+        return []
+    return [s.strip() for s in str(v).split(";") if s.strip()]
+
+def _quote_params(row: Dict) -> Dict:
+    p = {k: (row[k] if k in row and not _blank(row[k]) else d) for k, d in DEFAULTS.items()}
+    p["customer_covers_supervisors"] = _bool(p["customer_covers_supervisors"])
+    p["apply_vat"] = _bool(p["apply_vat"])
+    p["usage_key"] = str(p["usage_key"]).strip().lower()
+
+    salaries = [float(s) for s in _split(row.get("supervisor_salaries"))]
+    titles = _split(row.get("instructor_titles"))
+    if not salaries and titles and p["prison"]:
+        salaries = [supervisor_pay_for_prison(p["prison"], t) for t in titles]
+        if any(np.isnan(s) for s in salaries):
+            raise ValueError(f"Instructor title not paid in {p['prison']}'s region: {titles}")
+    p["supervisor_salaries"] = salaries
+
+    tariffs = tariffs_for_band(p["usage_key"])
+    overrides = {f: row[f] for f in TARIFF_FIELDS if f in row and not _blank(row[f])}
+    p["tariffs"] = replace(tariffs, **{f: (v if f == "maint_method" else float(v)) for f, v in overrides.items()})
+    return p
+
+# ---------- Pricing (runs in worker processes) ----------
+# Pricers take plain row dicts and return plain result-row dicts; the chunk is turned
+# into a DataFrame once at the end (per-quote DataFrames dominate the run time otherwise).
+def _row(qid, qtype, line: int, item, period, units, ex, inc, total_ex, total_inc, feasible, note) -> Dict:
+    return dict(zip(OUTPUT_COLUMNS, (qid, qtype, line, item, period, units, ex, inc, total_ex, total_inc, feasible, note)))
+
+def _error_rows(qid, qtype, n: int, err: Exception) -> List[Dict]:
+    nan = float("nan")
+    return [_row(qid, qtype, i, None, None, nan, nan, nan, nan, nan, False, f"Error: {err}") for i in range(n)]
+
+def _price_contractual(qid, rows: List[Dict], p: Dict) -> List[Dict]:
+    targets = [_num(r, "target", 0, int) for r in rows] if p["pricing_mode"] == "target" else None
+    df = price_contractual_frame(
+        [_num(r, "minutes", 0) for r in rows],
+        [_num(r, "required", 1, int) for r in rows],
+        [_num(r, "assigned", 0, int) for r in rows],
+        int(p["output_pct"]),
+        names=[None if _blank(r.get("name")) else str(r["name"]) for r in rows],
+        workshop_hours=float(p["workshop_hours"]), prisoner_salary=float(p["prisoner_salary"]),
+        supervisor_salaries=p["supervisor_salaries"], effective_pct=float(p["effective_pct"]),
+        customer_covers_supervisors=p["customer_covers_supervisors"], customer_type=p["customer_type"],
+        apply_vat=p["apply_vat"], vat_rate=float(p["vat_rate"]), area_m2=float(p["area_m2"]), usage_key=p["usage_key"],
+        num_prisoners=int(p["num_prisoners"]), num_supervisors=int(p["num_supervisors"]), dev_rate=float(p["dev_rate"]),
+        pricing_mode=p["pricing_mode"], targets=targets, tariffs=p["tariffs"],
+    )
+    units = df["Units/week"].to_numpy(dtype=float)
+    ex = df["Unit Price ex VAT (£)"].to_numpy(dtype=float)
+    inc = df["Unit Price inc VAT (£)"].to_numpy(dtype=float)
+    return [
+        _row(qid, "contractual", i, name, "week", u, e, c, u * e, u * c, f is None or bool(f), note)
+        for i, (name, u, e, c, f, note) in enumerate(zip(df["Item"], units, ex, inc, df["Feasible"], df["Note"]))
+    ]
+
+def _price_adhoc(qid, rows: List[Dict], p: Dict, today: date) -> List[Dict]:
+    lines = [
+        {"name": f"Item {i+1}" if _blank(r.get("name")) else str(r["name"]),
+         "units": _num(r, "units", 0, int), "mins_per_item": _num(r, "minutes", 0),
+         "pris_per_item": _num(r, "required", 1, int), "deadline": pd.Timestamp(r["deadline"]).date()}
+        for i, r in enumerate(rows)
+    ]
+    res = calculate_adhoc(
+        lines, int(p["output_pct"]),
+        workshop_hours=float(p["workshop_hours"]), num_prisoners=int(p["num_prisoners"]),
+        prisoner_salary=float(p["prisoner_salary"]), supervisor_salaries=p["supervisor_salaries"],
+        effective_pct=float(p["effective_pct"]), customer_covers_supervisors=p["customer_covers_supervisors"],
+        customer_type=p["customer_type"], apply_vat=p["apply_vat"], vat_rate=float(p["vat_rate"]),
+        area_m2=float(p["area_m2"]), usage_key=p["usage_key"], dev_rate=float(p["dev_rate"]), today=today,
+        tariffs=p["tariffs"], calendar=get_calendar(p["prison"]),
+    )
+    reason = res["feasibility"]["reason"]
+    return [
+        _row(qid, "adhoc", i, ln["name"], "job", float(ln["units"]), ln["unit_cost_ex_vat"], ln["unit_cost_inc_vat"],
+             ln["line_total_ex_vat"], ln["line_total_inc_vat"], bool(ln["feasible"]), None if ln["feasible"] else reason)
+        for i, ln in enumerate(res["per_line"])
+    ]
+
+def _price_hosts(quotes: Dict) -> Dict:
+    # All host quotes sharing the same tariffs and VAT rate are priced in one vectorized call.
+    params, out = {}, {}
+    for qid, rows in quotes.items():
+        try:
+            params[qid] = _quote_params(rows[0])
+        except Exception as e:
+            out[qid] = _error_rows(qid, "host", 1, e)
+    groups: Dict = {}
+    for qid, p in params.items():
+        groups.setdefault((p["tariffs"], float(p["vat_rate"])), []).append(qid)
+    for (tariffs, vat_rate), qids in groups.items():
+        sc = pd.DataFrame([{k: v for k, v in params[q].items() if k != "tariffs"} for q in qids])
+        try:
+            q = generate_host_quotes(sc, tariffs=tariffs, vat_rate=vat_rate)
+        except Exception as e:
+            out.update({qid: _error_rows(qid, "host", 1, e) for qid in qids})
+            continue
+        nan = float("nan")
+        for qid, sub, grand in zip(qids, q["Subtotal"].tolist(), q["Grand Total (£/month)"].tolist()):
+            extra = len(quotes[qid]) - 1
+            note = f"{extra} extra input row(s) ignored: host quotes are priced from their first row" if extra else None
+            out[qid] = [_row(qid, "host", 0, "Host (monthly)", "month", nan, nan, nan, sub, grand, True, note)]
+    return out
+
+def price_chunk(df: pd.DataFrame, today: date) -> pd.DataFrame:
+    # Prices every complete quote in `df`; output rows follow input order.
+    quotes: Dict = {}
+    for r in df.to_dict("records"):
+        quotes.setdefault(r["quote_id"], []).append(r)
+    qtypes = {qid: str(rows[0].get("type")).strip().lower() for qid, rows in quotes.items()}
+    priced = _price_hosts({q: rows for q, rows in quotes.items() if qtypes[q] == "host"})
+    for qid, rows in quotes.items():
+        qtype = qtypes[qid]
+        if qtype == "host":
+            continue
+        try:
+            if qtype not in QUOTE_TYPES:
+                raise ValueError(f"Unknown quote type: {qtype!r}")
+            p = _quote_params(rows[0])
+            priced[qid] = _price_contractual(qid, rows, p) if qtype == "contractual" else _price_adhoc(qid, rows, p, today)
+        except Exception as e:
+            priced[qid] = _error_rows(qid, qtype, len(rows), e)
+    return pd.DataFrame([r for qid in quotes for r in priced[qid]], columns=OUTPUT_COLUMNS)
+
+# ---------- Streaming I/O ----------
+def _read_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if path.lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:  # optional dependency
+            raise RuntimeError("Parquet input needs pyarrow (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype={"quote_id": str})
+
+def quote_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    # Re-cut raw chunks on quote boundaries: the last (possibly partial) quote of a chunk
+    # is carried into the next one, so no quote is ever split across workers.
+    carry: Optional[pd.DataFrame] = None
+    for raw in _read_chunks(path, chunk_rows):
+        if "quote_id" not in raw or "type" not in raw:
+            raise ValueError("Input needs 'quote_id' and 'type' columns")
+        df = raw if carry is None else pd.concat([carry, raw], ignore_index=True)
+        last = df["quote_id"].iloc[-1]
+        tail = df["quote_id"].to_numpy() == last
+        cut = int(np.argmax(tail))   # first row of the trailing quote
+        if cut == 0:
+            carry = df
+            continue
+        carry = df.iloc[cut:].reset_index(drop=True)
+        yield df.iloc[:cut].reset_index(drop=True)
+    if carry is not None and len(carry):
+        yield carry
+
+class _Writer:
+    def __init__(self, path: str):
+        self.path = path
+        self.parquet = path.lower().endswith((".parquet", ".pq"))
+        self._pq = None
+        self._first = True
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df.astype({"quote_id": str, "Item": object, "Period": object, "Note": object}),
+                                         schema=_parquet_schema(), preserve_index=False)
+            if self._pq is None:
+                self._pq = pq.ParquetWriter(self.path, table.schema)
+            self._pq.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self) -> None:
+        if self._pq is not None:
+            self._pq.close()
+        elif self._first:
+            pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(self.path, index=False)
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("quote_id", pa.string()), ("type", pa.string()), ("line", pa.int64()), ("Item", pa.string()),
+        ("Period", pa.string()), ("Units", pa.float64()),
+        ("Unit Price ex VAT (£)", pa.float64()), ("Unit Price inc VAT (£)", pa.float64()),
+        ("Total ex VAT (£)", pa.float64()), ("Total inc VAT (£)", pa.float64()),
+        ("Feasible", pa.bool_()), ("Note", pa.string()),
+    ])
+
+def run_batch(
+    in_path: str,
+    out_path: str,
+    *,
+    workers: Optional[int] = None,
+    chunk_rows: int = 5000,
+    today: Optional[date] = None,
+) -> Dict:
+    # At most 2 × workers chunks are in flight, so memory stays bounded by chunk size.
+    today = today or date.today()
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    writer = _Writer(out_path)
+    stats = {"rows": 0, "quotes": 0, "errors": 0}
+    t0 = time.perf_counter()
+
+    def _emit(res: pd.DataFrame) -> None:
+        writer.write(res)
+        stats["rows"] += len(res)
+        stats["quotes"] += int(res["quote_id"].nunique())
+        stats["errors"] += int(res.loc[res["Note"].astype(str).str.startswith("Error:"), "quote_id"].nunique())
+
+    try:
+        if workers == 1:
+            for chunk in quote_chunks(in_path, chunk_rows):
+                _emit(price_chunk(chunk, today))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending: deque = deque()
+                for chunk in quote_chunks(in_path, chunk_rows):
+                    pending.append(pool.submit(price_chunk, chunk, today))
+                    while len(pending) >= 2 * workers:
+                        _emit(pending.popleft().result())
+                while pending:
+                    _emit(pending.popleft().result())
+    finally:
+        writer.close()
+    stats["seconds"] = time.perf_counter() - t0
+    return stats
+
+# ---------- CLI ----------
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Price a book of quote lines from CSV/Parquet.")
+    ap.add_argument("input", help="input .csv or .parquet")
+    ap.add_argument("output", help="output .csv or .parquet")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    ap.add_argument("--chunk-rows", type=int, default=5000, help="input rows per chunk")
+    ap.add_argument("--today", type=date.fromisoformat, default=None, help="pricing date for ad-hoc deadlines (YYYY-MM-DD)")
+    args = ap.parse_args(argv)
+
+    stats = run_batch(args.input, args.output, workers=args.workers, chunk_rows=args.chunk_rows, today=args.today)
+    print(
+        f"Priced {stats['quotes']:,} quotes ({stats['rows']:,} lines) in {stats['seconds']:.1f}s; "
+        f"{stats['errors']:,} failed -> {args.output}",
+        file=sys.stderr,
+    )
+    return 1 if stats["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+# bench.py
+# Micro-benchmarks for the pricing hot paths on synthetic workloads (1 to 100k items
+# or lines). Workloads are seeded, so two runs price exactly the same inputs.
+#
+#   python bench.py                                  # every case at 1, 100, 10k, 100k -> bench.json
+#   python bench.py --cases adhoc,export_pdf --sizes 1,1000
+#   python bench.py --out bench_baseline.json        # store a baseline
+#   python bench.py --baseline bench_baseline.json   # compare; exit 1 on a regression
+#
+# Each (case, size) is warmed up once, then timed --repeat times; a sample loops the
+# call until it takes at least --min-time seconds (timeit-style), so tiny workloads
+# are not lost in timer noise. Comparisons use the best sample per call (the least
+# disturbed by other load on the machine); a case is a regression when it is more
+# than --threshold slower than the baseline.
+# Cases whose per-call cost grows too fast for the biggest sizes have a max_n and
+# are reported as skipped above it.
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from io import BytesIO, StringIO
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from tariff import tariffs_for_band
+from production import (
+    _working_days_between, calculate_adhoc, calculate_production_contractual, clear_overhead_cache, weekly_overheads_total,
+)
+from production_engine import price_contractual_frame
+from host import generate_host_quote, generate_host_quotes
+from render import write_table
+from workdays import get_calendar
+
+DEFAULT_SIZES = (1, 100, 10_000, 100_000)
+TODAY = date(2025, 1, 6)   # fixed, so deadlines and bank holidays do not move between runs
+SEED = 2025
+
+# Quote-level inputs shared by every case
+PARAMS = {
+    "workshop_hours": 37.5, "prisoner_salary": 15.0, "supervisor_salaries": [42248.0, 48969.0],
+    "effective_pct": 100.0, "customer_covers_supervisors": False, "customer_type": "Commercial",
+    "apply_vat": True, "vat_rate": 20.0, "area_m2": 500.0, "usage_key": "medium", "dev_rate": 0.2,
+}
+TARIFFS = tariffs_for_band(PARAMS["usage_key"])
+
+# ---------- Synthetic workloads ----------
+def _items(n: int) -> List[Dict]:
+    rng = np.random.default_rng(SEED)
+    return [
+        {"name": f"Item {i+1}", "required": int(r), "minutes": float(m), "assigned": int(a)}
+        for i, (r, m, a) in enumerate(zip(rng.integers(1, 4, n), rng.uniform(2, 60, n).round(1), rng.integers(1, 6, n)))
+    ]
+
+def _lines(n: int) -> List[Dict]:
+    rng = np.random.default_rng(SEED)
+    return [
+        {"name": f"Line {i+1}", "units": int(u), "mins_per_item": float(m), "pris_per_item": int(p),
+         "deadline": TODAY + timedelta(days=int(d))}
+        for i, (u, m, p, d) in enumerate(zip(rng.integers(10, 500, n), rng.uniform(1, 30, n).round(1),
+                                             rng.integers(1, 3, n), rng.integers(5, 250, n)))
+    ]
+
+def _priced(n: int) -> pd.DataFrame:
+    items = _items(n)
+    return price_contractual_frame(
+        [it["minutes"] for it in items], [it["required"] for it in items], [it["assigned"] for it in items], 100,
+        names=[it["name"] for it in items], num_prisoners=sum(it["assigned"] for it in items), num_supervisors=2,
+        tariffs=TARIFFS, **PARAMS,
+    )
+
+# ---------- Cases ----------
+# Each setup builds the workload for size n (not timed) and returns the call to time.
+def _contractual(n: int) -> Callable:
+    items = _items(n)
+    num_prisoners = sum(it["assigned"] for it in items)
+    return lambda: calculate_production_contractual(
+        items, 100, num_prisoners=num_prisoners, num_supervisors=2, tariffs=TARIFFS, **PARAMS)
+
+def _contractual_frame(n: int) -> Callable:
+    items = _items(n)
+    minutes, required, assigned = (np.array([it[k] for it in items]) for k in ("minutes", "required", "assigned"))
+    names = [it["name"] for it in items]
+    return lambda: price_contractual_frame(
+        minutes, required, assigned, 100, names=names, num_prisoners=int(assigned.sum()), num_supervisors=2,
+        tariffs=TARIFFS, **PARAMS)
+
+def _adhoc(n: int) -> Callable:
+    lines = _lines(n)
+    cal = get_calendar()
+    return lambda: calculate_adhoc(lines, 100, num_prisoners=50, today=TODAY, tariffs=TARIFFS, calendar=cal, **PARAMS)
+
+def _host(n: int) -> Callable:
+    # n separate quotes (distinct areas, so the overhead memo misses on the first pass)
+    kw = {k: v for k, v in PARAMS.items() if k != "area_m2"}
+    def run():
+        for i in range(n):
+            generate_host_quote(area_m2=100.0 + i, num_prisoners=20, num_supervisors=2, tariffs=TARIFFS, **kw)
+    return run
+
+def _host_batch(n: int) -> Callable:
+    sc = pd.DataFrame({
+        "workshop_hours": PARAMS["workshop_hours"], "area_m2": 100.0 + np.arange(n), "usage_key": PARAMS["usage_key"],
+        "num_prisoners": 20, "prisoner_salary": PARAMS["prisoner_salary"], "num_supervisors": 2,
+        "customer_covers_supervisors": False, "supervisor_salaries": [PARAMS["supervisor_salaries"]] * n,
+        "effective_pct": PARAMS["effective_pct"], "customer_type": PARAMS["customer_type"], "dev_rate": PARAMS["dev_rate"],
+    })
+    return lambda: generate_host_quotes(sc, tariffs=TARIFFS)
+
+def _overheads(n: int) -> Callable:
+    # n distinct workshops on a cold memo: the cost of a cache miss
+    def run():
+        clear_overhead_cache()
+        for i in range(n):
+            weekly_overheads_total(37.5, 100.0 + i, "medium", 20, 2, False, tariffs=TARIFFS)
+    return run
+
+def _overheads_cached(n: int) -> Callable:
+    # the same workshop n times: the cost of a cache hit
+    weekly_overheads_total(37.5, 500.0, "medium", 20, 2, False, tariffs=TARIFFS)
+    def run():
+        for _ in range(n):
+            weekly_overheads_total(37.5, 500.0, "medium", 20, 2, False, tariffs=TARIFFS)
+    return run
+
+def _working_days(n: int) -> Callable:
+    cal = get_calendar()
+    ends = [ln["deadline"] for ln in _lines(n)]
+    return lambda: [_working_days_between(TODAY, e, cal) for e in ends]
+
+def _html(n: int) -> Callable:
+    df = _priced(n)
+    return lambda: write_table(df, StringIO())
+
+def _csv(n: int) -> Callable:
+    df = _priced(n)
+    return lambda: df.to_csv(BytesIO(), index=False)   # as Newapp.export_csv_bytes
+
+def _pdf(n: int) -> Callable:
+    from pdf_export import write_quote_pdf
+    host_df, _ = generate_host_quote(num_prisoners=20, num_supervisors=2, tariffs=TARIFFS, **PARAMS)
+    breakdown = dict(zip(host_df["Item"], host_df["Amount (£)"]))
+    df = _priced(n)
+    cols = ["Item", "Unit Price ex VAT (£)", "Units/week", "Capacity (units/week)"]
+    records = list(df[cols].itertuples(index=False, name=None))
+    return lambda: write_quote_pdf(
+        BytesIO(), quote_num="BENCH0001", region="National", prison="Altcourse", customer="Bench Ltd",
+        workshop_mode="Production", breakdown=breakdown, production_headers=cols, today=TODAY,
+        production_rows=((name, f"£{p:,.2f}", u, c) for name, p, u, c in records),
+    )
+
+def _reprice(n: int) -> Callable:
+    # n book lines of 1 + 8 coefficients each, repriced after a tariff change
+    from coefficients import CoefficientBook, N_COLS, RATE_FIELDS, parse_changes
+    rng = np.random.default_rng(SEED)
+    width = 1 + len(RATE_FIELDS)
+    first = 1 + rng.integers(0, (N_COLS - 1) // len(RATE_FIELDS), n) * len(RATE_FIELDS)
+    indices = np.column_stack([np.zeros(n, np.int64), first[:, None] + np.arange(len(RATE_FIELDS))])
+    cb = CoefficientBook({
+        "indptr": np.arange(n + 1, dtype=np.int64) * width, "indices": indices.ravel().astype(np.int32),
+        "data": rng.uniform(0, 100, n * width), "vat_factor": np.full(n, 1.2),
+        "per_unit": np.ones(n, dtype=bool), "units": rng.integers(1, 500, n).astype(float),
+    }, {})
+    changes = parse_changes(["electricity_rate=0.31", "gas_rate=0.07"])
+    return lambda: cb.prices(changes)
+
+# name -> (setup, unit, max_n)
+CASES: Dict[str, Tuple[Callable[[int], Callable], str, Optional[int]]] = {
+    "contractual": (_contractual, "items", None),
+    "contractual_frame": (_contractual_frame, "items", None),
+    "adhoc": (_adhoc, "lines", None),
+    "host_quote": (_host, "quotes", 10_000),
+    "host_quotes_batch": (_host_batch, "quotes", None),
+    "overheads_miss": (_overheads, "calls", None),
+    "overheads_hit": (_overheads_cached, "calls", None),
+    "working_days": (_working_days, "pairs", None),
+    "export_html": (_html, "rows", None),
+    "export_csv": (_csv, "rows", None),
+    "export_pdf": (_pdf, "rows", None),
+    "reprice_coefficients": (_reprice, "lines", None),
+}
+
+# ---------- Timing ----------
+def time_call(fn: Callable, *, repeat: int = 5, min_time: float = 0.05) -> Dict:
+    fn()   # warm-up: imports, memo entries, lazily built tables
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10 if dt < min_time / 10 else 2
+    samples = [dt / loops]
+    # calls of a second or more are slow enough that three samples will do
+    for _ in range((repeat if dt < 1.0 else min(repeat, 3)) - 1):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        samples.append((time.perf_counter() - t0) / loops)
+    return {"median_s": statistics.median(samples), "best_s": min(samples), "loops": loops, "repeat": len(samples)}
+
+def run_benchmarks(cases: List[str], sizes: List[int], *, repeat: int = 5, min_time: float = 0.05, log=print) -> List[Dict]:
+    results = []
+    for name in cases:
+        setup, unit, max_n = CASES[name]
+        for n in sizes:
+            row = {"case": name, "n": n, "unit": unit}
+            if max_n is not None and n > max_n:
+                row["skipped"] = f"n > {max_n}"
+            else:
+                row.update(time_call(setup(n), repeat=repeat, min_time=min_time))
+                row["per_unit_us"] = row["median_s"] / n * 1e6
+            results.append(row)
+            if log:
+                log(_format_row(row))
+    return results
+
+def _format_row(r: Dict) -> str:
+    if "skipped" in r:
+        return f"{r['case']:18} n={r['n']:>7}  skipped ({r['skipped']})"
+    return (f"{r['case']:18} n={r['n']:>7}  {r['median_s'] * 1e3:10.3f} ms  "
+            f"{r['per_unit_us']:9.3f} us/{r['unit'].rstrip('s')}")
+
+# ---------- Baseline comparison ----------
+def compare(results: List[Dict], baseline: List[Dict], threshold: float = 0.25) -> List[Dict]:
+    # Ratio of best times per (case, n) present in both; cases missing from the
+    # baseline are not compared.
+    base = {(b["case"], b["n"]): b for b in baseline if "best_s" in b}
+    out = []
+    for r in results:
+        b = base.get((r["case"], r["n"]))
+        if b is None or "best_s" not in r:
+            continue
+        ratio = r["best_s"] / b["best_s"] if b["best_s"] > 0 else float("inf")
+        status = "regression" if ratio > 1 + threshold else "faster" if ratio < 1 / (1 + threshold) else "same"
+        out.append({"case": r["case"], "n": r["n"], "baseline_s": b["best_s"], "best_s": r["best_s"],
+                    "ratio": ratio, "status": status})
+    return out
+
+def _environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the pricing hot paths on synthetic workloads.")
+    ap.add_argument("--cases", default=",".join(CASES), help=f"comma-separated, from: {', '.join(CASES)}")
+    ap.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES), help="comma-separated item/line counts")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.05, help="seconds per timing sample")
+    ap.add_argument("--out", default="bench.json", help="write results here ('' to skip)")
+    ap.add_argument("--baseline", help="results file from an earlier run to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="slowdown that counts as a regression (0.25 = 25%%)")
+    args = ap.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        ap.error(f"unknown case(s): {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    report = {"environment": _environment(), "results": run_benchmarks(cases, sizes, repeat=args.repeat, min_time=args.min_time)}
+    failed = False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        report["baseline"] = {"path": args.baseline, "environment": base.get("environment"), "threshold": args.threshold}
+        report["comparison"] = compare(report["results"], base.get("results", []), args.threshold)
+        print(f"\nvs {args.baseline} (commit {(base.get('environment') or {}).get('commit')}):")
+        for c in report["comparison"]:
+            flag = "  <-- REGRESSION" if c["status"] == "regression" else ""
+            print(f"{c['case']:18} n={c['n']:>7}  {c['baseline_s'] * 1e3:10.3f} -> {c['best_s'] * 1e3:10.3f} ms  x{c['ratio']:.2f}{flag}")
+        failed = any(c["status"] == "regression" for c in report["comparison"])
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
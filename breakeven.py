@@ -0,0 +1,193 @@
+# breakeven.py
+# Reverse pricing: find the input value that brings a price to a target, for every
+# item (or host scenario) at once, by vectorized bisection over the pricing kernels.
+#   Contractual (per item, target unit price):
+#     "output_pct"     Output % needed                  (price falls as it rises)
+#     "workshop_hours" weekly hours needed              (price falls as it rises)
+#     "assigned"       prisoners on this item           (price falls as it rises)
+#     "units"          units/week to cover costs        (price falls as it rises)
+#   Host (per scenario, target monthly grand total):
+#     "workshop_hours" / "num_prisoners"                 (total rises with both)
+# Falling prices return the smallest value that reaches the target, rising totals the
+# largest value that stays within it. Unreachable targets give NaN.
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from tariff import Tariffs
+from production_engine import contract_totals, contractual_kernel, monthly_overheads_arrays, _int_targets
+from host import host_breakdown_arrays, scenario_arrays
+from tracing import traced
+
+CONTRACTUAL_VARIABLES = ("output_pct", "workshop_hours", "assigned", "units")
+HOST_VARIABLES = ("workshop_hours", "num_prisoners")
+
+# ---------- Bisection ----------
+def bisect_to_target(
+    f: Callable[[np.ndarray], np.ndarray],
+    lo,
+    hi,
+    target,
+    *,
+    integer: bool = False,
+    tol: float = 1e-6,
+    max_iter: int = 200,
+) -> Dict[str, np.ndarray]:
+    # f maps an array of x (one per problem) to an array of values; NaN counts as +inf.
+    def g(x):
+        v = np.asarray(f(x), dtype=float)
+        return np.where(np.isnan(v), np.inf, v)
+
+    lo = np.asarray(lo, dtype=float).copy()
+    hi = np.asarray(hi, dtype=float).copy()
+    target = np.broadcast_to(np.asarray(target, dtype=float), lo.shape)
+    flo, fhi = g(lo), g(hi)
+    falling = flo >= fhi
+    good = np.where(falling, hi, lo)          # side that meets the target
+    bad = np.where(falling, lo, hi)
+    reachable = np.where(falling, fhi, flo) <= target
+    # already met at the far end -> that end is the answer
+    done_early = np.where(falling, flo, fhi) <= target
+    good = np.where(done_early, bad, good)
+
+    active = reachable & ~done_early
+    for _ in range(max_iter):
+        gap = np.abs(good - bad)
+        active &= gap > (1.0 if integer else tol)
+        if not active.any():
+            break
+        mid = (good + bad) / 2.0
+        if integer:
+            mid = np.where(falling, np.floor(mid), np.ceil(mid))
+        ok = g(mid) <= target
+        good = np.where(active & ok, mid, good)
+        bad = np.where(active & ~ok, mid, bad)
+
+    x = np.where(reachable, good, np.nan)
+    achieved = np.where(reachable, g(np.where(reachable, good, lo)), np.nan)
+    return {"x": x, "achieved": achieved, "reachable": reachable}
+
+# ---------- Contractual ----------
+@traced("analysis.break_even")
+def solve_contractual(
+    items: List[Dict],
+    output_pct: float,
+    *,
+    variable: str,
+    target_price,                 # scalar or one per item
+    inc_vat: bool = False,
+    lo=None,
+    hi=None,
+    tol: float = 1e-6,
+    tariffs: Tariffs,
+    workshop_hours: float,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_covers_supervisors: bool,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    num_supervisors: int,
+    dev_rate: float,
+    pricing_mode: str = "as-is",
+    targets: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    if variable not in CONTRACTUAL_VARIABLES:
+        raise ValueError(f"variable must be one of {CONTRACTUAL_VARIABLES}")
+    n = len(items)
+    minutes = np.array([float(it.get("minutes", 0)) for it in items])
+    required = np.array([int(it.get("required", 1)) for it in items])
+    assigned = np.array([int(it.get("assigned", 0)) for it in items])
+    mode = "target" if variable == "units" else pricing_mode
+    tgt = _int_targets(targets, n) if mode == "target" else None
+    vat_mult = (1 + float(vat_rate) / 100.0) if (inc_vat and customer_type == "Commercial" and apply_vat) else 1.0
+    inst, _ = contract_totals(supervisor_salaries, effective_pct, customer_covers_supervisors, customer_type, 0.0, dev_rate)
+    dev_factor = float(dev_rate) if customer_type == "Commercial" else 0.0
+
+    def overheads(hours):
+        return monthly_overheads_arrays(
+            hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors, tariffs=tariffs,
+        )["overheads_weekly"]
+
+    base_ovh = overheads(float(workshop_hours))
+    total_assigned = int(assigned.sum())
+
+    def price(x):
+        hours, out, a, units, ovh = float(workshop_hours), float(output_pct), assigned, tgt, base_ovh
+        denom = None
+        if variable == "output_pct":
+            out = x
+        elif variable == "workshop_hours":
+            hours = x
+            ovh = overheads(x)
+            denom = total_assigned * x * 60.0
+        elif variable == "assigned":
+            a = x.astype(np.int64)
+            denom = (total_assigned - assigned + a) * float(workshop_hours) * 60.0
+        else:
+            units = x
+        k = contractual_kernel(
+            minutes, required, a, workshop_hours=hours, output_pct=out, prisoner_salary=prisoner_salary,
+            inst_weekly_total=inst, overheads_weekly=ovh, dev_weekly_total=ovh * dev_factor,
+            pricing_mode=mode, targets=units, denom=denom,
+        )
+        return k["unit_cost"] * vat_mult
+
+    defaults = {
+        "output_pct": (1e-6, 100.0),
+        "workshop_hours": (1e-6, 168.0),
+        "assigned": (1, np.maximum(1, assigned + max(0, int(num_prisoners) - total_assigned))),
+        "units": (1, 10 ** 9),
+    }
+    d_lo, d_hi = defaults[variable]
+    lo = np.broadcast_to(np.asarray(d_lo if lo is None else lo, dtype=float), (n,))
+    hi = np.broadcast_to(np.asarray(d_hi if hi is None else hi, dtype=float), (n,))
+    r = bisect_to_target(price, lo, hi, target_price, integer=variable in ("assigned", "units"), tol=tol)
+
+    return pd.DataFrame({
+        "Item": [((it.get("name") or "").strip() or f"Item {i+1}") for i, it in enumerate(items)],
+        "Variable": variable,
+        "Target price (£)": np.broadcast_to(np.asarray(target_price, dtype=float), (n,)),
+        "Solution": r["x"],
+        "Price at solution (£)": r["achieved"],
+        "Reachable": r["reachable"],
+    })
+
+# ---------- Host ----------
+def solve_host(
+    scenarios: pd.DataFrame,
+    *,
+    variable: str,
+    target_total,                 # scalar or one per scenario (grand total £/month)
+    lo=None,
+    hi=None,
+    tol: float = 1e-6,
+    tariffs: Tariffs,
+    vat_rate: float = 20.0,
+) -> pd.DataFrame:
+    # `scenarios` uses the same columns as host.generate_host_quotes.
+    if variable not in HOST_VARIABLES:
+        raise ValueError(f"variable must be one of {HOST_VARIABLES}")
+    sc = scenarios
+    n = len(sc)
+    cols = scenario_arrays(sc)
+
+    def total(x):
+        kw = dict(cols)
+        kw[variable] = x.astype(np.int64) if variable == "num_prisoners" else x
+        return host_breakdown_arrays(**kw, vat_rate=vat_rate, tariffs=tariffs)["Grand Total (£/month)"]
+
+    d_lo, d_hi = {"workshop_hours": (0.0, 168.0), "num_prisoners": (0, 10_000)}[variable]
+    lo = np.broadcast_to(np.asarray(d_lo if lo is None else lo, dtype=float), (n,))
+    hi = np.broadcast_to(np.asarray(d_hi if hi is None else hi, dtype=float), (n,))
+    r = bisect_to_target(total, lo, hi, target_total, integer=variable == "num_prisoners", tol=tol)
+    out = sc.drop(columns=[c for c in ("supervisor_salaries",) if c in sc]).copy()
+    out["Target total (£/month)"] = np.broadcast_to(np.asarray(target_total, dtype=float), (n,))
+    out[f"Max {variable}"] = r["x"]
+    out["Total at solution (£/month)"] = r["achieved"]
+    out["Reachable"] = r["reachable"]
+    return out
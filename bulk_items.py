@@ -0,0 +1,224 @@
+# bulk_items.py
+# Table-based entry for contractual items and ad-hoc lines (grid, CSV upload, paste
+# from a spreadsheet). Tables are validated column by column, not row by row, and
+# contractual items go straight into the columnar pricing engine.
+# Canonical column keys match batch_price.py line columns:
+#   items: name, required, minutes, assigned, target
+#   adhoc: name, units, minutes, required, deadline
+from datetime import date
+from io import StringIO
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from production_engine import price_contractual_frame
+from tracing import traced
+
+# key -> header shown in the grid and written to CSV templates
+ITEM_COLUMNS = {
+    "name": "Item",
+    "required": "Prisoners to make one",
+    "minutes": "Minutes to make one",
+    "assigned": "Prisoners assigned",
+    "target": "Target units/week",
+}
+ADHOC_COLUMNS = {
+    "name": "Item",
+    "units": "Units requested",
+    "minutes": "Minutes to make one",
+    "required": "Prisoners to make one",
+    "deadline": "Deadline",
+}
+ITEM_DEFAULTS = {"name": "", "required": 1, "minutes": 10.0, "assigned": 0, "target": 0}
+ADHOC_DEFAULTS = {"name": "", "units": 100, "minutes": 10.0, "required": 1, "deadline": None}
+
+# Extra header spellings accepted from customer spreadsheets
+_ALIASES = {
+    "item": "name", "item name": "name", "sku": "name", "product": "name",
+    "prisoners required": "required", "prisoners per item": "required", "pris_per_item": "required",
+    "minutes per item": "minutes", "mins": "minutes", "mins_per_item": "minutes",
+    "prisoners": "assigned", "target": "target", "target units": "target", "units/week": "target",
+    "units": "units", "quantity": "units", "qty": "units", "due": "deadline", "due date": "deadline",
+}
+
+_MAX_ROWS_LISTED = 10
+
+# ---------- Reading ----------
+def read_table(src) -> pd.DataFrame:
+    # CSV/TSV from an uploaded file or pasted text; the separator is sniffed, so rows
+    # copied straight out of Excel (tab-separated) work as well as CSV files.
+    if isinstance(src, str):
+        src = StringIO(src.strip("\n"))
+    return pd.read_csv(src, sep=None, engine="python", dtype=str, keep_default_na=False, skipinitialspace=True)
+
+def conform(df: pd.DataFrame, columns: Dict[str, str], defaults: Dict) -> pd.DataFrame:
+    # Rename known headers to canonical keys, drop the rest, add missing columns with
+    # their defaults and drop rows that are entirely blank.
+    lookup = {k: k for k in columns}
+    lookup.update({h.lower(): k for k, h in columns.items()})
+    lookup.update({a: k for a, k in _ALIASES.items() if k in columns})
+    renamed = {}
+    for c in df.columns:
+        k = lookup.get(str(c).strip().lower())
+        if k is not None and k not in renamed.values():
+            renamed[c] = k
+    out = df[list(renamed)].rename(columns=renamed)
+    if len(out.columns):
+        blank = np.logical_and.reduce([_blank(out[c]) for c in out.columns])
+        if blank.any():
+            out = out[~blank]
+    for k in columns:
+        if k not in out.columns:
+            out[k] = defaults[k]
+    return out[list(columns)].reset_index(drop=True)
+
+@traced("validate.table_load")
+def editable(df: pd.DataFrame, columns: Dict[str, str], defaults: Dict) -> Tuple[pd.DataFrame, List[str]]:
+    # Typed copy of a loaded table for the grid: numbers as floats (empty where the
+    # value could not be read, reported in the errors), deadlines as dates.
+    df = conform(df, columns, defaults)
+    errors: List[str] = []
+    out = {}
+    for k, h in columns.items():
+        if k == "name":
+            out[k] = df[k].fillna("").astype(str).str.strip()
+        elif k == "deadline":
+            d = _dates(df[k])
+            _check(d.isna().to_numpy(), f"{h} must be a date (e.g. 2025-03-31)", errors)
+            out[k] = d.dt.date
+        else:
+            out[k] = _numbers(df, k, defaults[k], errors, h)
+    return pd.DataFrame(out, columns=list(columns)), errors
+
+def blank_items(n: int = 1) -> pd.DataFrame:
+    return pd.DataFrame({k: [v] * n for k, v in ITEM_DEFAULTS.items()})
+
+def blank_adhoc(n: int = 1, today: Optional[date] = None) -> pd.DataFrame:
+    defaults = dict(ADHOC_DEFAULTS, deadline=today or date.today())
+    return pd.DataFrame({k: [v] * n for k, v in defaults.items()})
+
+def template_csv(columns: Dict[str, str]) -> bytes:
+    return (",".join(columns.values()) + "\n").encode("utf-8")
+
+# ---------- Validation ----------
+def _blank(values: pd.Series) -> np.ndarray:
+    # Missing or whitespace-only cells; numeric columns (widgets, grid) skip the string pass
+    kind = values.dtype.kind
+    if kind in "iub":
+        return np.zeros(len(values), dtype=bool)
+    if kind == "f":
+        return np.isnan(values.to_numpy())
+    return (values.isna() | (values.astype(str).str.strip() == "")).to_numpy()
+
+def _dates(values: pd.Series) -> pd.Series:
+    # ISO dates first, then UK day-first (31/12/2025) for anything left
+    iso = pd.to_datetime(values, errors="coerce", format="ISO8601")
+    rest = pd.to_datetime(values.where(iso.isna()), errors="coerce", dayfirst=True, format="mixed")
+    return iso.fillna(rest)
+
+def _rows(mask: np.ndarray) -> str:
+    idx = np.flatnonzero(mask) + 1
+    listed = ", ".join(str(i) for i in idx[:_MAX_ROWS_LISTED])
+    more = f" (+{len(idx) - _MAX_ROWS_LISTED} more)" if len(idx) > _MAX_ROWS_LISTED else ""
+    return f"Row{'s' if len(idx) > 1 else ''} {listed}{more}"
+
+def _numbers(df: pd.DataFrame, key: str, default, errors: List[str], header: str) -> np.ndarray:
+    raw = df[key]
+    blank = _blank(raw)
+    if raw.dtype.kind in "iubf":
+        vals = raw.to_numpy(dtype=float, copy=True)
+        vals[blank] = default
+    else:
+        vals = pd.to_numeric(raw.where(~blank, default), errors="coerce").to_numpy(dtype=float)
+    bad = np.isnan(vals)
+    if bad.any():
+        errors.append(f"{_rows(bad)}: {header} must be a number")
+    return vals
+
+def _check(bad: np.ndarray, message: str, errors: List[str]) -> None:
+    if bad.any():
+        errors.append(f"{_rows(bad)}: {message}")
+
+@traced("validate.items")
+def items_frame(df: pd.DataFrame, *, pricing_mode: str = "as-is", num_prisoners: Optional[int] = None) -> Tuple[pd.DataFrame, List[str]]:
+    # Canonical typed items (name str, required/assigned/target int64, minutes float)
+    # plus error messages; the frame is only safe to price when the list is empty.
+    df = conform(df, ITEM_COLUMNS, ITEM_DEFAULTS)
+    errors: List[str] = []
+    h = ITEM_COLUMNS
+    required = _numbers(df, "required", ITEM_DEFAULTS["required"], errors, h["required"])
+    minutes = _numbers(df, "minutes", ITEM_DEFAULTS["minutes"], errors, h["minutes"])
+    assigned = _numbers(df, "assigned", ITEM_DEFAULTS["assigned"], errors, h["assigned"])
+    target = _numbers(df, "target", ITEM_DEFAULTS["target"], errors, h["target"])
+    with np.errstate(invalid="ignore"):
+        _check(required < 1, f"{h['required']} must be at least 1", errors)
+        _check(minutes <= 0, f"{h['minutes']} must be > 0", errors)
+        _check(assigned < 0, f"{h['assigned']} cannot be negative", errors)
+        if pricing_mode == "target":
+            _check(target < 0, f"{h['target']} cannot be negative", errors)
+    if not len(df):
+        errors.append("Add at least one item")
+
+    out = pd.DataFrame({
+        "name": df["name"].fillna("").astype(str).str.strip().to_numpy(dtype=object),
+        "required": np.nan_to_num(required, nan=1).astype(np.int64),
+        "minutes": np.nan_to_num(minutes, nan=0.0),
+        "assigned": np.nan_to_num(assigned, nan=0).astype(np.int64),
+        "target": np.nan_to_num(target, nan=0).astype(np.int64),
+    })
+    if num_prisoners is not None:
+        total = int(out["assigned"].sum())
+        if total > int(num_prisoners):
+            errors.append(f"Prisoners assigned across items ({total}) exceed total prisoners ({int(num_prisoners)}).")
+    return out, errors
+
+@traced("validate.adhoc_lines")
+def adhoc_lines(df: pd.DataFrame) -> Tuple[List[Dict], List[str]]:
+    # Lines in calculate_adhoc's shape plus error messages
+    df = conform(df, ADHOC_COLUMNS, ADHOC_DEFAULTS)
+    errors: List[str] = []
+    h = ADHOC_COLUMNS
+    units = _numbers(df, "units", ADHOC_DEFAULTS["units"], errors, h["units"])
+    minutes = _numbers(df, "minutes", ADHOC_DEFAULTS["minutes"], errors, h["minutes"])
+    required = _numbers(df, "required", ADHOC_DEFAULTS["required"], errors, h["required"])
+    deadline = _dates(df["deadline"])
+    with np.errstate(invalid="ignore"):
+        _check(units <= 0, f"{h['units']} must be > 0", errors)
+        _check(required <= 0, f"{h['required']} must be > 0", errors)
+        _check(minutes <= 0, f"{h['minutes']} must be > 0", errors)
+    _check(deadline.isna().to_numpy(), f"{h['deadline']} must be a date (e.g. 2025-03-31)", errors)
+    if not len(df):
+        errors.append("Add at least one line")
+    if errors:
+        return [], errors
+
+    names = df["name"].fillna("").astype(str).str.strip().tolist()
+    return [
+        {"name": nm or f"Item {i+1}", "units": int(u), "deadline": d, "pris_per_item": int(r), "mins_per_item": float(m)}
+        for i, (nm, u, d, r, m) in enumerate(zip(names, units.tolist(), deadline.dt.date.tolist(), required.tolist(), minutes.tolist()))
+    ], errors
+
+# ---------- Pricing ----------
+def price_items(items: pd.DataFrame, output_pct: int, *, quote=None, **kwargs) -> pd.DataFrame:
+    # `items` from items_frame; kwargs as for production_engine.price_contractual_frame.
+    # In target mode the targets default to the frame's target column. Pass an
+    # incremental.IncrementalContractual as `quote` to reprice only what changed since
+    # its previous call.
+    if kwargs.get("pricing_mode") == "target" and kwargs.get("targets") is None:
+        kwargs["targets"] = items["target"].to_numpy()
+    pricer = quote.update if quote is not None else price_contractual_frame
+    return pricer(
+        items["minutes"].to_numpy(),
+        items["required"].to_numpy(),
+        items["assigned"].to_numpy(),
+        output_pct,
+        names=items["name"].tolist(),
+        **kwargs,
+    )
+
+def items_to_dicts(items: pd.DataFrame) -> List[Dict]:
+    # items in the dict form used by the scalar pricing, sensitivity and optimiser APIs
+    return [
+        {"name": n, "required": int(r), "minutes": float(m), "assigned": int(a)}
+        for n, r, m, a in zip(items["name"].tolist(), items["required"].tolist(), items["minutes"].tolist(), items["assigned"].tolist())
+    ]
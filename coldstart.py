@@ -0,0 +1,176 @@
+# coldstart.py
+# Cold-start budget for the Streamlit entry points (what a user waits for on a new pod).
+# Every run is a fresh interpreter, like a new container:
+#   interpreter_ms  process start until `import streamlit` begins
+#   streamlit_ms    importing streamlit itself (fixed cost, not ours)
+#   first_paint_ms  first script run of the entry point: app imports + first render
+#   total_ms        wall time of the child process as seen by the parent
+#   heavy           heavy modules loaded by the first paint (should be none)
+# The median of --runs is checked against the budgets and appended to --out (JSONL).
+# The exit status is 1 if an entry point fails to render, or is over a budget that was
+# set explicitly (flag or environment) or with --strict; over a default budget is a
+# warning only.
+#
+#   python coldstart.py                       # Newapp.py and App.py, 5 runs each
+#   python coldstart.py Newapp.py --runs 9 --importtime
+#   python coldstart.py --no-pyc-cache        # as if the image shipped without .pyc files
+#   python coldstart.py --budget-first-paint 500 --budget-total 1500
+#   python coldstart.py --strict              # fail on the default budgets too
+#
+# The default BUDGETS come from a single-vCPU Linux container (Python 3.11.7, streamlit
+# 1.65) under typical load: first-paint medians of 250-300 ms (App.py) and 330-460 ms
+# (Newapp.py), totals of 750-1100 ms, plus headroom. To gate a build, set limits for
+# that machine with --budget-first-paint / --budget-total or with
+# COSTING_BUDGET_FIRST_PAINT_MS / COSTING_BUDGET_TOTAL_MS (e.g. in CI); the flags win
+# over the environment.
+#
+# Ship images with bytecode compiled (`python -m compileall -q .` in the build) so a
+# new pod does not pay for compiling the app and its dependencies.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "reportlab")
+
+# Median first paint / total per entry point, in ms (advisory unless --strict)
+BUDGETS: Dict[str, Dict[str, float]] = {
+    "Newapp.py": {"first_paint_ms": 600.0, "total_ms": 1500.0},
+    "App.py": {"first_paint_ms": 450.0, "total_ms": 1500.0},
+}
+BUDGET_ENV = {"first_paint_ms": "COSTING_BUDGET_FIRST_PAINT_MS", "total_ms": "COSTING_BUDGET_TOTAL_MS"}
+
+def budget_for(entry: str, overrides: Optional[Dict[str, Optional[float]]] = None) -> Tuple[Dict[str, float], List[str]]:
+    # BUDGETS for the entry point, then the environment, then explicit overrides;
+    # also returns which limits were set explicitly
+    budget = dict(BUDGETS.get(os.path.basename(entry), {}))
+    explicit = set()
+    for k, var in BUDGET_ENV.items():
+        if os.environ.get(var, "").strip():
+            budget[k] = float(os.environ[var])
+            explicit.add(k)
+    for k, v in (overrides or {}).items():
+        if v is not None:
+            budget[k] = float(v)
+            explicit.add(k)
+    return budget, sorted(explicit)
+
+_CHILD = r"""
+import json, sys, time
+t_start = time.perf_counter()
+import streamlit
+t_st = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+t0 = time.perf_counter()
+at.run()
+t1 = time.perf_counter()
+print(json.dumps({
+    "streamlit_ms": (t_st - t_start) * 1e3,
+    "first_paint_ms": (t1 - t0) * 1e3,
+    "heavy": [m for m in sys.argv[2].split(",") if m in sys.modules],
+    "error": "; ".join(str(e.value) for e in at.exception) or None,
+}))
+"""
+
+def measure_once(entry: str, *, pycache: Optional[str] = None, importtime: bool = False) -> Dict:
+    env = dict(os.environ)
+    if pycache:
+        env["PYTHONPYCACHEPREFIX"] = pycache
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _CHILD, entry, ",".join(HEAVY_MODULES)]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=HERE, env=env, capture_output=True, text=True)
+    total_ms = (time.perf_counter() - t0) * 1e3
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}", "total_ms": total_ms}
+    res = json.loads(proc.stdout.strip().splitlines()[-1])
+    res["total_ms"] = total_ms
+    res["interpreter_ms"] = max(0.0, total_ms - res["streamlit_ms"] - res["first_paint_ms"])
+    if importtime:
+        res["slowest_imports"] = _slowest_imports(proc.stderr)
+    return res
+
+def _slowest_imports(stderr: str, n: int = 15) -> List[Dict]:
+    # -X importtime lines: "import time: self [us] | cumulative | imported package";
+    # nesting is shown by indentation, keep the top-level imports only
+    rows = []
+    for line in stderr.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        if not name.startswith(" "):
+            rows.append({"module": name.strip(), "cumulative_ms": int(parts[1]) / 1e3})
+    return sorted(rows, key=lambda r: -r["cumulative_ms"])[:n]
+
+def measure(entry: str, runs: int = 5, *, no_pyc_cache: bool = False, importtime: bool = False,
+            budget: Optional[Dict[str, Optional[float]]] = None, strict: bool = False) -> Dict:
+    samples = []
+    for i in range(runs):
+        # a fresh prefix each run makes every run compile from source
+        with tempfile.TemporaryDirectory() as d:
+            samples.append(measure_once(entry, pycache=d if no_pyc_cache else None, importtime=importtime and i == 0))
+    errors = [s["error"] for s in samples if s.get("error")]
+    ok = [s for s in samples if not s.get("error")]
+    out = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "entry": entry,
+        "runs": runs,
+        "no_pyc_cache": no_pyc_cache,
+        "python": sys.version.split()[0],
+        "error": errors[0] if errors else None,
+    }
+    for k in ("interpreter_ms", "streamlit_ms", "first_paint_ms", "total_ms"):
+        vals = [s[k] for s in ok]
+        out[k] = round(statistics.median(vals), 1) if vals else None
+    out["heavy"] = sorted({m for s in ok for m in s["heavy"]})
+    if ok and "slowest_imports" in ok[0]:
+        out["slowest_imports"] = ok[0]["slowest_imports"]
+    budget, explicit = budget_for(entry, budget)
+    out["budget"] = budget
+    out["over_budget"] = [k for k, limit in budget.items() if out.get(k) is None or out[k] > limit]
+    out["enforced"] = list(budget) if strict else explicit
+    return out
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Measure cold start (import + first paint) of the Streamlit apps.")
+    ap.add_argument("entries", nargs="*", default=list(BUDGETS))
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--out", default="coldstart.jsonl", help="append results here ('' to skip)")
+    ap.add_argument("--no-pyc-cache", action="store_true", help="compile from source on every run")
+    ap.add_argument("--importtime", action="store_true", help="also list the slowest top-level imports")
+    ap.add_argument("--budget-first-paint", type=float, default=None, metavar="MS", help="first-paint limit for every entry point")
+    ap.add_argument("--budget-total", type=float, default=None, metavar="MS", help="total limit for every entry point")
+    ap.add_argument("--strict", action="store_true", help="fail when over the default budgets too")
+    args = ap.parse_args(argv)
+
+    failed = False
+    for entry in args.entries:
+        res = measure(entry, args.runs, no_pyc_cache=args.no_pyc_cache, importtime=args.importtime,
+                      budget={"first_paint_ms": args.budget_first_paint, "total_ms": args.budget_total},
+                      strict=args.strict)
+        failing = bool(res["error"]) or any(k in res["enforced"] for k in res["over_budget"])
+        status = "FAIL" if failing else "WARN" if res["over_budget"] else "ok"
+        print(f"{status:4} {entry}: first paint {res['first_paint_ms']} ms, total {res['total_ms']} ms "
+              f"(interpreter {res['interpreter_ms']}, streamlit {res['streamlit_ms']}); heavy={res['heavy'] or '-'}")
+        if res["error"]:
+            print(f"     error: {res['error']}")
+        for k in res["over_budget"]:
+            print(f"     over budget: {k} {res.get(k)} > {res['budget'][k]}")
+        for r in res.get("slowest_imports", []):
+            print(f"     {r['cumulative_ms']:8.1f} ms  {r['module']}")
+        if args.out:
+            with open(args.out, "a", encoding="utf-8") as f:
+                f.write(json.dumps(res) + "\n")
+        failed |= failing
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
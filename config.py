@@ -11,6 +11,9 @@ class AppConfig:
     APPORTION_MAINTENANCE: bool = True    # maintenance IS hours-apportioned
     DEFAULT_ADMIN_MONTHLY: float = 150.0
     GLOBAL_OUTPUT_DEFAULT: int = 100
+    OVERHEAD_CACHE_SIZE: int = 4096       # LRU entries for memoized overheads
+    QUOTE_DB_PATH: str = "quotes.db"      # SQLite quote store (WAL mode)
+    QUOTE_DB_POOL_SIZE: int = 4           # pooled connections per process
 
 CFG = AppConfig()
 
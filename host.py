@@ -1,11 +1,14 @@
 # host.py
 # Host monthly breakdown; Development charge uses same question as Production.
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
+import numpy as np
 import pandas as pd
-import streamlit as st
-from config import CFG
-from production import monthly_energy_costs, monthly_water_costs, monthly_maintenance
+from tariff import Tariffs
+from production import _resolve_tariffs, monthly_overheads
+from production_engine import monthly_overheads_arrays
+from tracing import traced
 
+@traced("pricing.host")
 def generate_host_quote(
     *,
     workshop_hours: float,
@@ -21,7 +24,9 @@ def generate_host_quote(
     apply_vat: bool,          # kept in signature for compatibility; we'll pass True
     vat_rate: float,          # we will pass 20.0
     dev_rate: float,          # 0..0.2 (or your chosen scale)
+    tariffs: Optional[Tariffs] = None,
 ) -> Tuple[pd.DataFrame, Dict]:
+    t = _resolve_tariffs(tariffs)
     breakdown: Dict[str, float] = {}
     breakdown["Prisoner wages"] = float(num_prisoners) * float(prisoner_salary) * (52.0 / 12.0)
 
@@ -30,10 +35,11 @@ def generate_host_quote(
         instructor_cost = sum((s / 12.0) * (float(effective_pct) / 100.0) for s in supervisor_salaries)
     breakdown["Instructors"] = instructor_cost
 
-    elec_m, gas_m = monthly_energy_costs(workshop_hours, area_m2, usage_key)
-    water_m = monthly_water_costs(num_prisoners, num_supervisors, customer_covers_supervisors, usage_key)
-    maint_m = monthly_maintenance(workshop_hours, area_m2, usage_key)
-    admin_m = float(st.session_state.get("admin_monthly", CFG.DEFAULT_ADMIN_MONTHLY))
+    oh = monthly_overheads(
+        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors, tariffs=t
+    )
+    elec_m, gas_m, water_m = oh["Electricity (estimated)"], oh["Gas (estimated)"], oh["Water (estimated)"]
+    admin_m, maint_m = oh["Administration"], oh["Depreciation/Maintenance (estimated)"]
 
     breakdown["Electricity (estimated)"] = elec_m
     breakdown["Gas (estimated)"]        = gas_m
@@ -66,3 +72,96 @@ def generate_host_quote(
         "grand_total": grand_total,
     }
     return host_df, ctx
+
+# ---------- Batch (column-wise) ----------
+HOST_BREAKDOWN_COLUMNS = [
+    "Prisoner wages", "Instructors",
+    "Electricity (estimated)", "Gas (estimated)", "Water (estimated)",
+    "Administration", "Depreciation/Maintenance (estimated)", "Development charge (applied)",
+]
+
+def _salary_matrix(supervisor_salaries) -> np.ndarray:
+    # Ragged per-row salary lists -> zero-padded (rows x max_instructors) matrix
+    lists = [list(v) if isinstance(v, (list, tuple, np.ndarray)) else [] for v in supervisor_salaries]
+    width = max((len(v) for v in lists), default=0)
+    out = np.zeros((len(lists), width))
+    for i, v in enumerate(lists):
+        out[i, :len(v)] = v
+    return out
+
+def host_breakdown_arrays(
+    *,
+    workshop_hours,
+    area_m2,
+    usage_key,
+    num_prisoners,
+    prisoner_salary,
+    num_supervisors,
+    customer_covers_supervisors,
+    instructor_monthly,       # sum of (salary/12)*(effective_pct/100) per quote
+    is_commercial,
+    dev_rate,
+    vat_rate: float,
+    tariffs: Tariffs,
+    **rate_overrides,
+) -> Dict[str, np.ndarray]:
+    # Array form of generate_host_quote; every argument may be a scalar or an array.
+    oh = monthly_overheads_arrays(
+        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors,
+        tariffs=tariffs, **rate_overrides,
+    )
+    out: Dict[str, np.ndarray] = {}
+    out["Prisoner wages"] = np.asarray(num_prisoners, dtype=float) * np.asarray(prisoner_salary, dtype=float) * (52.0 / 12.0)
+    out["Instructors"] = np.where(np.asarray(customer_covers_supervisors, dtype=bool), 0.0, instructor_monthly)
+    for k in HOST_BREAKDOWN_COLUMNS[2:7]:
+        out[k] = oh[k]
+    out["Development charge (applied)"] = oh["overheads_monthly"] * np.where(is_commercial, np.asarray(dev_rate, dtype=float), 0.0)
+
+    subtotal = 0
+    for k in HOST_BREAKDOWN_COLUMNS:
+        subtotal = subtotal + out[k]
+    vat_amount = subtotal * (float(vat_rate) / 100.0)
+    out["overheads_subtotal"] = oh["overheads_monthly"]
+    out["Subtotal"] = subtotal
+    out["VAT"] = vat_amount
+    out["Grand Total (£/month)"] = subtotal + vat_amount
+    return out
+
+def scenario_arrays(sc: pd.DataFrame) -> Dict[str, np.ndarray]:
+    # Scenario table -> keyword arrays for host_breakdown_arrays
+    pct = sc["effective_pct"].to_numpy(dtype=float)
+    salaries = _salary_matrix(sc["supervisor_salaries"]) if "supervisor_salaries" in sc else np.zeros((len(sc), 0))
+    # cumsum keeps generate_host_quote's left-to-right per-instructor summation
+    terms = (salaries / 12.0) * (pct[:, None] / 100.0)
+    instructor_monthly = np.cumsum(terms, axis=1)[:, -1] if terms.shape[1] else np.zeros(len(sc))
+    return dict(
+        workshop_hours=sc["workshop_hours"].to_numpy(dtype=float),
+        area_m2=sc["area_m2"].to_numpy(dtype=float),
+        usage_key=sc["usage_key"].to_numpy(dtype=object),
+        num_prisoners=sc["num_prisoners"].to_numpy(dtype=np.int64),
+        prisoner_salary=sc["prisoner_salary"].to_numpy(dtype=float),
+        num_supervisors=sc["num_supervisors"].to_numpy(dtype=np.int64),
+        customer_covers_supervisors=sc["customer_covers_supervisors"].to_numpy(dtype=bool),
+        instructor_monthly=instructor_monthly,
+        is_commercial=(sc["customer_type"] == "Commercial").to_numpy(),
+        dev_rate=sc["dev_rate"].to_numpy(dtype=float),
+    )
+
+def generate_host_quotes(
+    scenarios: pd.DataFrame,
+    *,
+    tariffs: Tariffs,
+    vat_rate: float = 20.0,
+) -> pd.DataFrame:
+    # One row per host scenario. Expected columns: workshop_hours, area_m2, usage_key,
+    # num_prisoners, prisoner_salary, num_supervisors, customer_covers_supervisors,
+    # supervisor_salaries (list per row), effective_pct, customer_type, dev_rate.
+    # Any other columns (e.g. prison) are carried through unchanged.
+    out = host_breakdown_arrays(**scenario_arrays(scenarios), vat_rate=vat_rate, tariffs=tariffs)
+    cols = {k: out[k] for k in HOST_BREAKDOWN_COLUMNS}
+    cols["Subtotal"] = out["Subtotal"]
+    cols[f"VAT ({float(vat_rate):.1f}%)"] = out["VAT"]
+    cols["Grand Total (£/month)"] = out["Grand Total (£/month)"]
+    result = pd.DataFrame(cols, index=scenarios.index)
+    passthrough = [c for c in scenarios.columns if c not in result.columns]
+    return pd.concat([scenarios[passthrough], result], axis=1)
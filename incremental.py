@@ -0,0 +1,353 @@
+# incremental.py
+# Incremental contractual pricing: the quote as a dependency graph
+#   inputs -> intermediates (overheads_weekly, inst/dev weekly totals, denom, per-item
+#   labour, capacity, share) -> outputs (units, unit cost/price, feasibility)
+# Every update is diffed against the previous inputs. Only nodes downstream of a
+# changed input are recomputed, and per-item columns only at the items that changed.
+# A node that comes out unchanged stops the change there, e.g. a tariff edit that
+# leaves the weekly overheads as they were.
+# What an edit costs (n items, k edited):
+#   minutes / required / target of k items  -> O(k)
+#   a tariff, salary or VAT setting         -> overheads/totals + one O(n) pass over costs
+#   prisoners assigned (moves every share)  -> O(k) capacity + one O(n) pass over costs
+# Results match production_engine.price_contractual_frame. Only denom is summed by
+# deltas, so it can differ from a fresh sum in the last bits; it is re-summed
+# every _RESUM_EVERY partial updates.
+from typing import Callable, Dict, List, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+
+from production import _resolve_tariffs, weekly_overheads_total
+from production_engine import RESULT_COLUMNS, _int_targets, _nullable_float, contract_totals
+from tracing import traced
+
+ALL = "all"            # change marker: every position (or a scalar) changed
+_RESUM_EVERY = 256
+
+Change = Union[str, np.ndarray]   # ALL or sorted item positions
+
+# ---------- Graph ----------
+def _same(a, b) -> bool:
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return False
+    try:
+        return bool(a == b)
+    except Exception:
+        return False
+
+def _diff(new: np.ndarray, old: Optional[np.ndarray]) -> Optional[Change]:
+    # Positions where new differs from old (NaN equals NaN); None when nothing changed
+    if old is None or new.shape != old.shape or new.dtype != old.dtype:
+        return ALL
+    if new.dtype.kind == "f":
+        neq = (new != old) & ~(np.isnan(new) & np.isnan(old))
+    else:
+        neq = new != old
+    idx = np.flatnonzero(neq)
+    return idx if len(idx) else None
+
+def _union(changes: List[Change]) -> Change:
+    if any(c is ALL for c in changes):
+        return ALL
+    return changes[0] if len(changes) == 1 else np.unique(np.concatenate(changes))
+
+class _Node:
+    __slots__ = ("name", "kind", "fn", "deps", "value", "snapshot", "partial")
+
+    def __init__(self, name: str, kind: str, fn: Optional[Callable] = None, deps: Sequence[str] = ()):
+        self.name, self.kind, self.fn, self.deps = name, kind, fn, tuple(deps)
+        self.value = None
+        self.snapshot = None   # total nodes: the summed column as last seen
+        self.partial = 0       # total nodes: delta updates since the last full sum
+
+class DependencyGraph:
+    # Push-based: set()/set_column() record changes, evaluate() propagates them once
+    # through the nodes in definition order (which must be topological).
+    def __init__(self):
+        self.nodes: Dict[str, _Node] = {}
+        self._order: List[_Node] = []
+        self._pending: Dict[str, Change] = {}
+        self.last_run: Dict[str, int] = {}   # node -> positions recomputed (1 for scalars)
+
+    def _add(self, node: _Node) -> None:
+        missing = [d for d in node.deps if d not in self.nodes]
+        if missing:
+            raise KeyError(f"{node.name}: define {missing} first")
+        self.nodes[node.name] = node
+        if node.kind not in ("input", "column_input"):
+            self._order.append(node)
+
+    def input(self, name: str) -> None:
+        self._add(_Node(name, "input"))
+
+    def column_input(self, name: str) -> None:
+        self._add(_Node(name, "column_input"))
+
+    def scalar(self, name: str, fn: Callable, deps: Sequence[str]) -> None:
+        self._add(_Node(name, "scalar", fn, deps))
+
+    def column(self, name: str, fn: Callable, deps: Sequence[str]) -> None:
+        # fn must be elementwise over the item axis; scalar deps broadcast
+        self._add(_Node(name, "column", fn, deps))
+
+    def total(self, name: str, dep: str) -> None:
+        # left-to-right sum of a column, as contractual_kernel computes denom
+        self._add(_Node(name, "total", None, (dep,)))
+
+    def _is_column(self, name: str) -> bool:
+        return self.nodes[name].kind in ("column_input", "column")
+
+    def __getitem__(self, name: str):
+        return self.nodes[name].value
+
+    # ---------- Inputs ----------
+    def set(self, name: str, value) -> None:
+        node = self.nodes[name]
+        if node.value is None or not _same(value, node.value):
+            node.value = value
+            self._pending[name] = ALL
+
+    def set_column(self, name: str, values) -> None:
+        node = self.nodes[name]
+        values = np.array(values)   # own copy: later set_items writes into it
+        change = _diff(values, node.value)
+        node.value = values
+        if change is not None:
+            prev = self._pending.get(name)
+            self._pending[name] = change if prev is None else _union([prev, change])
+
+    def set_items(self, name: str, positions, values) -> None:
+        # Callers that know what they edited skip the diff over the whole column
+        node = self.nodes[name]
+        positions = np.asarray(positions, dtype=np.int64)
+        node.value[positions] = values
+        prev = self._pending.get(name)
+        self._pending[name] = positions if prev is None else _union([prev, positions])
+
+    # ---------- Propagation ----------
+    def evaluate(self) -> Dict[str, Change]:
+        # Recompute what the pending changes reach; returns node -> change
+        changes, self._pending = self._pending, {}
+        self.last_run = {}
+        for node in self._order:
+            changed = {d: changes[d] for d in node.deps if d in changes}
+            if not changed and node.value is not None:
+                continue
+            values = [self.nodes[d].value for d in node.deps]
+            if node.kind == "scalar":
+                new = node.fn(*values)
+                self.last_run[node.name] = 1
+                if node.value is None or not _same(new, node.value):
+                    node.value = new
+                    changes[node.name] = ALL
+            elif node.kind == "column":
+                change = self._eval_column(node, values, changed)
+                if change is not None:
+                    changes[node.name] = change
+            elif self._eval_total(node, values[0], list(changed.values())):
+                changes[node.name] = ALL
+        return changes
+
+    def _eval_column(self, node: _Node, values: list, changed: Dict[str, Change]) -> Optional[Change]:
+        # A changed scalar dep touches every item; changed columns only their positions
+        cols = [self._is_column(d) for d in node.deps]
+        full = node.value is None or any(c is ALL or not self._is_column(d) for d, c in changed.items())
+        if full:
+            n = max((len(v) for v, c in zip(values, cols) if c), default=0)
+            new = np.array(np.broadcast_to(node.fn(*values), (n,)))
+            self.last_run[node.name] = n
+            change = _diff(new, node.value)
+            node.value = new
+            return change
+        where = _union(list(changed.values()))
+        sub = np.broadcast_to(node.fn(*(v[where] if c else v for v, c in zip(values, cols))), where.shape)
+        self.last_run[node.name] = len(where)
+        old = node.value[where]
+        if sub.dtype != node.value.dtype:
+            node.value = node.value.astype(np.result_type(node.value, sub))
+        node.value[where] = sub
+        neq = (sub != old) & ~(_isnan(sub) & _isnan(old))
+        return where[neq] if neq.any() else None
+
+    def _eval_total(self, node: _Node, column: np.ndarray, changes: List[Change]) -> bool:
+        old = node.value
+        change = _union(changes) if changes else ALL
+        if change is ALL or node.snapshot is None or node.partial >= _RESUM_EVERY:
+            node.value = float(np.cumsum(column)[-1]) if len(column) else 0.0
+            node.snapshot = column.copy()
+            node.partial = 0
+            self.last_run[node.name] = len(column)
+        else:
+            node.value = old + float(np.sum(column[change] - node.snapshot[change]))
+            node.snapshot[change] = column[change]
+            node.partial += 1
+            self.last_run[node.name] = len(change)
+        return old is None or node.value != old
+
+def _isnan(a: np.ndarray) -> np.ndarray:
+    return np.isnan(a) if a.dtype.kind == "f" else np.zeros(a.shape, dtype=bool)
+
+# ---------- Contractual quote ----------
+QUOTE_INPUTS = (
+    "workshop_hours", "output_pct", "prisoner_salary", "supervisor_salaries", "effective_pct",
+    "customer_covers_supervisors", "customer_type", "apply_vat", "vat_rate", "area_m2", "usage_key",
+    "num_prisoners", "num_supervisors", "dev_rate", "pricing_mode", "tariffs",
+)
+ITEM_INPUTS = ("minutes", "required", "assigned", "targets")
+
+def _labour(assigned, hours):
+    return assigned * float(hours) * 60.0
+
+def _cap_100(labour, minutes, required, assigned, hours):
+    ok = (assigned > 0) & (minutes > 0) & (required > 0) & (float(hours) > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(ok, labour / (minutes * required), 0.0)
+
+def _share(labour, denom):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denom > 0, labour / denom, 0.0)
+
+def _weekly_cost(assigned, share, prisoner_salary, inst, overheads, dev):
+    # same term order as contractual_kernel
+    return assigned * prisoner_salary + inst * share + overheads * share + dev * share
+
+def _units(capacity_units, targets, pricing_mode):
+    return targets.astype(float) if pricing_mode == "target" else capacity_units
+
+def _unit_cost(weekly_cost, units):
+    priced = units > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(priced, weekly_cost / np.where(priced, units, 1.0), np.nan)
+
+def contractual_graph() -> DependencyGraph:
+    g = DependencyGraph()
+    for name in QUOTE_INPUTS:
+        g.input(name)
+    for name in ITEM_INPUTS:
+        g.column_input(name)
+    g.scalar("overheads_weekly", lambda h, a, u, n_p, n_s, cov, t: weekly_overheads_total(h, a, u, n_p, n_s, cov, tariffs=t)[0],
+             ("workshop_hours", "area_m2", "usage_key", "num_prisoners", "num_supervisors", "customer_covers_supervisors", "tariffs"))
+    g.scalar("inst_weekly_total", lambda sal, pct, cov: contract_totals(sal, pct, cov, "", 0.0, 0.0)[0],
+             ("supervisor_salaries", "effective_pct", "customer_covers_supervisors"))
+    g.scalar("dev_weekly_total", lambda oh, rate, ctype: contract_totals((), 0.0, True, ctype, oh, rate)[1],
+             ("overheads_weekly", "dev_rate", "customer_type"))
+    g.scalar("output_scale", lambda pct: float(pct) / 100.0, ("output_pct",))
+    g.scalar("vat_factor", lambda ctype, vat, rate: 1 + (float(rate) / 100.0) if ctype == "Commercial" and vat else 1.0,
+             ("customer_type", "apply_vat", "vat_rate"))
+    g.column("labour", _labour, ("assigned", "workshop_hours"))
+    g.total("denom", "labour")
+    g.column("cap_100", _cap_100, ("labour", "minutes", "required", "assigned", "workshop_hours"))
+    g.column("capacity_units", lambda cap, scale: cap * scale, ("cap_100", "output_scale"))
+    g.column("share", _share, ("labour", "denom"))
+    g.column("weekly_cost", _weekly_cost,
+             ("assigned", "share", "prisoner_salary", "inst_weekly_total", "overheads_weekly", "dev_weekly_total"))
+    g.column("units", _units, ("capacity_units", "targets", "pricing_mode"))
+    g.column("available_minutes", lambda labour, scale: labour * scale, ("labour", "output_scale"))
+    g.column("required_minutes", lambda units, minutes, required: units * minutes * required, ("units", "minutes", "required"))
+    g.column("feasible", lambda req, avail: req <= (avail + 1e-6), ("required_minutes", "available_minutes"))
+    g.column("unit_cost", _unit_cost, ("weekly_cost", "units"))
+    g.column("unit_inc", lambda cost, f: cost * f, ("unit_cost", "vat_factor"))
+    return g
+
+_FRAME_NODES = ("capacity_units", "units", "unit_cost", "unit_inc", "feasible", "required_minutes", "available_minutes")
+
+class IncrementalContractual:
+    # Keeps one quote's graph between calls: update() takes the same arguments as
+    # price_contractual_frame and returns the same DataFrame, recomputing only
+    # what changed since the previous call.
+    def __init__(self):
+        self.graph = contractual_graph()
+        self._names: Optional[List[str]] = None
+        self._item_names: List[str] = []
+        self._frame: Optional[pd.DataFrame] = None
+
+    @traced("pricing.contractual_incremental")
+    def update(self, minutes, required, assigned, output_pct: int, *, names: Optional[Sequence[str]] = None,
+               targets=None, **kwargs) -> pd.DataFrame:
+        g = self.graph
+        unknown = set(kwargs) - set(QUOTE_INPUTS)
+        if unknown:
+            raise TypeError(f"Unknown argument(s): {sorted(unknown)}")
+        kwargs.setdefault("pricing_mode", "as-is")
+        # resolved here so a change in session state is seen by the diff
+        kwargs["tariffs"] = _resolve_tariffs(kwargs.get("tariffs"))
+        missing = set(QUOTE_INPUTS) - set(kwargs) - {"output_pct"}
+        if missing:
+            raise TypeError(f"Missing argument(s): {sorted(missing)}")
+        kwargs["output_pct"] = output_pct
+        kwargs["supervisor_salaries"] = tuple(float(s) for s in kwargs["supervisor_salaries"])
+        for name, value in kwargs.items():
+            g.set(name, value)
+        minutes = np.asarray(minutes, dtype=float)
+        n = len(minutes)
+        g.set_column("minutes", minutes)
+        g.set_column("required", np.asarray(required, dtype=np.int64))
+        g.set_column("assigned", np.asarray(assigned, dtype=np.int64))
+        g.set_column("targets", _int_targets(targets, n) if kwargs["pricing_mode"] == "target" else np.zeros(n, dtype=np.int64))
+        changes = g.evaluate()
+
+        names = list(names) if names is not None else [""] * n
+        if names != self._names:
+            self._names = names
+            self._item_names = [((nm or "").strip() or f"Item {i+1}") for i, nm in enumerate(names)]
+            self._frame = None
+        if self._frame is None or any(k in changes for k in ("output_pct", "pricing_mode")):
+            self._frame = self._build_frame()
+        else:
+            touched = [changes[k] for k in _FRAME_NODES if k in changes]
+            if touched:
+                rows = _union(touched)
+                if rows is ALL or not self._patch_frame(rows):
+                    self._frame = self._build_frame()
+        return self._frame.copy()
+
+    def _columns(self, rows) -> Dict[str, np.ndarray]:
+        # Result columns other than Item / Output % / Pricing mode at `rows`
+        g = self.graph
+        cap, units = g["capacity_units"][rows], g["units"][rows]
+        n = len(cap)
+        note = np.full(n, None, dtype=object)
+        if g["pricing_mode"] == "target":
+            feasible = g["feasible"][rows]
+            req, avail = g["required_minutes"][rows], g["available_minutes"][rows]
+            for i in np.flatnonzero(~feasible):
+                note[i] = (
+                    f"Target requires {req[i]:,.0f} mins vs "
+                    f"available {avail[i]:,.0f} mins; exceeds capacity."
+                )
+        else:
+            feasible = np.full(n, None, dtype=object)
+        return {
+            "Capacity (units/week)": np.where(cap <= 0, 0, np.rint(cap)).astype(np.int64),
+            "Units/week": np.where(units <= 0, 0, np.rint(units)).astype(np.int64),
+            "Unit Cost (£)": g["unit_cost"][rows],
+            "Unit Price ex VAT (£)": g["unit_cost"][rows],
+            "Unit Price inc VAT (£)": g["unit_inc"][rows],
+            "Feasible": feasible,
+            "Note": note,
+        }
+
+    def _build_frame(self) -> pd.DataFrame:
+        g = self.graph
+        n = len(self._item_names)
+        is_target = g["pricing_mode"] == "target"
+        cols = self._columns(slice(None))
+        priced = g["units"] > 0
+        for c in ("Unit Cost (£)", "Unit Price ex VAT (£)", "Unit Price inc VAT (£)"):
+            cols[c] = _nullable_float(cols[c], priced)
+        return pd.DataFrame({
+            "Item": self._item_names,
+            "Output %": np.full(n, int(g["output_pct"]), dtype=np.int64),
+            "Pricing mode": ["Target units/week" if is_target else "As‑is (max units)"] * n,
+            **cols,
+        }, columns=RESULT_COLUMNS)
+
+    def _patch_frame(self, rows: np.ndarray) -> bool:
+        # Rewrite the changed rows of the cached frame in place. The cost columns are
+        # all-None when nothing is priced, so a flip either way needs a rebuild.
+        frame = self._frame
+        if frame["Unit Cost (£)"].dtype == object or not (self.graph["units"] > 0).any():
+            return False
+        for name, values in self._columns(rows).items():
+            frame.iloc[rows, frame.columns.get_loc(name)] = values
+        return True
@@ -0,0 +1,186 @@
+# montecarlo.py
+# Monte Carlo tariff uncertainty. Tariff rates (any Tariffs field) and Output %
+# are drawn from simple distributions and pushed through the vectorized pricing
+# kernels in one pass per chunk, giving P50/P90/P95 unit prices and host totals.
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from tariff import Tariffs
+from tariff_tables import band_field
+from production_engine import contract_totals, contractual_kernel, monthly_overheads_arrays, _int_targets
+from host import host_breakdown_arrays
+from tracing import traced
+
+DEFAULT_PERCENTILES = (50, 90, 95)
+_MAX_BLOCK = 4_000_000   # draws x items evaluated per block
+
+# ---------- Distributions ----------
+@dataclass(frozen=True)
+class Dist:
+    kind: str                 # "fixed" | "normal" | "lognormal" | "uniform" | "triangular"
+    params: Tuple[float, ...]
+    lower: float = 0.0        # rates and Output % cannot go negative
+    upper: Optional[float] = None
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        p = self.params
+        if self.kind == "fixed":
+            x = np.full(n, float(p[0]))
+        elif self.kind == "normal":
+            x = rng.normal(p[0], p[1], n)
+        elif self.kind == "lognormal":   # params: (median, sigma of log)
+            x = float(p[0]) * np.exp(rng.normal(0.0, p[1], n))
+        elif self.kind == "uniform":
+            x = rng.uniform(p[0], p[1], n)
+        elif self.kind == "triangular":  # params: (low, mode, high)
+            x = rng.triangular(p[0], p[1], p[2], n)
+        else:
+            raise ValueError(f"Unknown distribution kind: {self.kind}")
+        return np.clip(x, self.lower, self.upper)
+
+def normal(mean: float, sd: float, **kw) -> Dist: return Dist("normal", (mean, sd), **kw)
+def lognormal(median: float, sigma: float, **kw) -> Dist: return Dist("lognormal", (median, sigma), **kw)
+def uniform(low: float, high: float, **kw) -> Dist: return Dist("uniform", (low, high), **kw)
+def triangular(low: float, mode: float, high: float, **kw) -> Dist: return Dist("triangular", (low, mode, high), **kw)
+
+def default_uncertainty(tariffs: Tariffs, output_pct: float, spread: float = 0.15, *,
+                        usage_key: Optional[str] = None) -> Dict[str, Dist]:
+    # Triangular ±spread around today's point estimates; Output % ±10 points.
+    # Maintenance is sampled through whichever input its method uses; an unset
+    # £/m² rate is the band default, so pass usage_key to sample that too.
+    def tri(v):
+        return triangular(v * (1 - spread), v, v * (1 + spread)) if v > 0 and spread > 0 else Dist("fixed", (v,))
+    unc = {f: tri(float(getattr(tariffs, f))) for f in
+           ("electricity_rate", "elec_daily", "gas_rate", "gas_daily", "water_rate")}
+    method = str(tariffs.maint_method)
+    if method.startswith("£/m² per year"):
+        rate = tariffs.maint_rate_per_m2_y
+        if rate is None and usage_key is not None:
+            rate = band_field(usage_key, "maint_gbp_per_m2")
+        if rate is not None:
+            unc["maint_rate_per_m2_y"] = tri(float(rate))
+    elif method == "Set a fixed monthly amount":
+        unc["maint_monthly"] = tri(float(tariffs.maint_monthly))
+    else:
+        unc["reinstate_val"] = tri(float(tariffs.reinstate_val))
+    o = float(output_pct)
+    unc["output_pct"] = triangular(max(0.0, o - 10), o, min(100.0, o + 10), upper=100.0)
+    return unc
+
+def draw_inputs(uncertainty: Mapping[str, Dist], n_draws: int, seed=None) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return {k: d.sample(rng, int(n_draws)) for k, d in uncertainty.items()}
+
+def _percentiles(block: np.ndarray, q: Sequence[float]) -> np.ndarray:
+    if np.isnan(block).any():
+        return np.nanpercentile(block, q, axis=0)
+    return np.percentile(block, q, axis=0)
+
+# ---------- Contractual ----------
+@traced("analysis.monte_carlo")
+def simulate_contractual(
+    items: List[Dict],
+    output_pct: float,
+    *,
+    uncertainty: Mapping[str, Dist],
+    tariffs: Tariffs,
+    n_draws: int = 100_000,
+    seed=None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    workshop_hours: float,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_covers_supervisors: bool,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    num_supervisors: int,
+    dev_rate: float,
+    pricing_mode: str = "as-is",
+    targets: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    draws = draw_inputs(uncertainty, n_draws, seed)
+    out_pct = draws.pop("output_pct", np.full(int(n_draws), float(output_pct)))
+
+    oh = monthly_overheads_arrays(
+        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors,
+        tariffs=tariffs, **draws,
+    )
+    ovh = np.broadcast_to(oh["overheads_weekly"], out_pct.shape)
+    inst, _ = contract_totals(supervisor_salaries, effective_pct, customer_covers_supervisors, customer_type, 0.0, dev_rate)
+    dev = ovh * float(dev_rate) if customer_type == "Commercial" else np.zeros_like(ovh)
+    vat_mult = (1 + float(vat_rate) / 100.0) if (customer_type == "Commercial" and apply_vat) else 1.0
+
+    minutes = np.array([float(it.get("minutes", 0)) for it in items])
+    required = np.array([int(it.get("required", 1)) for it in items])
+    assigned = np.array([int(it.get("assigned", 0)) for it in items])
+    tgt = _int_targets(targets, len(items)) if pricing_mode == "target" else None
+    denom = np.cumsum(assigned * float(workshop_hours) * 60.0)[-1:] if len(items) else np.zeros(1)
+
+    q = list(percentiles)
+    res = np.empty((len(q), len(items)))
+    feasible_share = np.empty(len(items))
+    step = max(1, _MAX_BLOCK // max(1, len(out_pct)))
+    for lo in range(0, len(items), step):
+        sl = slice(lo, lo + step)
+        k = contractual_kernel(
+            minutes[sl], required[sl], assigned[sl],
+            workshop_hours=workshop_hours, output_pct=out_pct[:, None], prisoner_salary=prisoner_salary,
+            inst_weekly_total=inst, overheads_weekly=ovh[:, None], dev_weekly_total=dev[:, None],
+            pricing_mode=pricing_mode, targets=None if tgt is None else tgt[sl], denom=denom,
+        )
+        res[:, sl] = _percentiles(k["unit_cost"], q)
+        feasible_share[sl] = k["feasible"].mean(axis=0)
+
+    df = pd.DataFrame({"Item": [((it.get("name") or "").strip() or f"Item {i+1}") for i, it in enumerate(items)]})
+    for j, p in enumerate(q):
+        df[f"P{p:g} Unit Price ex VAT (£)"] = res[j]
+    for j, p in enumerate(q):
+        df[f"P{p:g} Unit Price inc VAT (£)"] = res[j] * vat_mult
+    if pricing_mode == "target":
+        df["P(feasible)"] = feasible_share
+    return df
+
+# ---------- Host ----------
+def simulate_host(
+    *,
+    uncertainty: Mapping[str, Dist],
+    tariffs: Tariffs,
+    n_draws: int = 100_000,
+    seed=None,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    workshop_hours: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    prisoner_salary: float,
+    num_supervisors: int,
+    customer_covers_supervisors: bool,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_type: str,
+    dev_rate: float,
+    vat_rate: float = 20.0,
+) -> Dict[str, Dict[str, float]]:
+    draws = draw_inputs(uncertainty, n_draws, seed)
+    draws.pop("output_pct", None)   # host quotes do not depend on Output %
+    instructor_monthly = sum((s / 12.0) * (float(effective_pct) / 100.0) for s in supervisor_salaries)
+    out = host_breakdown_arrays(
+        workshop_hours=workshop_hours, area_m2=area_m2, usage_key=usage_key,
+        num_prisoners=num_prisoners, prisoner_salary=prisoner_salary, num_supervisors=num_supervisors,
+        customer_covers_supervisors=customer_covers_supervisors, instructor_monthly=instructor_monthly,
+        is_commercial=customer_type == "Commercial", dev_rate=dev_rate, vat_rate=vat_rate,
+        tariffs=tariffs, **draws,
+    )
+    q = list(percentiles)
+    summary = {}
+    for key in ("Subtotal", "Grand Total (£/month)"):
+        vals = np.broadcast_to(out[key], (int(n_draws),))
+        summary[key] = {f"P{p:g}": float(v) for p, v in zip(q, np.percentile(vals, q))}
+    return summary
@@ -0,0 +1,223 @@
+# pdf_export.py
+# Paginated PDF quote engine (reportlab canvas).
+# - Rows are consumed from any iterable, so production lines can be generated lazily.
+# - Page breaks are automatic. Table headers repeat on every page and the blue band
+#   and footer are redrawn on each one.
+# - Output goes straight to a path or any binary file-like object (file, socket
+#   makefile("wb"), HTTP response). Pages are compressed as they are finished, so
+#   memory grows by a few KB per page rather than with the raw line data.
+import datetime
+from bisect import bisect_right
+from io import BytesIO
+from itertools import accumulate
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from tracing import traced
+
+BLUE = colors.HexColor("#005ea5")
+FONT, FONT_BOLD, FONT_ITALIC = "Helvetica", "Helvetica-Bold", "Helvetica-Oblique"
+LEFT = 10 * mm
+INDENT = 15 * mm
+BOTTOM = 25 * mm          # keep clear of the footer
+LINE = 12
+
+# ---------- Text measuring ----------
+# Per-character widths cached per font; much cheaper than stringWidth per cell when
+# reportlab's C accelerator is not installed.
+_CHAR_WIDTHS: Dict[str, Dict[str, float]] = {}
+
+def _char_width(font: str, ch: str) -> float:
+    table = _CHAR_WIDTHS.setdefault(font, {})
+    w = table.get(ch)
+    if w is None:
+        w = table[ch] = stringWidth(ch, font, 1000)
+    return w
+
+def _fit(s: str, max_w: float, font: str, size: int) -> Tuple[str, float]:
+    # (text, width) with the text cut and suffixed with "…" if wider than max_w
+    table = _CHAR_WIDTHS.get(font) or {}
+    get = table.get
+    ws = [get(ch) or _char_width(font, ch) for ch in s]
+    scale = size / 1000.0
+    total = sum(ws) * scale
+    if total <= max_w:
+        return s, total
+    limit = max_w / scale - _char_width(font, "…")
+    cum = list(accumulate(ws))
+    k = bisect_right(cum, limit)
+    return s[:k] + "…", (cum[k - 1] if k else 0.0) * scale + _char_width(font, "…") * scale
+
+class QuotePDF:
+    def __init__(self, out: Union[str, BinaryIO], title: str, *, subtitle: str = "", pagesize=A4):
+        self.c = canvas.Canvas(out, pagesize=pagesize, pageCompression=1)
+        self.c.setTitle(f"{title} {subtitle}".strip())
+        self.width, self.height = pagesize
+        self.title, self.subtitle = title, subtitle
+        self.page = 0
+        self.y = 0.0
+        self._new_page()
+
+    # ---------- Page furniture ----------
+    def _new_page(self) -> None:
+        if self.page:
+            self._footer()
+            self.c.showPage()
+        self.page += 1
+        c = self.c
+        c.setFillColor(BLUE)
+        c.rect(0, self.height - 40, self.width, 40, fill=True, stroke=False)
+        c.setFillColor(colors.white)
+        c.setFont(FONT_BOLD, 16)
+        c.drawString(LEFT, self.height - 30, self.title)
+        if self.page > 1 and self.subtitle:
+            c.setFont(FONT, 10)
+            c.drawRightString(self.width - LEFT, self.height - 28, f"{self.subtitle} (continued)")
+        c.setFillColor(colors.black)
+        self.y = self.height - 60
+
+    def _footer(self) -> None:
+        self.c.setFont(FONT_ITALIC, 8)
+        self.c.setFillColor(colors.black)
+        self.c.drawString(LEFT, 15 * mm, "Official – Ministry of Justice")
+        self.c.drawRightString(self.width - LEFT, 15 * mm, f"Page {self.page}")
+
+    def _need(self, height: float) -> bool:
+        # Start a new page if `height` points do not fit; True if a break happened.
+        if self.y - height < BOTTOM:
+            self._new_page()
+            return True
+        return False
+
+    # ---------- Content ----------
+    def lines(self, texts: Iterable[str], *, font: str = FONT_BOLD, size: int = 12, x: float = LEFT, step: float = 15) -> None:
+        self.c.setFont(font, size)
+        for t in texts:
+            if self._need(step):
+                self.c.setFont(font, size)
+            self.c.drawString(x, self.y, t)
+            self.y -= step
+
+    def heading(self, text: str) -> None:
+        self._need(LINE + 15 + LINE)   # keep a heading with its first line
+        self.c.setFont(FONT_BOLD, 12)
+        self.c.drawString(LEFT, self.y, text)
+        self.y -= 15
+
+    def paragraph(self, text: str, *, size: int = 10) -> None:
+        for ln in simpleSplit(str(text), FONT, size, self.width - INDENT - LEFT):
+            self._need(LINE)
+            self.c.setFont(FONT, size)
+            self.c.drawString(INDENT, self.y, ln)
+            self.y -= LINE
+        self.y -= 3
+
+    def table(
+        self,
+        headers: Sequence[str],
+        rows: Iterable[Sequence[Any]],
+        *,
+        widths: Optional[Sequence[float]] = None,   # fractions of the usable width
+        align: Optional[Sequence[str]] = None,      # "l" or "r" per column
+        size: int = 9,
+    ) -> int:
+        usable = self.width - INDENT - LEFT
+        n = len(headers)
+        fracs = list(widths) if widths else [1.0 / n] * n
+        col_w = [usable * f for f in fracs]
+        xs, x = [], INDENT
+        for w in col_w:
+            xs.append(x)
+            x += w
+        right = [a == "r" for a in (list(align) if align else ["l"] + ["r"] * (n - 1))]
+        # anchor for each column: left edge, or right edge minus padding
+        anchors = [xs[i] + col_w[i] - 4 if right[i] else xs[i] for i in range(n)]
+        max_w = [w - 6 for w in col_w]
+
+        c = self.c
+        def draw_header():
+            c.setFont(FONT_BOLD, size)
+            for i, h in enumerate(headers):
+                s, w = _fit(str(h), max_w[i], FONT_BOLD, size)
+                c.drawString(anchors[i] - w if right[i] else anchors[i], self.y, s)
+            self.y -= 2
+            c.setLineWidth(0.5)
+            c.line(INDENT, self.y, INDENT + usable, self.y)
+            self.y -= LINE
+
+        self._need(3 * LINE)
+        draw_header()
+        # One text object per page instead of one per cell (drawString builds a new one each call)
+        tx = c.beginText()
+        tx.setFont(FONT, size)
+        count = 0
+        for row in rows:
+            if self.y - LINE < BOTTOM:
+                c.drawText(tx)
+                self._new_page()
+                draw_header()
+                tx = c.beginText()
+                tx.setFont(FONT, size)
+            for i in range(n):
+                s, w = _fit(str(row[i]), max_w[i], FONT, size)
+                tx.setTextOrigin(anchors[i] - w if right[i] else anchors[i], self.y)
+                tx.textOut(s)
+            self.y -= LINE
+            count += 1
+        c.drawText(tx)
+        self.y -= 6
+        return count
+
+    def close(self) -> None:
+        self._footer()
+        self.c.showPage()
+        self.c.save()
+
+# ---------- Quote document ----------
+@traced("export.pdf")
+def write_quote_pdf(
+    out: Union[str, BinaryIO],
+    *,
+    quote_num: str,
+    region: str,
+    prison: str,
+    customer: str,
+    workshop_mode: str,
+    breakdown: Dict[str, float],
+    production_headers: Sequence[str] = (),
+    production_rows: Optional[Iterable[Sequence[Any]]] = None,
+    supervisor_justification: str = "",
+    today: Optional[datetime.date] = None,
+) -> None:
+    doc = QuotePDF(out, "Ministry of Justice - Official Prison Workshop Quote", subtitle=f"Quote {quote_num}")
+    doc.lines([
+        f"Quote Number: {quote_num}",
+        f"Date: {today or datetime.date.today()}",
+        f"Prison: {prison}",
+        f"Region: {region}",
+        f"Customer: {customer}",
+        f"Workshop Mode: {workshop_mode}",
+    ])
+    doc.y -= 10
+    doc.heading("Cost Breakdown:")
+    doc.table(["Item", "Amount"], ((k, f"£{v:,.2f}") for k, v in breakdown.items()), widths=[0.7, 0.3], size=10)
+
+    if supervisor_justification:
+        doc.heading("Supervisor Justification:")
+        doc.paragraph(supervisor_justification)
+
+    if production_rows is not None:
+        doc.heading("Production Details:")
+        doc.table(list(production_headers), production_rows, widths=[0.4] + [0.6 / max(1, len(production_headers) - 1)] * (len(production_headers) - 1))
+    doc.close()
+
+def quote_pdf_bytes(**kwargs) -> BytesIO:
+    buf = BytesIO()
+    write_quote_pdf(buf, **kwargs)
+    buf.seek(0)
+    return buf
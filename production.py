@@ -1,72 +1,145 @@
 # production.py
+# Pricing core. Functions take an explicit Tariffs object; when it is omitted they
+# fall back to a snapshot of st.session_state so older call sites keep working.
 from typing import List, Dict, Tuple, Optional
-from datetime import date, timedelta
+from datetime import date
 import math
-import streamlit as st
 from config import CFG, hours_scale
-from tariff import TARIFF_BANDS
+from tariff import Tariffs, tariffs_from_state
+from tariff_tables import band_field
+from workdays import WorkingCalendar, get_calendar
+from schedule import schedule_edf
+from memo import CacheInfo, LRUCache
+from tracing import traced
+
+def _resolve_tariffs(tariffs: Optional[Tariffs]) -> Tariffs:
+    if tariffs is not None:
+        return tariffs
+    import streamlit as st  # only needed inside a live Streamlit run
+    return tariffs_from_state(st.session_state)
 
 # ---------- Overheads ----------
-def monthly_energy_costs(workshop_hours: float, area_m2: float, usage_key: str) -> Tuple[float, float]:
-    band = TARIFF_BANDS[usage_key]
-    elec_kwh_y = band["intensity_per_year"]["elec_kwh_per_m2"] * (area_m2 or 0.0)
-    gas_kwh_y  = band["intensity_per_year"]["gas_kwh_per_m2"]  * (area_m2 or 0.0)
+def monthly_energy_costs(workshop_hours: float, area_m2: float, usage_key: str, *, tariffs: Optional[Tariffs] = None) -> Tuple[float, float]:
+    t = _resolve_tariffs(tariffs)
+    elec_kwh_y = band_field(usage_key, "elec_kwh_per_m2") * (area_m2 or 0.0)
+    gas_kwh_y  = band_field(usage_key, "gas_kwh_per_m2")  * (area_m2 or 0.0)
 
     hscale = hours_scale(workshop_hours)  # variable only
 
-    elec_unit  = float(st.session_state["electricity_rate"])
-    gas_unit   = float(st.session_state["gas_rate"])
-    elec_daily = float(st.session_state["elec_daily"])
-    gas_daily  = float(st.session_state["gas_daily"])
-
-    elec_var_m = (elec_kwh_y / 12.0) * elec_unit * hscale
-    gas_var_m  = (gas_kwh_y  / 12.0) * gas_unit  * hscale
+    elec_var_m = (elec_kwh_y / 12.0) * t.electricity_rate * hscale
+    gas_var_m  = (gas_kwh_y  / 12.0) * t.gas_rate  * hscale
 
-    elec_fix_m = elec_daily * CFG.DAYS_PER_MONTH
-    gas_fix_m  = gas_daily  * CFG.DAYS_PER_MONTH
+    elec_fix_m = t.elec_daily * CFG.DAYS_PER_MONTH
+    gas_fix_m  = t.gas_daily  * CFG.DAYS_PER_MONTH
     return elec_var_m + elec_fix_m, gas_var_m + gas_fix_m
 
-def monthly_water_costs(num_prisoners: int, num_supervisors: int, customer_covers_supervisors: bool, usage_key: str) -> float:
-    band = TARIFF_BANDS[usage_key]
+def monthly_water_costs(num_prisoners: int, num_supervisors: int, customer_covers_supervisors: bool, usage_key: str, *, tariffs: Optional[Tariffs] = None) -> float:
+    t = _resolve_tariffs(tariffs)
     persons = int(num_prisoners) + (0 if customer_covers_supervisors else int(num_supervisors))
-    m3_per_year = persons * band["intensity_per_year"]["water_m3_per_employee"]
-    return (m3_per_year / 12.0) * float(st.session_state["water_rate"])
+    m3_per_year = persons * band_field(usage_key, "water_m3_per_employee")
+    return (m3_per_year / 12.0) * t.water_rate
 
-def monthly_maintenance(workshop_hours: float, area_m2: float, usage_key: str) -> float:
+def monthly_maintenance(workshop_hours: float, area_m2: float, usage_key: str, *, tariffs: Optional[Tariffs] = None) -> float:
+    t = _resolve_tariffs(tariffs)
     hscale = hours_scale(workshop_hours) if CFG.APPORTION_MAINTENANCE else 1.0
-    method = st.session_state.get("maint_method", "£/m² per year (industry standard)")
+    method = t.maint_method
     if str(method).startswith("£/m² per year"):
-        rate = st.session_state.get("maint_rate_per_m2_y", TARIFF_BANDS[usage_key]["intensity_per_year"]["maint_gbp_per_m2"])
+        rate = t.maint_rate_per_m2_y
+        if rate is None:
+            rate = band_field(usage_key, "maint_gbp_per_m2")
         base_m = (float(rate) * (area_m2 or 0.0)) / 12.0
     elif method == "Set a fixed monthly amount":
-        base_m = float(st.session_state.get("maint_monthly", 0.0))
+        base_m = t.maint_monthly
     else:
-        reinstate_val = float(st.session_state.get("reinstate_val", 0.0))
-        pct = float(st.session_state.get("reinstate_pct", 0.0))
-        base_m = (reinstate_val * (pct / 100.0)) / 12.0
+        base_m = (t.reinstate_val * (t.reinstate_pct / 100.0)) / 12.0
     return base_m * hscale
 
-def weekly_overheads_total(
+def overhead_fingerprint(
     workshop_hours: float,
     area_m2: float,
     usage_key: str,
     num_prisoners: int,
     num_supervisors: int,
     customer_covers_supervisors: bool,
-) -> Tuple[float, Dict]:
-    elec_m, gas_m = monthly_energy_costs(workshop_hours, area_m2, usage_key)
-    water_m = monthly_water_costs(num_prisoners, num_supervisors, customer_covers_supervisors, usage_key)
-    maint_m = monthly_maintenance(workshop_hours, area_m2, usage_key)
-    admin_m = float(st.session_state.get("admin_monthly", CFG.DEFAULT_ADMIN_MONTHLY))
-    overheads_m = elec_m + gas_m + water_m + admin_m + maint_m
-    weekly = overheads_m * 12.0 / 52.0
-    detail = {
+    tariffs: Tariffs,
+) -> Tuple:
+    # Canonical key: inputs that cannot change the result are folded away
+    # (supervisors when the customer covers them, unused maintenance fields).
+    persons = int(num_prisoners) + (0 if customer_covers_supervisors else int(num_supervisors))
+    method = str(tariffs.maint_method)
+    if method.startswith("£/m² per year"):
+        rate = tariffs.maint_rate_per_m2_y
+        if rate is None:
+            rate = band_field(usage_key, "maint_gbp_per_m2")
+        maint = ("per_m2", float(rate))
+    elif method == "Set a fixed monthly amount":
+        maint = ("fixed", float(tariffs.maint_monthly))
+    else:
+        maint = ("reinstate", float(tariffs.reinstate_val), float(tariffs.reinstate_pct))
+    return (
+        float(workshop_hours), float(area_m2 or 0.0), usage_key, persons,
+        float(tariffs.electricity_rate), float(tariffs.elec_daily),
+        float(tariffs.gas_rate), float(tariffs.gas_daily),
+        float(tariffs.water_rate), float(tariffs.admin_monthly), maint,
+    )
+
+_OVERHEAD_CACHE = LRUCache(CFG.OVERHEAD_CACHE_SIZE)
+
+def overhead_cache_info() -> CacheInfo:
+    return _OVERHEAD_CACHE.info()
+
+def clear_overhead_cache() -> None:
+    _OVERHEAD_CACHE.clear()
+
+@traced("pricing.overheads")
+def monthly_overheads(
+    workshop_hours: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    num_supervisors: int,
+    customer_covers_supervisors: bool,
+    *,
+    tariffs: Optional[Tariffs] = None,
+) -> Dict[str, float]:
+    # Memoized monthly breakdown shared by host, contractual and ad‑hoc pricing.
+    t = _resolve_tariffs(tariffs)
+
+    def compute() -> Tuple:
+        elec_m, gas_m = monthly_energy_costs(workshop_hours, area_m2, usage_key, tariffs=t)
+        water_m = monthly_water_costs(num_prisoners, num_supervisors, customer_covers_supervisors, usage_key, tariffs=t)
+        maint_m = monthly_maintenance(workshop_hours, area_m2, usage_key, tariffs=t)
+        return elec_m, gas_m, water_m, t.admin_monthly, maint_m
+
+    key = overhead_fingerprint(workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors, t)
+    elec_m, gas_m, water_m, admin_m, maint_m = _OVERHEAD_CACHE.get_or_compute(key, compute)
+    return {
         "Electricity (estimated)": elec_m,
         "Gas (estimated)": gas_m,
         "Water (estimated)": water_m,
         "Administration": admin_m,
         "Depreciation/Maintenance (estimated)": maint_m,
     }
+
+def weekly_overheads_total(
+    workshop_hours: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    num_supervisors: int,
+    customer_covers_supervisors: bool,
+    *,
+    tariffs: Optional[Tariffs] = None,
+) -> Tuple[float, Dict]:
+    detail = monthly_overheads(
+        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors,
+        tariffs=tariffs,
+    )
+    overheads_m = (
+        detail["Electricity (estimated)"] + detail["Gas (estimated)"] + detail["Water (estimated)"]
+        + detail["Administration"] + detail["Depreciation/Maintenance (estimated)"]
+    )
+    weekly = overheads_m * 12.0 / 52.0
     return weekly, detail
 
 # ---------- Helpers ----------
@@ -74,6 +147,7 @@ def labour_minutes_budget(num_pris: int, hours: float) -> float:
     return max(0.0, float(num_pris) * float(hours) * 60.0)
 
 # ---------- Contractual ----------
+@traced("pricing.contractual")
 def calculate_production_contractual(
     items: List[Dict],
     output_pct: int,
@@ -93,9 +167,11 @@ def calculate_production_contractual(
     dev_rate: float,
     pricing_mode: str = "as-is",          # "as-is" or "target"
     targets: Optional[List[int]] = None,  # per-item target units/week if "target"
+    tariffs: Optional[Tariffs] = None,
 ) -> List[Dict]:
     overheads_weekly, _ = weekly_overheads_total(
-        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors
+        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors,
+        tariffs=tariffs,
     )
     dev_weekly_total = (overheads_weekly * float(dev_rate)) if customer_type == "Commercial" else 0.0
     inst_weekly_total = (
@@ -167,15 +243,12 @@ def calculate_production_contractual(
         })
     return results
 
-# ---------- Ad‑hoc (unchanged) ----------
-def _working_days_between(start: date, end: date) -> int:
-    if end < start: return 0
-    days, d = 0, start
-    while d <= end:
-        if d.weekday() < 5: days += 1
-        d += timedelta(days=1)
-    return days
+# ---------- Ad‑hoc ----------
+def _working_days_between(start: date, end: date, calendar: Optional[WorkingCalendar] = None) -> int:
+    # Inclusive; skips weekends, bank holidays and the calendar's closure days.
+    return (calendar or get_calendar()).working_days_between(start, end)
 
+@traced("pricing.adhoc")
 def calculate_adhoc(
     lines: List[Dict],
     output_pct: int,
@@ -193,6 +266,8 @@ def calculate_adhoc(
     usage_key: str,
     dev_rate: float,
     today: date,
+    tariffs: Optional[Tariffs] = None,
+    calendar: Optional[WorkingCalendar] = None,
 ) -> Dict:
     output_scale = float(output_pct) / 100.0
     hours_per_day = float(workshop_hours) / 5.0
@@ -200,7 +275,9 @@ def calculate_adhoc(
     current_daily_capacity = num_prisoners * daily_minutes_capacity_per_prisoner
     minutes_per_week_capacity = max(1e-9, num_prisoners * workshop_hours * 60.0 * output_scale)
 
-    overheads_weekly, _ = weekly_overheads_total(workshop_hours, area_m2, usage_key, num_prisoners, 0, customer_covers_supervisors)
+    overheads_weekly, _ = weekly_overheads_total(
+        workshop_hours, area_m2, usage_key, num_prisoners, 0, customer_covers_supervisors, tariffs=tariffs
+    )
     dev_weekly_total = (overheads_weekly * float(dev_rate)) if customer_type == "Commercial" else 0.0
     inst_weekly_total = (
         sum((s / 52.0) * (float(effective_pct) / 100.0) for s in supervisor_salaries)
@@ -210,8 +287,11 @@ def calculate_adhoc(
     weekly_cost_total = prisoners_weekly_cost + inst_weekly_total + overheads_weekly + dev_weekly_total
     cost_per_minute = weekly_cost_total / minutes_per_week_capacity
 
-    per_line, total_job_minutes, earliest_wd_available = [], 0.0, None
-    for ln in lines:
+    # Earliest-deadline-first schedule over the pooled daily minutes
+    sched = schedule_edf(lines, current_daily_capacity, today, calendar=calendar)
+
+    per_line, total_job_minutes = [], 0.0
+    for ln, sl in zip(lines, sched["per_line"]):
         mins_per_unit = float(ln["mins_per_item"]) * int(ln["pris_per_item"])
         unit_cost_ex_vat = cost_per_minute * mins_per_unit
         if customer_type == "Commercial" and apply_vat:
@@ -221,9 +301,6 @@ def calculate_adhoc(
 
         total_line_minutes = int(ln["units"]) * mins_per_unit
         total_job_minutes += total_line_minutes
-        wd_available = _working_days_between(today, ln["deadline"])
-        if earliest_wd_available is None or wd_available < earliest_wd_available:
-            earliest_wd_available = wd_available
         wd_needed_line_alone = math.ceil(total_line_minutes / current_daily_capacity) if current_daily_capacity > 0 else float("inf")
 
         per_line.append({
@@ -233,19 +310,29 @@ def calculate_adhoc(
             "unit_cost_inc_vat": unit_cost_inc_vat,
             "line_total_ex_vat": unit_cost_ex_vat * int(ln["units"]),
             "line_total_inc_vat": unit_cost_inc_vat * int(ln["units"]),
-            "wd_available": wd_available,
+            "wd_available": sl["wd_available"],
             "wd_needed_line_alone": wd_needed_line_alone,
+            "completion_wd": sl["completion_wd"],
+            "completion_date": sl["completion_date"],
+            "slack_wd": sl["slack_wd"],
+            "feasible": sl["feasible"],
         })
 
     wd_needed_all = math.ceil(total_job_minutes / current_daily_capacity) if current_daily_capacity > 0 else float("inf")
-    earliest_wd_available = earliest_wd_available or 0
-    available_total_minutes_by_deadline = current_daily_capacity * earliest_wd_available
-    hard_block = total_job_minutes > available_total_minutes_by_deadline
+    earliest_wd_available = min((p["wd_available"] for p in per_line), default=0)
+    hard_block = not sched["feasible"]
     reason = None
     if hard_block:
+        late = [p for p in per_line if not p["feasible"]]
+        detail = "; ".join(
+            f"{p['name']} needs {p['completion_wd']} working days, {p['wd_available']} available"
+            if p["completion_wd"] is not None else f"{p['name']} has no capacity"
+            for p in late[:5]
+        )
+        more = f" (+{len(late) - 5} more)" if len(late) > 5 else ""
         reason = (
-            f"Requested total minutes ({total_job_minutes:,.0f}) exceed available minutes by the earliest deadline "
-            f"({available_total_minutes_by_deadline:,.0f}). Reduce units, add prisoners, increase hours, extend deadline or lower Output%."
+            f"{len(late)} line(s) cannot be finished by their deadline when scheduled earliest-deadline-first: "
+            f"{detail}{more}. Reduce units, add prisoners, increase hours, extend deadline or lower Output%."
         )
 
     totals_ex = sum(p["line_total_ex_vat"] for p in per_line)
@@ -256,4 +343,5 @@ def calculate_adhoc(
         "totals": {"ex_vat": totals_ex, "inc_vat": totals_inc},
         "capacity": {"current_daily_capacity": current_daily_capacity, "minutes_per_week_capacity": minutes_per_week_capacity},
         "feasibility": {"earliest_wd_available": earliest_wd_available, "wd_needed_all": wd_needed_all, "hard_block": hard_block, "reason": reason},
+        "schedule": {"plan": sched["plan"], "makespan_wd": sched["makespan_wd"]},
     }
@@ -0,0 +1,281 @@
+# production_engine.py
+# Columnar (NumPy) contractual pricing.
+# Same formulas as production.calculate_production_contractual, evaluated for every
+# item in one pass. Scalars may be replaced by arrays that broadcast against the
+# item axis (last axis), e.g. shape (S, 1) to price S scenarios at once.
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+from config import CFG
+from production import weekly_overheads_total
+from tariff import Tariffs
+from tariff_tables import band_field
+from tracing import traced
+
+RESULT_COLUMNS = [
+    "Item", "Output %", "Pricing mode", "Capacity (units/week)", "Units/week",
+    "Unit Cost (£)", "Unit Price ex VAT (£)", "Unit Price inc VAT (£)", "Feasible", "Note",
+]
+
+# ---------- Overheads (vectorized) ----------
+def _hours_scale_array(hours) -> np.ndarray:
+    # Elementwise config.hours_scale: NaN hours -> 0.0, full week <= 0 -> 1.0
+    h = np.asarray(hours, dtype=float)
+    if CFG.FULL_UTILISATION_WEEK <= 0:
+        return np.ones_like(h)
+    return np.where(np.isnan(h), 0.0, np.maximum(0.0, h / CFG.FULL_UTILISATION_WEEK))
+
+def monthly_overheads_arrays(
+    workshop_hours,
+    area_m2,
+    usage_key,
+    num_prisoners,
+    num_supervisors,
+    customer_covers_supervisors,
+    *,
+    tariffs: Tariffs,
+    **rate_overrides,   # any Tariffs field as a scalar or array, e.g. gas_rate=draws
+) -> Dict[str, np.ndarray]:
+    # Array form of monthly_energy_costs / monthly_water_costs / monthly_maintenance.
+    r = {f: getattr(tariffs, f) for f in Tariffs.__dataclass_fields__}
+    unknown = set(rate_overrides) - set(r)
+    if unknown:
+        raise TypeError(f"Unknown tariff field(s): {sorted(unknown)}")
+    r.update(rate_overrides)
+
+    # `area_m2 or 0.0` as in the scalar path: a missing area is 0, NaN stays NaN
+    area = np.asarray(0.0 if area_m2 is None else area_m2, dtype=float)
+    hscale = _hours_scale_array(workshop_hours)
+
+    elec_kwh_y = band_field(usage_key, "elec_kwh_per_m2") * area
+    gas_kwh_y = band_field(usage_key, "gas_kwh_per_m2") * area
+    elec_m = (elec_kwh_y / 12.0) * np.asarray(r["electricity_rate"], dtype=float) * hscale \
+        + np.asarray(r["elec_daily"], dtype=float) * CFG.DAYS_PER_MONTH
+    gas_m = (gas_kwh_y / 12.0) * np.asarray(r["gas_rate"], dtype=float) * hscale \
+        + np.asarray(r["gas_daily"], dtype=float) * CFG.DAYS_PER_MONTH
+
+    covers = np.asarray(customer_covers_supervisors, dtype=bool)
+    persons = np.asarray(num_prisoners, dtype=np.int64) + np.where(covers, 0, np.asarray(num_supervisors, dtype=np.int64))
+    m3_per_year = persons * band_field(usage_key, "water_m3_per_employee")
+    water_m = (m3_per_year / 12.0) * np.asarray(r["water_rate"], dtype=float)
+
+    mscale = hscale if CFG.APPORTION_MAINTENANCE else 1.0
+    method = str(r["maint_method"])
+    if method.startswith("£/m² per year"):
+        rate = r["maint_rate_per_m2_y"]
+        if rate is None:
+            rate = band_field(usage_key, "maint_gbp_per_m2")
+        base_m = (np.asarray(rate, dtype=float) * area) / 12.0
+    elif method == "Set a fixed monthly amount":
+        base_m = np.asarray(r["maint_monthly"], dtype=float)
+    else:
+        base_m = (np.asarray(r["reinstate_val"], dtype=float) * (np.asarray(r["reinstate_pct"], dtype=float) / 100.0)) / 12.0
+    maint_m = base_m * mscale
+    admin_m = np.asarray(r["admin_monthly"], dtype=float)
+
+    shape = np.broadcast_shapes(np.shape(elec_m), np.shape(gas_m), np.shape(water_m), np.shape(maint_m), np.shape(admin_m))
+    elec_m, gas_m, water_m, admin_m, maint_m = (np.broadcast_to(a, shape) for a in (elec_m, gas_m, water_m, admin_m, maint_m))
+    overheads_m = elec_m + gas_m + water_m + admin_m + maint_m
+    return {
+        "Electricity (estimated)": elec_m,
+        "Gas (estimated)": gas_m,
+        "Water (estimated)": water_m,
+        "Administration": admin_m,
+        "Depreciation/Maintenance (estimated)": maint_m,
+        "overheads_monthly": overheads_m,
+        "overheads_weekly": overheads_m * 12.0 / 52.0,
+    }
+
+# ---------- Kernel ----------
+def contractual_kernel(
+    minutes,
+    required,
+    assigned,
+    *,
+    workshop_hours,
+    output_pct,
+    prisoner_salary,
+    inst_weekly_total,
+    overheads_weekly,
+    dev_weekly_total,
+    pricing_mode: str = "as-is",
+    targets=None,
+    denom=None,   # total labour minutes; computed from `assigned` when omitted
+) -> Dict[str, np.ndarray]:
+    minutes = np.asarray(minutes, dtype=float)
+    required = np.asarray(required)
+    assigned = np.asarray(assigned)
+    hours = np.asarray(workshop_hours, dtype=float)
+    output_scale = np.asarray(output_pct, dtype=float) / 100.0
+
+    labour = assigned * hours * 60.0
+    if denom is None:
+        # cumsum keeps the left-to-right summation order of the scalar version
+        denom = np.cumsum(labour, axis=-1)[..., -1:]
+    denom = np.asarray(denom, dtype=float)
+
+    ok = (assigned > 0) & (minutes > 0) & (required > 0) & (hours > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cap_100 = np.where(ok, labour / (minutes * required), 0.0)
+        capacity_units = cap_100 * output_scale
+        share = np.where(denom > 0, labour / denom, 0.0)
+
+    weekly_cost = (
+        assigned * prisoner_salary
+        + inst_weekly_total * share
+        + overheads_weekly * share
+        + dev_weekly_total * share
+    )
+
+    if pricing_mode == "target":
+        units = np.broadcast_to(np.asarray(targets if targets is not None else 0, dtype=float), capacity_units.shape)
+    else:
+        units = capacity_units
+
+    available_minutes = labour * output_scale
+    required_minutes = units * minutes * required
+    feasible = required_minutes <= (available_minutes + 1e-6)
+
+    priced = units > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit_cost = np.where(priced, weekly_cost / np.where(priced, units, 1.0), np.nan)
+
+    return {
+        "capacity_units": capacity_units,
+        "units": units,
+        "share": share,
+        "weekly_cost": weekly_cost,
+        "available_minutes": available_minutes,
+        "required_minutes": required_minutes,
+        "feasible": feasible,
+        "unit_cost": unit_cost,
+    }
+
+def contract_totals(
+    supervisor_salaries: Sequence[float],
+    effective_pct: float,
+    customer_covers_supervisors: bool,
+    customer_type: str,
+    overheads_weekly: float,
+    dev_rate: float,
+):
+    # (inst_weekly_total, dev_weekly_total) exactly as the scalar path builds them
+    dev_weekly_total = (overheads_weekly * float(dev_rate)) if customer_type == "Commercial" else 0.0
+    inst_weekly_total = (
+        sum((s / 52.0) * (float(effective_pct) / 100.0) for s in supervisor_salaries)
+        if not customer_covers_supervisors else 0.0
+    )
+    return inst_weekly_total, dev_weekly_total
+
+# ---------- DataFrame API ----------
+def _int_targets(targets, n: int) -> np.ndarray:
+    out = np.zeros(n, dtype=np.int64)
+    if targets is None:
+        return out
+    if isinstance(targets, np.ndarray) and targets.dtype.kind in "iuf":
+        m = min(n, len(targets))
+        out[:m] = targets[:m].astype(np.int64)
+        return out
+    for idx, t in enumerate(list(targets)[:n]):
+        try: out[idx] = int(t)
+        except Exception: out[idx] = 0
+    return out
+
+def _nullable_float(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # Mirrors pd.DataFrame(list_of_dicts): floats with NaN, or all-None object column
+    if mask.any():
+        return np.where(mask, values, np.nan)
+    return np.full(values.shape, None, dtype=object)
+
+@traced("pricing.contractual_frame")
+def price_contractual_frame(
+    minutes,
+    required,
+    assigned,
+    output_pct: int,
+    *,
+    names: Optional[Sequence[str]] = None,
+    workshop_hours: float,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_covers_supervisors: bool,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    num_supervisors: int,
+    dev_rate: float,
+    pricing_mode: str = "as-is",
+    targets=None,
+    tariffs: Optional[Tariffs] = None,
+) -> pd.DataFrame:
+    minutes = np.asarray(minutes, dtype=float)
+    required = np.asarray(required, dtype=np.int64)
+    assigned = np.asarray(assigned, dtype=np.int64)
+    n = len(minutes)
+
+    overheads_weekly, _ = weekly_overheads_total(
+        workshop_hours, area_m2, usage_key, num_prisoners, num_supervisors, customer_covers_supervisors,
+        tariffs=tariffs,
+    )
+    inst_weekly_total, dev_weekly_total = contract_totals(
+        supervisor_salaries, effective_pct, customer_covers_supervisors, customer_type, overheads_weekly, dev_rate
+    )
+    is_target = pricing_mode == "target"
+    k = contractual_kernel(
+        minutes, required, assigned,
+        workshop_hours=workshop_hours, output_pct=output_pct, prisoner_salary=prisoner_salary,
+        inst_weekly_total=inst_weekly_total, overheads_weekly=overheads_weekly, dev_weekly_total=dev_weekly_total,
+        pricing_mode=pricing_mode, targets=_int_targets(targets, n) if is_target else None,
+    )
+
+    priced = k["units"] > 0
+    unit_cost = k["unit_cost"]
+    if customer_type == "Commercial" and apply_vat:
+        unit_inc = unit_cost * (1 + (float(vat_rate) / 100.0))
+    else:
+        unit_inc = unit_cost
+
+    if names is None:
+        names = [""] * n
+    item_names = [((nm or "").strip() or f"Item {i+1}") for i, nm in enumerate(names)]
+
+    note = np.full(n, None, dtype=object)
+    if is_target:
+        feasible = k["feasible"]
+        for i in np.flatnonzero(~feasible):
+            note[i] = (
+                f"Target requires {k['required_minutes'][i]:,.0f} mins vs "
+                f"available {k['available_minutes'][i]:,.0f} mins; exceeds capacity."
+            )
+    else:
+        feasible = np.full(n, None, dtype=object)
+
+    cap, units = k["capacity_units"], k["units"]
+    return pd.DataFrame({
+        "Item": item_names,
+        "Output %": np.full(n, int(output_pct), dtype=np.int64),
+        "Pricing mode": ["Target units/week" if is_target else "As‑is (max units)"] * n,
+        "Capacity (units/week)": np.where(cap <= 0, 0, np.rint(cap)).astype(np.int64),
+        "Units/week": np.where(units <= 0, 0, np.rint(units)).astype(np.int64),
+        "Unit Cost (£)": _nullable_float(unit_cost, priced),
+        "Unit Price ex VAT (£)": _nullable_float(unit_cost, priced),
+        "Unit Price inc VAT (£)": _nullable_float(unit_inc, priced),
+        "Feasible": feasible,
+        "Note": note,
+    }, columns=RESULT_COLUMNS)
+
+def calculate_production_contractual_df(items: List[Dict], output_pct: int, **kwargs) -> pd.DataFrame:
+    # Drop-in for calculate_production_contractual taking the same `items` dicts.
+    return price_contractual_frame(
+        [float(it.get("minutes", 0)) for it in items],
+        [int(it.get("required", 1)) for it in items],
+        [int(it.get("assigned", 0)) for it in items],
+        output_pct,
+        names=[it.get("name") for it in items],
+        **kwargs,
+    )
@@ -0,0 +1,181 @@
+# quote_store.py
+# Persistent quote store (SQLite, WAL mode) shared by every session and user.
+# - Small pool of connections, so Streamlit reruns and threads reuse open handles.
+# - Indexed on quote number, prison, region, customer and date, and (user, id) for
+#   "My Quotes".
+# - Quote numbers come from an atomic counter row, so two sessions never get the
+#   same number.
+import datetime
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import CFG
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    quote_num     TEXT    NOT NULL UNIQUE,
+    user          TEXT,
+    region        TEXT,
+    prison        TEXT,
+    customer      TEXT,
+    workshop_mode TEXT,
+    total         REAL,
+    created       TEXT    NOT NULL,      -- ISO date (YYYY-MM-DD)
+    payload       TEXT                   -- JSON: breakdown, production results, ...
+);
+CREATE INDEX IF NOT EXISTS ix_quotes_user     ON quotes(user, id);
+CREATE INDEX IF NOT EXISTS ix_quotes_prison   ON quotes(prison, id);
+CREATE INDEX IF NOT EXISTS ix_quotes_region   ON quotes(region, id);
+CREATE INDEX IF NOT EXISTS ix_quotes_customer ON quotes(customer, id);
+CREATE INDEX IF NOT EXISTS ix_quotes_created  ON quotes(created, id);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+QUOTE_FIELDS = ("id", "quote_num", "user", "region", "prison", "customer", "workshop_mode", "total", "created")
+
+class QuoteStore:
+    def __init__(self, path: str = CFG.QUOTE_DB_PATH, pool_size: int = CFG.QUOTE_DB_POOL_SIZE):
+        self.path = path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pool_size = max(1, int(pool_size))
+        with self.connection() as con:
+            con.executescript(_SCHEMA)
+
+    # ---------- Connections ----------
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("PRAGMA busy_timeout=30000")
+        return con
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        # Borrow a pooled connection (autocommit; use `BEGIN` for transactions)
+        try:
+            con = self._pool.get_nowait()
+        except queue.Empty:
+            con = self._connect()
+            with self._lock:
+                self._all.append(con)
+        try:
+            yield con
+        finally:
+            if self._pool.qsize() < self._pool_size:
+                self._pool.put(con)
+            else:
+                with self._lock:
+                    self._all.remove(con)
+                con.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for con in self._all:
+                con.close()
+            self._all.clear()
+        self._pool = queue.LifoQueue()
+
+    # ---------- Quote numbers ----------
+    def next_quote_number(self, prefix: str = "HMPPS", counter: str = "quote") -> str:
+        # Atomic across sessions and processes: one UPSERT ... RETURNING in its own write transaction
+        with self.connection() as con:
+            row = con.execute(
+                "INSERT INTO counters(name, value) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value",
+                (counter,),
+            ).fetchone()
+        return f"{prefix}{int(row[0]):04d}"
+
+    # ---------- Quotes ----------
+    def add_quote(
+        self,
+        *,
+        quote_num: str,
+        user: Optional[str],
+        region: str,
+        prison: str,
+        customer: str,
+        workshop_mode: str,
+        total: float,
+        created: Optional[datetime.date] = None,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        created = created or datetime.date.today()
+        with self.connection() as con:
+            cur = con.execute(
+                "INSERT INTO quotes(quote_num, user, region, prison, customer, workshop_mode, total, created, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (quote_num, user, region, prison, customer, workshop_mode, float(total), created.isoformat(),
+                 json.dumps(payload, default=str) if payload is not None else None),
+            )
+            return int(cur.lastrowid)
+
+    def get_quote(self, quote_num: str) -> Optional[Dict[str, Any]]:
+        with self.connection() as con:
+            row = con.execute("SELECT * FROM quotes WHERE quote_num = ?", (quote_num,)).fetchone()
+        if row is None:
+            return None
+        q = dict(row)
+        q["payload"] = json.loads(q["payload"]) if q["payload"] else None
+        return q
+
+    def list_quotes(
+        self,
+        user: Optional[str] = None,
+        *,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+        prison: Optional[str] = None,
+        region: Optional[str] = None,
+        customer: Optional[str] = None,           # prefix match
+        date_from: Optional[datetime.date] = None,
+        date_to: Optional[datetime.date] = None,  # inclusive
+    ) -> List[Dict[str, Any]]:
+        # Newest first, one page at a time (keyset): pass the last row's id as before_id
+        # for the next page. Every filter is a range or equality on an indexed column.
+        where, args = [], []
+        for col, val in (("user", user), ("prison", prison), ("region", region)):
+            if val is not None:
+                where.append(f"{col} = ?"); args.append(val)
+        if customer:
+            where.append("customer >= ? AND customer < ?"); args += [customer, customer + "\uffff"]
+        if date_from is not None:
+            where.append("created >= ?"); args.append(date_from.isoformat())
+        if date_to is not None:
+            where.append("created <= ?"); args.append(date_to.isoformat())
+        if before_id is not None:
+            where.append("id < ?"); args.append(int(before_id))
+        sql = f"SELECT {', '.join(QUOTE_FIELDS)} FROM quotes"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self.connection() as con:
+            rows = con.execute(sql, (*args, int(limit))).fetchall()
+        return [dict(r) for r in rows]
+
+    def latest_id(self) -> int:
+        # Cheap change marker (primary-key lookup): bumps whenever a quote is added
+        with self.connection() as con:
+            return int(con.execute("SELECT COALESCE(MAX(id), 0) FROM quotes").fetchone()[0])
+
+_STORES: Dict[str, QuoteStore] = {}
+_STORES_LOCK = threading.Lock()
+
+def get_store(path: Optional[str] = None) -> QuoteStore:
+    # One store (and pool) per database file per process
+    path = path or CFG.QUOTE_DB_PATH
+    with _STORES_LOCK:
+        if path not in _STORES:
+            _STORES[path] = QuoteStore(path)
+        return _STORES[path]
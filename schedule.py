@@ -0,0 +1,92 @@
+# schedule.py
+# Earliest-deadline-first scheduling of ad‑hoc lines against the workshop's pooled
+# daily labour minutes. All lines are released today, so EDF order is optimal:
+# if EDF misses a deadline, no ordering of the same minutes can meet it.
+import heapq
+import math
+from datetime import date
+from typing import Dict, List, Optional
+import numpy as np
+
+from workdays import WorkingCalendar, get_calendar
+from tracing import traced
+
+def line_minutes(ln: Dict) -> float:
+    return int(ln["units"]) * (float(ln["mins_per_item"]) * int(ln["pris_per_item"]))
+
+def _days_for(minutes: float, daily_capacity: float) -> int:
+    # Working days needed to finish `minutes` of cumulative work (tolerates float fuzz)
+    if minutes <= 0:
+        return 0
+    return max(1, math.ceil(minutes / daily_capacity - 1e-9))
+
+@traced("pricing.schedule")
+def schedule_edf(
+    lines: List[Dict],
+    daily_capacity: float,
+    today: date,
+    *,
+    calendar: Optional[WorkingCalendar] = None,
+    with_plan: bool = True,
+) -> Dict:
+    cal = calendar or get_calendar()
+    n = len(lines)
+    wd_available = cal.working_days_between_many(today, [ln["deadline"] for ln in lines]).tolist()
+    mins = [line_minutes(ln) for ln in lines]
+
+    heap = [(ln["deadline"], i) for i, ln in enumerate(lines)]
+    heapq.heapify(heap)
+
+    per_line: List[Optional[Dict]] = [None] * n
+    plan: List[Dict] = []
+    cum, day, used_today = 0.0, 1, 0.0
+    while heap:
+        _, i = heapq.heappop(heap)
+        ln = lines[i]
+        if daily_capacity <= 0:
+            per_line[i] = {"name": ln["name"], "minutes": mins[i], "completion_wd": None, "completion_date": None,
+                           "wd_available": wd_available[i], "slack_wd": None, "feasible": mins[i] <= 0}
+            continue
+        cum += mins[i]
+        completion_wd = _days_for(cum, daily_capacity)
+        if with_plan:
+            remaining = mins[i]
+            while remaining > 1e-9:
+                take = min(remaining, daily_capacity - used_today)
+                plan.append({"day": day, "index": i, "name": ln["name"], "minutes": take})
+                remaining -= take
+                used_today += take
+                if used_today >= daily_capacity - 1e-9:
+                    day, used_today = day + 1, 0.0
+        per_line[i] = {
+            "name": ln["name"],
+            "minutes": mins[i],
+            "completion_wd": completion_wd,
+            "completion_date": None,
+            "wd_available": wd_available[i],
+            "slack_wd": wd_available[i] - completion_wd,
+            "feasible": completion_wd <= wd_available[i],
+        }
+
+    # Resolve working-day numbers to dates in one vectorized lookup
+    done = [(i, p["completion_wd"]) for i, p in enumerate(per_line) if p["completion_wd"]]
+    if done:
+        dates = cal.nth_working_day_many(today, [wd for _, wd in done]).tolist()
+        for (i, _), d in zip(done, dates):
+            per_line[i]["completion_date"] = d
+    for i, p in enumerate(per_line):
+        if p["completion_wd"] == 0:
+            p["completion_date"] = today
+
+    if with_plan and plan:
+        days = cal.nth_working_day_many(today, np.fromiter((p["day"] for p in plan), dtype=np.int64, count=len(plan))).tolist()
+        for p, d in zip(plan, days):
+            p["date"] = d
+
+    blocked = daily_capacity <= 0 and any(m > 0 for m in mins)
+    return {
+        "per_line": per_line,
+        "plan": plan,
+        "feasible": all(p["feasible"] for p in per_line),
+        "makespan_wd": None if blocked else max((p["completion_wd"] or 0 for p in per_line), default=0),
+    }
@@ -0,0 +1,150 @@
+# sensitivity.py
+# One-at-a-time sensitivity (tornado) analysis. Every input is nudged down and up
+# by the same percentage; the base case plus all 2×N perturbations are stacked as
+# scenarios and priced in a single vectorized call.
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from tariff import Tariffs
+from tariff_tables import band_field
+from production_engine import contractual_kernel, monthly_overheads_arrays, _int_targets
+from host import host_breakdown_arrays
+from tracing import traced
+
+TARIFF_INPUTS = ("electricity_rate", "elec_daily", "gas_rate", "gas_daily", "water_rate", "admin_monthly")
+
+def _maintenance_input(tariffs: Tariffs, usage_key: str) -> Tuple[str, float]:
+    # The maintenance figure that actually drives cost under the selected method
+    method = str(tariffs.maint_method)
+    if method.startswith("£/m² per year"):
+        rate = tariffs.maint_rate_per_m2_y
+        if rate is None:
+            rate = band_field(usage_key, "maint_gbp_per_m2")
+        return "maint_rate_per_m2_y", float(rate)
+    if method == "Set a fixed monthly amount":
+        return "maint_monthly", float(tariffs.maint_monthly)
+    return "reinstate_pct", float(tariffs.reinstate_pct)
+
+def _scenarios(base: Dict[str, float], inputs: Sequence[str], pct: float, caps: Dict[str, float]) -> Dict[str, np.ndarray]:
+    # Row 0 = base; rows 2i+1 / 2i+2 = input i down / up.
+    s = 1 + 2 * len(inputs)
+    cols = {k: np.full(s, float(v)) for k, v in base.items()}
+    for i, name in enumerate(inputs):
+        v = float(base[name])
+        cols[name][2 * i + 1] = max(0.0, v * (1 - pct))
+        cols[name][2 * i + 2] = min(caps.get(name, np.inf), v * (1 + pct))
+    return cols
+
+def _rank(rows: List[Dict], group: Optional[str] = None) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
+    df["Swing"] = (df["Up"] - df["Down"]).abs()
+    keys = ([group] if group else []) + ["Swing"]
+    return df.sort_values(keys, ascending=[True] * (len(keys) - 1) + [False], kind="stable").reset_index(drop=True)
+
+def _instructor_totals(supervisor_salaries: Sequence[float], pct: np.ndarray, per_year_divisor: float) -> np.ndarray:
+    sal = np.asarray(list(supervisor_salaries), dtype=float)
+    if sal.size == 0:
+        return np.zeros_like(pct)
+    terms = (sal[None, :] / per_year_divisor) * (pct[:, None] / 100.0)
+    return np.cumsum(terms, axis=1)[:, -1]
+
+# ---------- Contractual ----------
+@traced("analysis.tornado")
+def tornado_contractual(
+    items: List[Dict],
+    output_pct: float,
+    *,
+    pct: float = 0.10,
+    tariffs: Tariffs,
+    workshop_hours: float,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_covers_supervisors: bool,
+    customer_type: str,
+    apply_vat: bool,
+    vat_rate: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    num_supervisors: int,
+    dev_rate: float,
+    pricing_mode: str = "as-is",
+    targets: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    maint_key, maint_val = _maintenance_input(tariffs, usage_key)
+    base = {
+        "workshop_hours": workshop_hours, "prisoner_salary": prisoner_salary, "effective_pct": effective_pct,
+        "area_m2": area_m2, "output_pct": output_pct, "dev_rate": dev_rate,
+        **{f: getattr(tariffs, f) for f in TARIFF_INPUTS}, maint_key: maint_val,
+    }
+    inputs = list(base)
+    sc = _scenarios(base, inputs, pct, caps={"output_pct": 100.0, "effective_pct": 100.0})
+
+    oh = monthly_overheads_arrays(
+        sc["workshop_hours"], sc["area_m2"], usage_key, num_prisoners, num_supervisors, customer_covers_supervisors,
+        tariffs=tariffs, **{f: sc[f] for f in TARIFF_INPUTS}, **{maint_key: sc[maint_key]},
+    )
+    ovh = oh["overheads_weekly"]
+    inst = np.zeros_like(ovh) if customer_covers_supervisors else _instructor_totals(supervisor_salaries, sc["effective_pct"], 52.0)
+    dev = ovh * sc["dev_rate"] if customer_type == "Commercial" else np.zeros_like(ovh)
+    k = contractual_kernel(
+        [float(it.get("minutes", 0)) for it in items],
+        [int(it.get("required", 1)) for it in items],
+        [int(it.get("assigned", 0)) for it in items],
+        workshop_hours=sc["workshop_hours"][:, None], output_pct=sc["output_pct"][:, None],
+        prisoner_salary=sc["prisoner_salary"][:, None], inst_weekly_total=inst[:, None],
+        overheads_weekly=ovh[:, None], dev_weekly_total=dev[:, None],
+        pricing_mode=pricing_mode, targets=_int_targets(targets, len(items)) if pricing_mode == "target" else None,
+    )
+    price = k["unit_cost"]
+    if customer_type == "Commercial" and apply_vat:
+        price = price * (1 + float(vat_rate) / 100.0)
+
+    names = [((it.get("name") or "").strip() or f"Item {i+1}") for i, it in enumerate(items)]
+    rows = []
+    for j, name in enumerate(names):
+        for i, inp in enumerate(inputs):
+            rows.append({"Item": name, "Input": inp, "Base": price[0, j],
+                         "Down": price[2 * i + 1, j], "Up": price[2 * i + 2, j]})
+    return _rank(rows, group="Item")
+
+# ---------- Host ----------
+def tornado_host(
+    *,
+    pct: float = 0.10,
+    tariffs: Tariffs,
+    workshop_hours: float,
+    area_m2: float,
+    usage_key: str,
+    num_prisoners: int,
+    prisoner_salary: float,
+    num_supervisors: int,
+    customer_covers_supervisors: bool,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_type: str,
+    dev_rate: float,
+    vat_rate: float = 20.0,
+) -> pd.DataFrame:
+    maint_key, maint_val = _maintenance_input(tariffs, usage_key)
+    base = {
+        "workshop_hours": workshop_hours, "prisoner_salary": prisoner_salary, "effective_pct": effective_pct,
+        "area_m2": area_m2, "dev_rate": dev_rate,
+        **{f: getattr(tariffs, f) for f in TARIFF_INPUTS}, maint_key: maint_val,
+    }
+    inputs = list(base)
+    sc = _scenarios(base, inputs, pct, caps={"effective_pct": 100.0})
+    out = host_breakdown_arrays(
+        workshop_hours=sc["workshop_hours"], area_m2=sc["area_m2"], usage_key=usage_key,
+        num_prisoners=num_prisoners, prisoner_salary=sc["prisoner_salary"], num_supervisors=num_supervisors,
+        customer_covers_supervisors=customer_covers_supervisors,
+        instructor_monthly=_instructor_totals(supervisor_salaries, sc["effective_pct"], 12.0),
+        is_commercial=customer_type == "Commercial", dev_rate=sc["dev_rate"], vat_rate=vat_rate,
+        tariffs=tariffs, **{f: sc[f] for f in TARIFF_INPUTS}, **{maint_key: sc[maint_key]},
+    )
+    total = out["Grand Total (£/month)"]
+    rows = [{"Input": inp, "Base": total[0], "Down": total[2 * i + 1], "Up": total[2 * i + 2]}
+            for i, inp in enumerate(inputs)]
+    return _rank(rows)
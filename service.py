@@ -0,0 +1,301 @@
+# service.py
+# Local HTTP/JSON pricing service: the pricing core without the Streamlit UI.
+# An asyncio server (stdlib only, HTTP/1.1 keep-alive) parses requests and hands
+# the pricing to a pool of worker processes, so one slow quote never blocks the
+# event loop.
+#
+#   python service.py --port 8787 --workers 4
+#
+# Endpoints (request and response bodies are JSON):
+#   POST /quote/host          one quote, fields as a batch_price.py quote row
+#   POST /quote/contractual   ... plus "lines": [{name, minutes, required, assigned, target}]
+#   POST /quote/adhoc         ... plus "lines": [{name, units, minutes, required, deadline}]
+#   POST /quote/batch         {"quotes": [{"type": "host" | "contractual" | "adhoc", ...}]}
+#   GET  /metrics             request counts, errors and p50/p90/p99 latency per endpoint
+#   GET  /health
+# Quote fields and defaults are those of batch_price.py (workshop_hours, area_m2,
+# usage_key, num_prisoners, supervisor_salaries, output_pct, pricing_mode, prison,
+# Tariffs overrides, ...). "today" (YYYY-MM-DD) sets the ad-hoc pricing date.
+# Lines come back in batch_price.py's output columns, with "feasible" false when a
+# target or deadline cannot be met. Host quotes return the monthly breakdown.
+# A quote that cannot be priced returns "ok": false and an "error" message; the
+# HTTP status is still 200, like a failed row in a batch.
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from batch_price import OUTPUT_COLUMNS, QUOTE_TYPES, _price_adhoc, _price_contractual, _quote_params
+from host import generate_host_quote
+
+MAX_BODY = 8 * 1024 * 1024
+BATCH_CHUNK = 64                # quotes per worker task on /quote/batch
+LATENCY_WINDOW = 20_000         # latest requests kept for the percentiles
+ROUTES = ("/health", "/metrics", *(f"/quote/{k}" for k in (*QUOTE_TYPES, "batch")))
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# ---------- Pricing (runs in worker processes) ----------
+def _clean(v):
+    # JSON has no NaN or infinity: missing or unbounded numbers go out as null
+    return None if isinstance(v, float) and not math.isfinite(v) else v
+
+def _encode(payload: Dict) -> bytes:
+    return json.dumps(payload, default=str, allow_nan=False).encode("utf-8")
+
+def _host(p: Dict) -> Dict:
+    host_df, ctx = generate_host_quote(
+        workshop_hours=float(p["workshop_hours"]), area_m2=float(p["area_m2"]), usage_key=p["usage_key"],
+        num_prisoners=int(p["num_prisoners"]), prisoner_salary=float(p["prisoner_salary"]),
+        num_supervisors=int(p["num_supervisors"]), customer_covers_supervisors=p["customer_covers_supervisors"],
+        supervisor_salaries=p["supervisor_salaries"], effective_pct=float(p["effective_pct"]),
+        customer_type=p["customer_type"], apply_vat=p["apply_vat"], vat_rate=float(p["vat_rate"]),
+        dev_rate=float(p["dev_rate"]), tariffs=p["tariffs"],
+    )
+    return {
+        "breakdown": {k: _clean(v) for k, v in zip(host_df["Item"].tolist(), host_df["Amount (£)"].tolist())},
+        "totals": {"ex_vat": _clean(ctx["subtotal"]), "vat": _clean(ctx["vat_amount"]),
+                   "inc_vat": _clean(ctx["grand_total"]), "period": "month"},
+    }
+
+def price_quote(quote: Dict, today: Optional[date] = None) -> Dict:
+    qid = quote.get("quote_id")
+    qtype = str(quote.get("type", "")).strip().lower()
+    try:
+        if qtype not in QUOTE_TYPES:
+            raise ValueError(f"Unknown quote type: {qtype!r}")
+        p = _quote_params(quote)
+        if qtype == "host":
+            return {"quote_id": qid, "type": qtype, "ok": True, **_host(p)}
+        lines = quote.get("lines") or []
+        if not isinstance(lines, list) or not lines:
+            raise ValueError("Quote needs a non-empty 'lines' list")
+        if qtype == "contractual":
+            rows = _price_contractual(qid, lines, p)
+        else:
+            day = quote.get("today")
+            rows = _price_adhoc(qid, lines, p, date.fromisoformat(day) if day else (today or date.today()))
+    except Exception as e:
+        return {"quote_id": qid, "type": qtype, "ok": False, "error": f"{type(e).__name__}: {e}"}
+    cols = OUTPUT_COLUMNS[2:]   # quote_id and type are given once per quote
+    out_lines = [{c: _clean(r[c]) for c in cols} for r in rows]
+    return {
+        "quote_id": qid, "type": qtype, "ok": True,
+        "feasible": all(r["Feasible"] for r in rows),   # targets / deadlines met
+        "lines": out_lines,
+        "totals": {
+            "ex_vat": sum(r["Total ex VAT (£)"] for r in out_lines if r["Total ex VAT (£)"] is not None),
+            "inc_vat": sum(r["Total inc VAT (£)"] for r in out_lines if r["Total inc VAT (£)"] is not None),
+            "period": rows[0]["Period"],
+        },
+    }
+
+def price_quotes(quotes: List[Dict], today: Optional[date] = None) -> List[Dict]:
+    return [price_quote(q, today) for q in quotes]
+
+def _warm() -> None:
+    # Pool initializer: import and touch the pricing path before the first request
+    price_quote({"type": "contractual", "workshop_hours": 37.5, "num_prisoners": 1,
+                 "lines": [{"minutes": 10, "required": 1, "assigned": 1}]})
+
+# ---------- Metrics ----------
+class Metrics:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.started = time.time()
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.recent: "deque[Tuple[float, str, float]]" = deque(maxlen=window)   # (end time, route, seconds)
+        self.in_flight = 0
+
+    def observe(self, route: str, status: int, seconds: float) -> None:
+        # unknown paths share one entry, so junk URLs cannot grow the tables
+        route = route if route in ROUTES else "other"
+        self.counts[route] = self.counts.get(route, 0) + 1
+        if status >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        self.recent.append((time.time(), route, seconds))
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        by_route: Dict[str, List[float]] = {}
+        for _, route, dt in self.recent:
+            by_route.setdefault(route, []).append(dt)
+        last_min = sum(1 for t, _, _ in self.recent if t >= now - 60.0)
+        routes = {}
+        for route, n in sorted(self.counts.items()):
+            lat = sorted(by_route.get(route, []))
+            routes[route] = {
+                "requests": n,
+                "errors": self.errors.get(route, 0),
+                "window": len(lat),
+                **{f"p{q}_ms": round(_percentile(lat, q) * 1e3, 3) if lat else None for q in (50, 90, 99)},
+                "max_ms": round(lat[-1] * 1e3, 3) if lat else None,
+            }
+        return {
+            "uptime_s": round(now - self.started, 1),
+            "requests": sum(self.counts.values()),
+            "rps_1m": round(last_min / min(60.0, max(1e-9, now - self.started)), 1),
+            "in_flight": self.in_flight,
+            "routes": routes,
+        }
+
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    # nearest rank
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(q / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+# ---------- Server ----------
+class PricingService:
+    def __init__(self, workers: int = 0, *, max_body: int = MAX_BODY):
+        # workers=0 prices on the event loop's own thread (tests, tiny boxes)
+        self.workers = max(0, int(workers))
+        self.max_body = max_body
+        self.metrics = Metrics()
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8787) -> asyncio.AbstractServer:
+        if self.workers:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm)
+            # queue at most a few tasks per worker; later requests wait here, not in the pool
+            self._slots = asyncio.Semaphore(4 * self.workers)
+            await asyncio.gather(*(self._run(_warm) for _ in range(self.workers)))
+        else:
+            _warm()
+        return await asyncio.start_server(self._connection, host, port, backlog=1024)
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def _run(self, fn, *args):
+        if self.pool is None:
+            return fn(*args)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    # ---------- Routing ----------
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        if path == "/health":
+            return 200, {"status": "ok", "workers": self.workers}
+        if path == "/metrics":
+            return 200, self.metrics.snapshot()
+        if not path.startswith("/quote/"):
+            return 404, {"error": f"No such endpoint: {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        kind = path[len("/quote/"):]
+        if kind not in QUOTE_TYPES and kind != "batch":
+            return 404, {"error": f"No such endpoint: {path}"}
+        try:
+            req = json.loads(body or b"null")
+        except ValueError as e:
+            return 400, {"error": f"Invalid JSON: {e}"}
+        if not isinstance(req, dict):
+            return 400, {"error": "Body must be a JSON object"}
+        if kind != "batch":
+            return 200, await self._run(price_quote, dict(req, type=kind))
+
+        quotes = req.get("quotes")
+        if not isinstance(quotes, list) or not all(isinstance(q, dict) for q in quotes):
+            return 400, {"error": "'quotes' must be a list of objects"}
+        chunks = [quotes[i:i + BATCH_CHUNK] for i in range(0, len(quotes), BATCH_CHUNK)]
+        results = await asyncio.gather(*(self._run(price_quotes, c) for c in chunks))
+        priced = [r for chunk in results for r in chunk]
+        return 200, {"quotes": priced, "priced": len(priced), "failed": sum(1 for r in priced if not r["ok"])}
+
+    # ---------- HTTP/1.1 ----------
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, _encode({"error": "Malformed request line"}), keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = line.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close" if version == "HTTP/1.1"
+                              else headers.get("connection", "").lower() == "keep-alive")
+                if "chunked" in headers.get("transfer-encoding", "").lower():
+                    await self._respond(writer, 411, _encode({"error": "Send a Content-Length"}), keep_alive=False)
+                    break
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0 or length > self.max_body:
+                    await self._respond(writer, 413 if length > 0 else 400, _encode({"error": "Bad Content-Length"}), keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                path = target.split("?", 1)[0]
+                counted = path != "/metrics"   # scraping does not show up in its own numbers
+                t0 = time.perf_counter()
+                self.metrics.in_flight += counted
+                try:
+                    status, payload = await self.handle(method.upper(), path, body)
+                    data = _encode(payload)
+                except Exception as e:
+                    status, data = 500, _encode({"error": f"{type(e).__name__}: {e}"})
+                finally:
+                    self.metrics.in_flight -= counted
+                await self._respond(writer, status, data, keep_alive=keep_alive)
+                if counted:
+                    self.metrics.observe(path, status, time.perf_counter() - t0)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, data: bytes, *, keep_alive: bool) -> None:
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+async def serve(host: str, port: int, workers: int) -> None:
+    svc = PricingService(workers)
+    server = await svc.start(host, port)
+    print(f"Pricing service on http://{host}:{port} ({workers or 'no'} worker processes)", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        svc.close()
+
+# ---------- CLI ----------
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Serve the pricing core over HTTP/JSON.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--workers", type=int, default=None, help="pricing processes (default: all cores; 0 = price in the server process)")
+    args = ap.parse_args(argv)
+    workers = (os.cpu_count() or 1) if args.workers is None else args.workers
+    try:
+        asyncio.run(serve(args.host, args.port, workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,69 +2,97 @@
 import streamlit as st
 from tariff import TARIFF_BANDS
 
+METHOD_OPTIONS = ["£/m² per year (industry standard)", "Set a fixed monthly amount", "% of reinstatement value"]
+
+@st.cache_resource
+def _intensities() -> dict:
+    # Static band intensities for the captions, built once per process
+    per_year = {k: TARIFF_BANDS[k]["intensity_per_year"] for k in ("low", "medium", "high")}
+    return {
+        "elec": {k: v["elec_kwh_per_m2"] for k, v in per_year.items()},
+        "gas": {k: v["gas_kwh_per_m2"] for k, v in per_year.items()},
+        "water": per_year["low"]["water_m3_per_employee"],
+    }
+
 def draw_sidebar(usage_key: str) -> None:
+    # Band defaults are applied on every full run. The inputs are a fragment: editing them
+    # reruns only the sidebar, and "Apply tariffs" reruns the app so prices pick them up.
+    if usage_key not in TARIFF_BANDS:
+        usage_key = "low"
+    _apply_band_defaults(usage_key)
     with st.sidebar:
-        st.header("Tariffs & Overheads")
-        st.markdown("← Set tariff and overhead rates here")
-
-        if usage_key not in TARIFF_BANDS:
-            usage_key = "low"
-        band = TARIFF_BANDS[usage_key]
-
-        required_keys = [
-            "electricity_rate", "elec_daily",
-            "gas_rate", "gas_daily",
-            "water_rate", "admin_monthly",
-            "maint_method", "maint_rate_per_m2_y",
-            "maint_monthly", "reinstate_val", "reinstate_pct",
-            "last_applied_band",
-        ]
-        for k in required_keys:
-            if k not in st.session_state:
-                st.session_state[k] = None
-
-        critical = ["electricity_rate", "elec_daily", "gas_rate", "gas_daily", "water_rate", "admin_monthly", "maint_rate_per_m2_y"]
-        band_changed = st.session_state.get("last_applied_band") != usage_key
-        missing_critical = any(st.session_state[k] is None for k in critical)
-        if band_changed or missing_critical:
-            st.session_state["electricity_rate"]    = float(band["rates"]["elec_unit"])
-            st.session_state["elec_daily"]          = float(band["rates"]["elec_daily"])
-            st.session_state["gas_rate"]            = float(band["rates"]["gas_unit"])
-            st.session_state["gas_daily"]           = float(band["rates"]["gas_daily"])
-            st.session_state["water_rate"]          = float(band["rates"]["water_unit"])
-            st.session_state["admin_monthly"]       = float(band["rates"]["admin_monthly"])
-            st.session_state["maint_rate_per_m2_y"] = float(band["intensity_per_year"]["maint_gbp_per_m2"])
-            if st.session_state.get("maint_method") is None:
-                st.session_state["maint_method"] = "£/m² per year (industry standard)"
-            if st.session_state.get("maint_monthly") is None:
-                st.session_state["maint_monthly"] = 0.0
-            if st.session_state.get("reinstate_val") is None:
-                st.session_state["reinstate_val"] = 0.0
-            if st.session_state.get("reinstate_pct") is None:
-                st.session_state["reinstate_pct"] = 2.0
-            st.session_state["last_applied_band"] = usage_key
-
-        elec_low = TARIFF_BANDS["low"]["intensity_per_year"]["elec_kwh_per_m2"]
-        elec_med = TARIFF_BANDS["medium"]["intensity_per_year"]["elec_kwh_per_m2"]
-        elec_high = TARIFF_BANDS["high"]["intensity_per_year"]["elec_kwh_per_m2"]
-        gas_low = TARIFF_BANDS["low"]["intensity_per_year"]["gas_kwh_per_m2"]
-        gas_med = TARIFF_BANDS["medium"]["intensity_per_year"]["gas_kwh_per_m2"]
-        gas_high = TARIFF_BANDS["high"]["intensity_per_year"]["gas_kwh_per_m2"]
-        water_per_emp_y = TARIFF_BANDS["low"]["intensity_per_year"]["water_m3_per_employee"]
-
-        def _mark(v, k):
-            return f"**{v}** ← selected" if usage_key == k else f"{v}"
-
-        st.caption(
-            f"Electricity intensity (kWh/m²/yr): Low {_mark(elec_low,'low')} • "
-            f"Medium {_mark(elec_med,'medium')} • High {_mark(elec_high,'high')}"
-        )
-        st.caption(
-            f"Gas intensity (kWh/m²/yr): Low {_mark(gas_low,'low')} • "
-            f"Medium {_mark(gas_med,'medium')} • High {_mark(gas_high,'high')}"
-        )
-        st.caption(f"Water: {water_per_emp_y} m³ per employee per year")
+        _tariff_inputs(usage_key)
+
+def _apply_band_defaults(usage_key: str) -> None:
+    band = TARIFF_BANDS[usage_key]
+    required_keys = [
+        "electricity_rate", "elec_daily",
+        "gas_rate", "gas_daily",
+        "water_rate", "admin_monthly",
+        "maint_method", "maint_rate_per_m2_y",
+        "maint_monthly", "reinstate_val", "reinstate_pct",
+        "last_applied_band",
+    ]
+    for k in required_keys:
+        if k not in st.session_state:
+            st.session_state[k] = None
+
+    critical = ["electricity_rate", "elec_daily", "gas_rate", "gas_daily", "water_rate", "admin_monthly", "maint_rate_per_m2_y"]
+    band_changed = st.session_state.get("last_applied_band") != usage_key
+    missing_critical = any(st.session_state[k] is None for k in critical)
+    if band_changed or missing_critical:
+        st.session_state["electricity_rate"]    = float(band["rates"]["elec_unit"])
+        st.session_state["elec_daily"]          = float(band["rates"]["elec_daily"])
+        st.session_state["gas_rate"]            = float(band["rates"]["gas_unit"])
+        st.session_state["gas_daily"]           = float(band["rates"]["gas_daily"])
+        st.session_state["water_rate"]          = float(band["rates"]["water_unit"])
+        st.session_state["admin_monthly"]       = float(band["rates"]["admin_monthly"])
+        st.session_state["maint_rate_per_m2_y"] = float(band["intensity_per_year"]["maint_gbp_per_m2"])
+        if st.session_state.get("maint_method") is None:
+            st.session_state["maint_method"] = METHOD_OPTIONS[0]
+        if st.session_state.get("maint_monthly") is None:
+            st.session_state["maint_monthly"] = 0.0
+        if st.session_state.get("reinstate_val") is None:
+            st.session_state["reinstate_val"] = 0.0
+        if st.session_state.get("reinstate_pct") is None:
+            st.session_state["reinstate_pct"] = 2.0
+        st.session_state["last_applied_band"] = usage_key
+
+@st.fragment
+def _tariff_inputs(usage_key: str) -> None:
+    st.header("Tariffs & Overheads")
+    st.markdown("← Set tariff and overhead rates here")
 
+    intensity = _intensities()
+    elec, gas = intensity["elec"], intensity["gas"]
+
+    def _mark(v, k):
+        return f"**{v}** ← selected" if usage_key == k else f"{v}"
+
+    st.caption(
+        f"Electricity intensity (kWh/m²/yr): Low {_mark(elec['low'],'low')} • "
+        f"Medium {_mark(elec['medium'],'medium')} • High {_mark(elec['high'],'high')}"
+    )
+    st.caption(
+        f"Gas intensity (kWh/m²/yr): Low {_mark(gas['low'],'low')} • "
+        f"Medium {_mark(gas['medium'],'medium')} • High {_mark(gas['high'],'high')}"
+    )
+    st.caption(f"Water: {intensity['water']} m³ per employee per year")
+
+    # Maintenance method sits outside the form: it decides which fields the form shows.
+    # The choice is staged in its own key and only becomes maint_method on "Apply tariffs",
+    # so prices never run on a method the results don't show yet.
+    current_method = st.session_state.get("maint_method") or METHOD_OPTIONS[0]
+    if current_method not in METHOD_OPTIONS:
+        current_method = METHOD_OPTIONS[0]
+    if st.session_state.get("maint_method_pending") not in METHOD_OPTIONS:
+        st.session_state["maint_method_pending"] = current_method
+    method = st.radio("Maintenance / Depreciation method", METHOD_OPTIONS, key="maint_method_pending")
+    if method != current_method:
+        st.caption("Press **Apply tariffs** to price with this method.")
+
+    # Rates are batched: nothing reruns while typing, one app rerun on "Apply tariffs"
+    with st.form("tariff_form", border=False):
         # Electricity
         st.markdown("**Electricity**")
         c1, c2 = st.columns(2)
@@ -87,15 +115,9 @@ def draw_sidebar(usage_key: str) -> None:
 
         # Maintenance / Depreciation
         st.markdown("**Maintenance / Depreciation**")
-        method_options = ["£/m² per year (industry standard)", "Set a fixed monthly amount", "% of reinstatement value"]
-        current_method = st.session_state.get("maint_method") or method_options[0]
-        if current_method not in method_options:
-            current_method = method_options[0]
-        method_index = method_options.index(current_method)
-        st.radio("Method", method_options, index=method_index, key="maint_method")
-        if st.session_state["maint_method"].startswith("£/m² per year"):
+        if method.startswith("£/m² per year"):
             st.number_input("Maintenance rate (£/m²/year)", min_value=0.0, step=0.5, key="maint_rate_per_m2_y")
-        elif st.session_state["maint_method"] == "Set a fixed monthly amount":
+        elif method == "Set a fixed monthly amount":
             st.number_input("Maintenance (monthly £)", min_value=0.0, step=25.0, key="maint_monthly")
         else:
             st.number_input("Reinstatement value (£)", min_value=0.0, step=10000.0, key="reinstate_val")
@@ -104,3 +126,7 @@ def draw_sidebar(usage_key: str) -> None:
         # Administration
         st.markdown("**Administration**")
         st.number_input("Admin (monthly £)", min_value=0.0, step=25.0, key="admin_monthly")
+
+        if st.form_submit_button("Apply tariffs"):
+            st.session_state["maint_method"] = method
+            st.rerun()
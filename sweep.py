@@ -0,0 +1,157 @@
+# sweep.py
+# Full Cartesian parameter sweep for contractual pricing:
+#   Output % × weekly hours × headcount × assigned prisoners (per item options).
+# Points are evaluated in chunks with the vectorized kernel and written straight
+# to disk (memory-mapped .npy arrays or Parquet row groups), so grids of tens of
+# millions of points never have to fit in RAM.
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from tariff import Tariffs
+from production_engine import contract_totals, contractual_kernel, monthly_overheads_arrays, _int_targets
+
+_BLOCK_ELEMENTS = 2_000_000   # points × items per chunk
+
+def grid_axes(
+    items: List[Dict],
+    output_pcts: Sequence[float],
+    hours: Sequence[float],
+    headcounts: Sequence[int],
+    assigned_options: Optional[Sequence[Sequence[int]]] = None,
+) -> Dict[str, list]:
+    if assigned_options is None:
+        assigned_options = [[int(it.get("assigned", 0))] for it in items]
+    if len(assigned_options) != len(items):
+        raise ValueError("assigned_options needs one list of candidate counts per item")
+    axes = {"output_pct": [float(v) for v in output_pcts], "hours": [float(v) for v in hours],
+            "headcount": [int(v) for v in headcounts]}
+    for i, opts in enumerate(assigned_options):
+        axes[f"assigned_{i}"] = [int(v) for v in opts]
+    if any(len(v) == 0 for v in axes.values()):
+        raise ValueError("Every sweep axis needs at least one value")
+    return axes
+
+def grid_point(axes: Dict[str, list], flat_index: int) -> Dict[str, float]:
+    # Decode a flat row number of the results back to its parameter values
+    shape = tuple(len(v) for v in axes.values())
+    idx = np.unravel_index(int(flat_index), shape)
+    return {k: v[i] for (k, v), i in zip(axes.items(), idx)}
+
+def _evaluate_chunk(lo: int, hi: int, axes, shape, minutes, required, ctx) -> Dict[str, np.ndarray]:
+    coords = np.unravel_index(np.arange(lo, hi, dtype=np.int64), shape)
+    vals = [np.asarray(v)[c] for v, c in zip(axes.values(), coords)]
+    out_pct, hours, heads = vals[0], vals[1], vals[2].astype(np.int64)
+    assigned = np.stack(vals[3:], axis=1).astype(np.int64) if len(vals) > 3 else np.zeros((hi - lo, 0), dtype=np.int64)
+
+    oh = monthly_overheads_arrays(
+        hours, ctx["area_m2"], ctx["usage_key"], heads, ctx["num_supervisors"], ctx["customer_covers_supervisors"],
+        tariffs=ctx["tariffs"],
+    )
+    ovh = oh["overheads_weekly"]
+    dev = ovh * float(ctx["dev_rate"]) if ctx["customer_type"] == "Commercial" else np.zeros_like(ovh)
+    k = contractual_kernel(
+        minutes, required, assigned,
+        workshop_hours=hours[:, None], output_pct=out_pct[:, None], prisoner_salary=ctx["prisoner_salary"],
+        inst_weekly_total=ctx["inst_weekly_total"], overheads_weekly=ovh[:, None], dev_weekly_total=dev[:, None],
+        pricing_mode=ctx["pricing_mode"], targets=ctx["targets"],
+    )
+    price = k["unit_cost"] * ctx["vat_mult"]
+    feasible = assigned.sum(axis=1) <= heads
+    if ctx["pricing_mode"] == "target":
+        feasible &= k["feasible"].all(axis=1)
+    return {"coords": vals, "price": price, "feasible": feasible}
+
+def sweep_contractual(
+    items: List[Dict],
+    *,
+    output_pcts: Sequence[float],
+    hours: Sequence[float],
+    headcounts: Sequence[int],
+    assigned_options: Optional[Sequence[Sequence[int]]] = None,
+    out_dir: str,
+    fmt: str = "npy",                 # "npy" (memory-mapped arrays) or "parquet"
+    chunk_points: Optional[int] = None,
+    inc_vat: bool = True,
+    tariffs: Tariffs,
+    prisoner_salary: float,
+    supervisor_salaries: List[float],
+    effective_pct: float,
+    customer_covers_supervisors: bool,
+    customer_type: str,
+    vat_rate: float,
+    area_m2: float,
+    usage_key: str,
+    num_supervisors: int,
+    dev_rate: float,
+    pricing_mode: str = "as-is",
+    targets: Optional[List[int]] = None,
+) -> Dict:
+    if fmt not in ("npy", "parquet"):
+        raise ValueError("fmt must be 'npy' or 'parquet'")
+    axes = grid_axes(items, output_pcts, hours, headcounts, assigned_options)
+    shape = tuple(len(v) for v in axes.values())
+    n_points = int(np.prod(shape, dtype=np.int64))
+    n_items = len(items)
+    minutes = np.array([float(it.get("minutes", 0)) for it in items])
+    required = np.array([int(it.get("required", 1)) for it in items])
+    inst, _ = contract_totals(supervisor_salaries, effective_pct, customer_covers_supervisors, customer_type, 0.0, dev_rate)
+    ctx = {
+        "tariffs": tariffs, "area_m2": area_m2, "usage_key": usage_key, "num_supervisors": num_supervisors,
+        "customer_covers_supervisors": customer_covers_supervisors, "customer_type": customer_type,
+        "dev_rate": dev_rate, "prisoner_salary": prisoner_salary, "inst_weekly_total": inst,
+        "pricing_mode": pricing_mode,
+        "targets": _int_targets(targets, n_items) if pricing_mode == "target" else None,
+        "vat_mult": (1 + float(vat_rate) / 100.0) if (inc_vat and customer_type == "Commercial") else 1.0,
+    }
+    step = int(chunk_points or max(1, _BLOCK_ELEMENTS // max(1, n_items)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta = {"shape": list(shape), "n_points": n_points, "items": [it.get("name") or f"Item {i+1}" for i, it in enumerate(items)],
+            "axes": axes, "pricing_mode": pricing_mode, "inc_vat": bool(ctx["vat_mult"] != 1.0), "format": fmt}
+    with open(os.path.join(out_dir, "axes.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+
+    if fmt == "npy":
+        prices = np.lib.format.open_memmap(os.path.join(out_dir, "prices.npy"), mode="w+", dtype=np.float32, shape=(n_points, n_items))
+        feas = np.lib.format.open_memmap(os.path.join(out_dir, "feasible.npy"), mode="w+", dtype=np.bool_, shape=(n_points,))
+        for lo in range(0, n_points, step):
+            hi = min(n_points, lo + step)
+            r = _evaluate_chunk(lo, hi, axes, shape, minutes, required, ctx)
+            prices[lo:hi] = r["price"]
+            feas[lo:hi] = r["feasible"]
+        prices.flush(); feas.flush()
+        del prices, feas
+        return {"out_dir": out_dir, **meta}
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:  # optional dependency
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)") from e
+    writer = None
+    try:
+        for lo in range(0, n_points, step):
+            hi = min(n_points, lo + step)
+            r = _evaluate_chunk(lo, hi, axes, shape, minutes, required, ctx)
+            cols = {name: vals for name, vals in zip(axes, r["coords"])}
+            for j in range(n_items):
+                cols[f"price_{j}"] = r["price"][:, j].astype(np.float32)
+            cols["feasible"] = r["feasible"]
+            table = pa.table(cols)
+            if writer is None:
+                writer = pq.ParquetWriter(os.path.join(out_dir, "sweep.parquet"), table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return {"out_dir": out_dir, **meta}
+
+def open_sweep(out_dir: str) -> Dict:
+    # Read-only memory maps over an .npy sweep (no data loaded until indexed)
+    with open(os.path.join(out_dir, "axes.json")) as f:
+        meta = json.load(f)
+    meta["prices"] = np.load(os.path.join(out_dir, "prices.npy"), mmap_mode="r")
+    meta["feasible"] = np.load(os.path.join(out_dir, "feasible.npy"), mmap_mode="r")
+    return meta
@@ -1,5 +1,9 @@
 # tariff.py
 # Tariff bands, Prison -> Region map, and Supervisor pay bands.
+# Also the immutable Tariffs object the pricing core runs on (no Streamlit needed).
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+from config import CFG
 
 PRISON_TO_REGION = {
     "Altcourse": "National", "Ashfield": "National", "Askham Grange": "National",
@@ -106,3 +110,47 @@ TARIFF_BANDS = {
         },
     },
 }
+
+# ---------- Tariff/overhead inputs ----------
+MAINT_METHODS = ("£/m² per year (industry standard)", "Set a fixed monthly amount", "% of reinstatement value")
+
+@dataclass(frozen=True)
+class Tariffs:
+    electricity_rate: float
+    elec_daily: float
+    gas_rate: float
+    gas_daily: float
+    water_rate: float
+    admin_monthly: float = CFG.DEFAULT_ADMIN_MONTHLY
+    maint_method: str = MAINT_METHODS[0]
+    maint_rate_per_m2_y: Optional[float] = None  # None -> band default (maint_gbp_per_m2)
+    maint_monthly: float = 0.0
+    reinstate_val: float = 0.0
+    reinstate_pct: float = 0.0
+
+def tariffs_for_band(usage_key: str) -> Tariffs:
+    band = TARIFF_BANDS[usage_key]
+    r = band["rates"]
+    return Tariffs(
+        electricity_rate=float(r["elec_unit"]), elec_daily=float(r["elec_daily"]),
+        gas_rate=float(r["gas_unit"]), gas_daily=float(r["gas_daily"]),
+        water_rate=float(r["water_unit"]), admin_monthly=float(r["admin_monthly"]),
+        maint_rate_per_m2_y=float(band["intensity_per_year"]["maint_gbp_per_m2"]),
+    )
+
+def tariffs_from_state(state: Mapping[str, Any]) -> Tariffs:
+    # Snapshot of the sidebar keys (st.session_state or any plain dict).
+    rate = state.get("maint_rate_per_m2_y")
+    return Tariffs(
+        electricity_rate=float(state["electricity_rate"]),
+        elec_daily=float(state["elec_daily"]),
+        gas_rate=float(state["gas_rate"]),
+        gas_daily=float(state["gas_daily"]),
+        water_rate=float(state["water_rate"]),
+        admin_monthly=float(state.get("admin_monthly", CFG.DEFAULT_ADMIN_MONTHLY)),
+        maint_method=str(state.get("maint_method") or MAINT_METHODS[0]),
+        maint_rate_per_m2_y=None if rate is None else float(rate),
+        maint_monthly=float(state.get("maint_monthly") or 0.0),
+        reinstate_val=float(state.get("reinstate_val") or 0.0),
+        reinstate_pct=float(state.get("reinstate_pct") or 0.0),
+    )
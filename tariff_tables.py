@@ -0,0 +1,131 @@
+# tariff_tables.py
+# TARIFF_BANDS, SUPERVISOR_PAY and PRISON_TO_REGION compiled once at import into
+# integer-indexed NumPy tables, so batch code can gather rates for any number of
+# rows with one fancy-indexing step instead of walking dicts per row.
+#   BAND_TABLE   band × field   (structured array, one float field per band value)
+#   PAY_TABLE    region × title (avg_total, NaN where a region has no such title)
+#   PRISON_REGION prison -> region code
+# The dicts in tariff.py stay the source of truth; edit them, not these tables.
+from typing import List, Optional, Sequence, Tuple, Union
+import numpy as np
+
+from tariff import PRISON_TO_REGION, SUPERVISOR_PAY, TARIFF_BANDS
+
+ArrayLike = Union[str, int, Sequence, np.ndarray]
+
+# ---------- Compile ----------
+def _band_fields() -> Tuple[str, ...]:
+    first = next(iter(TARIFF_BANDS.values()))
+    return tuple(first["intensity_per_year"]) + tuple(first["rates"])
+
+BAND_NAMES: Tuple[str, ...] = tuple(TARIFF_BANDS)
+BAND_FIELDS: Tuple[str, ...] = _band_fields()
+BAND_DTYPE = np.dtype([(f, np.float64) for f in BAND_FIELDS])
+
+def _compile_bands() -> np.ndarray:
+    table = np.zeros(len(BAND_NAMES), dtype=BAND_DTYPE)
+    for i, name in enumerate(BAND_NAMES):
+        band = TARIFF_BANDS[name]
+        values = {**band["intensity_per_year"], **band["rates"]}
+        missing = set(BAND_FIELDS) - set(values)
+        if missing:
+            raise ValueError(f"Tariff band '{name}' is missing {sorted(missing)}")
+        table[i] = tuple(float(values[f]) for f in BAND_FIELDS)
+    table.flags.writeable = False
+    return table
+
+BAND_TABLE = _compile_bands()
+BAND_MATRIX = BAND_TABLE.view(np.float64).reshape(len(BAND_NAMES), len(BAND_FIELDS))  # same memory, 2-D view
+
+REGION_NAMES: Tuple[str, ...] = tuple(SUPERVISOR_PAY)
+PAY_TITLES: Tuple[str, ...] = tuple(sorted({t["title"] for rows in SUPERVISOR_PAY.values() for t in rows}))
+
+def _compile_pay() -> np.ndarray:
+    table = np.full((len(REGION_NAMES), len(PAY_TITLES)), np.nan)
+    for r, region in enumerate(REGION_NAMES):
+        for t in SUPERVISOR_PAY[region]:
+            table[r, PAY_TITLES.index(t["title"])] = float(t["avg_total"])
+    table.flags.writeable = False
+    return table
+
+PAY_TABLE = _compile_pay()
+
+PRISON_NAMES: Tuple[str, ...] = tuple(sorted(PRISON_TO_REGION))
+PRISON_REGION = np.array([REGION_NAMES.index(PRISON_TO_REGION[p]) for p in PRISON_NAMES], dtype=np.int16)
+PRISON_REGION.flags.writeable = False
+
+# ---------- Name -> code ----------
+def _encoder(names: Tuple[str, ...]):
+    order = np.argsort(np.array(names, dtype=str), kind="stable")
+    sorted_names = np.array(names, dtype=str)[order]
+    lookup = {n: i for i, n in enumerate(names)}
+    return lookup, sorted_names, order
+
+_ENCODERS = {
+    "band": _encoder(BAND_NAMES),
+    "region": _encoder(REGION_NAMES),
+    "title": _encoder(PAY_TITLES),
+    "prison": _encoder(PRISON_NAMES),
+}
+
+def _encode(kind: str, keys: ArrayLike):
+    # Scalars return an int, arrays an int array. Integer input is taken as codes already.
+    lookup, sorted_names, order = _ENCODERS[kind]
+    if isinstance(keys, str):
+        try:
+            return lookup[keys]
+        except KeyError:
+            raise KeyError(f"Unknown {kind}: {keys!r}") from None
+    arr = np.asarray(keys)
+    if arr.dtype.kind in "iu":
+        if arr.size and (arr.min() < 0 or arr.max() >= len(sorted_names)):
+            raise KeyError(f"{kind} code out of range")
+        return arr
+    arr = arr.astype(str)
+    pos = np.clip(np.searchsorted(sorted_names, arr), 0, len(sorted_names) - 1)
+    bad = sorted_names[pos] != arr
+    if bad.any():
+        raise KeyError(f"Unknown {kind}(s): {sorted(set(arr[bad].tolist()))}")
+    return order[pos]
+
+def band_codes(usage_key: ArrayLike):
+    return _encode("band", usage_key)
+
+def region_codes(region: ArrayLike):
+    return _encode("region", region)
+
+def title_codes(title: ArrayLike):
+    return _encode("title", title)
+
+def prison_codes(prison: ArrayLike):
+    return _encode("prison", prison)
+
+# ---------- Accessors ----------
+def band_field(usage_key: ArrayLike, field: str):
+    # Float for a single band name, float array (same shape as the keys) otherwise.
+    if field not in BAND_DTYPE.names:
+        raise KeyError(f"Unknown band field: {field!r} (expected one of {BAND_FIELDS})")
+    out = BAND_TABLE[field][band_codes(usage_key)]
+    return float(out) if np.ndim(out) == 0 else out
+
+def band_fields(usage_key: ArrayLike, fields: Optional[Sequence[str]] = None) -> np.ndarray:
+    # Rows of the band matrix: shape keys.shape + (len(fields),)
+    cols = [BAND_FIELDS.index(f) for f in (fields or BAND_FIELDS)]
+    return BAND_MATRIX[np.asarray(band_codes(usage_key))[..., None], cols]
+
+def region_of(prison: ArrayLike):
+    # Region code(s) for prison name(s) or codes; see region_name for the label.
+    return PRISON_REGION[prison_codes(prison)]
+
+def region_name(code) -> Union[str, List[str]]:
+    names = np.array(REGION_NAMES, dtype=object)[np.asarray(code)]
+    return names.tolist() if isinstance(names, np.ndarray) else str(names)
+
+def supervisor_pay(region: ArrayLike, title: ArrayLike):
+    # Avg total (£/year) by region and title; NaN where the region has no such title.
+    out = PAY_TABLE[region_codes(region), title_codes(title)]
+    return float(out) if np.ndim(out) == 0 else out
+
+def supervisor_pay_for_prison(prison: ArrayLike, title: ArrayLike):
+    out = PAY_TABLE[region_of(prison), title_codes(title)]
+    return float(out) if np.ndim(out) == 0 else out
@@ -0,0 +1,198 @@
+# tracing.py
+# Opt-in span timing for the pricing core, validation, exports and the UI sections of
+# Newapp.py. Off unless COSTING_TRACE is set when the process starts:
+#   COSTING_TRACE=1          wall time and call count per span
+#   COSTING_TRACE=memory     ... plus allocation sizes (tracemalloc). Everything runs
+#                            several times slower, so read timings from "1" runs.
+#   COSTING_TRACE_FILE=path  also append one JSON line per report
+# Disabled, `traced` hands back the undecorated function and `span`/`start` return
+# a shared no-op, so instrumented code pays nothing.
+#
+# Spans are collected per thread (a Streamlit script run owns its thread) into a
+# report: Newapp.py opens one per rerun with begin_run/end_run, and a span opened
+# with no report active (a fragment rerun, a widget callback, a library call) gets a
+# report of its own. Times are inclusive (total_ms) and exclusive of child spans
+# (self_ms); allocation is the peak traced memory above the span's start (peak_kb)
+# and what was still allocated when it ended (net_kb). tracemalloc is process-wide,
+# so concurrent sessions blur each other's memory figures.
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+_MODE = os.environ.get("COSTING_TRACE", "").strip().lower()
+ENABLED = _MODE not in ("", "0", "false", "no", "off")
+MEMORY = ENABLED and _MODE == "memory"
+OUT_PATH = os.environ.get("COSTING_TRACE_FILE", "") if ENABLED else ""
+
+_NOOP = nullcontext()
+_local = threading.local()
+_recent: "deque[Dict]" = deque(maxlen=50)   # finished reports, newest last (all sessions)
+_write_lock = threading.Lock()
+
+if MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# ---------- Reports ----------
+class _Report:
+    def __init__(self, label: str):
+        self.label = label
+        self.started = datetime.now(timezone.utc)
+        self.t0 = time.perf_counter()
+        self.stats: Dict[str, List[float]] = {}   # name -> [calls, total_s, self_s, max_s, peak_bytes, net_bytes]
+
+    def add(self, name: str, dt: float, self_dt: float, peak: int, net: int) -> None:
+        s = self.stats.get(name)
+        if s is None:
+            self.stats[name] = [1, dt, self_dt, dt, peak, net]
+        else:
+            s[0] += 1; s[1] += dt; s[2] += self_dt; s[5] += net
+            s[3] = max(s[3], dt); s[4] = max(s[4], peak)
+
+    def to_dict(self) -> Dict:
+        spans = [
+            {"name": name, "calls": int(c), "total_ms": round(t * 1e3, 3), "self_ms": round(own * 1e3, 3),
+             "max_ms": round(mx * 1e3, 3),
+             "peak_kb": round(pk / 1024, 1) if MEMORY else None, "net_kb": round(net / 1024, 1) if MEMORY else None}
+            for name, (c, t, own, mx, pk, net) in self.stats.items()
+        ]
+        spans.sort(key=lambda s: -s["total_ms"])
+        return {
+            "label": self.label,
+            "time": self.started.isoformat(timespec="milliseconds"),
+            "thread": threading.current_thread().name,
+            "wall_ms": round((time.perf_counter() - self.t0) * 1e3, 3),
+            "memory": MEMORY,
+            "spans": spans,
+        }
+
+def _stack() -> List["_Span"]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def begin_run(label: str) -> None:
+    # Start the report for one script run; anything left open by an aborted run is dropped
+    if ENABLED:
+        _local.stack = []
+        _local.report = _Report(label)
+
+def end_run() -> Optional[Dict]:
+    # Close the current report: kept in recent(), appended to OUT_PATH, and returned
+    report = getattr(_local, "report", None) if ENABLED else None
+    if report is None:
+        return None
+    _local.report = None
+    _local.stack = []
+    out = report.to_dict()
+    _recent.append(out)
+    if OUT_PATH:
+        with _write_lock, open(OUT_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(out) + "\n")
+    return out
+
+def current_report() -> Optional[Dict]:
+    report = getattr(_local, "report", None) if ENABLED else None
+    return report.to_dict() if report is not None else None
+
+def recent(n: int = 20) -> List[Dict]:
+    return list(_recent)[-n:]
+
+# ---------- Spans ----------
+class _Span:
+    __slots__ = ("name", "t0", "child_s", "mem0", "peak", "root")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        stack = _stack()
+        self.root = getattr(_local, "report", None) is None
+        if self.root:
+            _local.report = _Report(self.name)
+        if MEMORY:
+            cur, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.mem0 = self.peak = cur
+        self.child_s = 0.0
+        stack.append(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        dt = time.perf_counter() - self.t0
+        stack = _stack()
+        # pop through anything a failed start/stop pair left open above this span
+        while stack and stack.pop() is not self:
+            pass
+        if stack:
+            stack[-1].child_s += dt
+        peak = net = 0
+        if MEMORY:
+            cur, pk = tracemalloc.get_traced_memory()
+            top = max(self.peak, pk)
+            peak, net = top - self.mem0, cur - self.mem0
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, top)
+            tracemalloc.reset_peak()
+        report = getattr(_local, "report", None)
+        if report is not None:
+            report.add(self.name, dt, dt - self.child_s, peak, net)
+            if self.root:
+                end_run()
+        return False
+
+def span(name: str):
+    # `with tracing.span("widgets.items"): ...`
+    return _Span(name) if ENABLED else _NOOP
+
+def start(name: str) -> Optional[_Span]:
+    # For straight-line script sections that a `with` block would have to re-indent;
+    # pair with stop(token).
+    return _Span(name).__enter__() if ENABLED else None
+
+def stop(token: Optional[_Span]) -> None:
+    if token is not None:
+        token.__exit__(None, None, None)
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    # Decorator; the function itself is returned when tracing is off
+    def deco(fn: Callable) -> Callable:
+        if not ENABLED:
+            return fn
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+# ---------- Debug panel ----------
+def show_panel(report: Optional[Dict]) -> None:
+    # Streamlit expander with this run's spans and the latest reports (fragment reruns,
+    # callbacks) from every session in the process
+    if report is None:
+        return
+    import streamlit as st
+    with st.expander(f"Trace: {report['label']} · {report['wall_ms']:,.1f} ms", expanded=False):
+        cols = ["name", "calls", "total_ms", "self_ms", "max_ms"] + (["peak_kb", "net_kb"] if report["memory"] else [])
+        st.dataframe([{k: s[k] for k in cols} for s in report["spans"]], hide_index=True)
+        rows = [r for r in recent(11) if r is not report][-10:]
+        if rows:
+            st.caption("Latest reports in this process")
+            st.dataframe(
+                [{"time": r["time"][11:23], "label": r["label"], "wall_ms": r["wall_ms"],
+                  "slowest span": (r["spans"][0]["name"] if r["spans"] else "")} for r in reversed(rows)],
+                hide_index=True,
+            )
@@ -0,0 +1,173 @@
+# workdays.py
+# Working-day calendar: Mon–Fri minus England & Wales bank holidays and any
+# prison-specific closure days. A cumulative working-day index makes
+# "working days between" and "n-th working day" constant-time lookups.
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+
+# ---------- England & Wales bank holidays ----------
+# One-off days and moved fixed holidays (proclamations); keyed by year.
+_EXTRA_HOLIDAYS = {
+    1999: [date(1999, 12, 31)],                       # Millennium
+    2002: [date(2002, 6, 3)],                         # Golden Jubilee
+    2011: [date(2011, 4, 29)],                        # Royal wedding
+    2012: [date(2012, 6, 5)],                         # Diamond Jubilee
+    2022: [date(2022, 6, 3), date(2022, 9, 19)],      # Platinum Jubilee, State funeral
+    2023: [date(2023, 5, 8)],                         # Coronation
+}
+_MOVED_EARLY_MAY = {1995: date(1995, 5, 8), 2020: date(2020, 5, 8)}
+_MOVED_SPRING = {2002: date(2002, 6, 4), 2012: date(2012, 6, 4), 2022: date(2022, 6, 2)}
+
+def _easter_sunday(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = ((h + l - 7 * m + 114) % 31) + 1
+    return date(year, month, day)
+
+def _first_monday(year: int, month: int) -> date:
+    d = date(year, month, 1)
+    return d + timedelta(days=(7 - d.weekday()) % 7)
+
+def _last_monday(year: int, month: int) -> date:
+    nxt = date(year + (month == 12), month % 12 + 1, 1)
+    d = nxt - timedelta(days=1)
+    return d - timedelta(days=d.weekday())
+
+def bank_holidays(year: int) -> List[date]:
+    days = []
+    ny = date(year, 1, 1)
+    days.append(ny + timedelta(days={5: 2, 6: 1}.get(ny.weekday(), 0)))
+    easter = _easter_sunday(year)
+    days += [easter - timedelta(days=2), easter + timedelta(days=1)]
+    days.append(_MOVED_EARLY_MAY.get(year, _first_monday(year, 5)))
+    days.append(_MOVED_SPRING.get(year, _last_monday(year, 5)))
+    days.append(_last_monday(year, 8))
+    xmas, boxing = date(year, 12, 25), date(year, 12, 26)
+    if xmas.weekday() == 5:       # Sat: substitutes Mon 27 + Tue 28
+        days += [date(year, 12, 27), date(year, 12, 28)]
+    elif xmas.weekday() == 6:     # Sun: Boxing Day Mon 26 + substitute Tue 27
+        days += [boxing, date(year, 12, 27)]
+    elif boxing.weekday() == 5:   # Fri/Sat: substitute Mon 28
+        days += [xmas, date(year, 12, 28)]
+    else:
+        days += [xmas, boxing]
+    days += _EXTRA_HOLIDAYS.get(year, [])
+    return sorted(days)
+
+# ---------- Calendar ----------
+def _as_day_numbers(dates) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+class WorkingCalendar:
+    # Index covers [self._lo, self._hi) as day numbers since 1970-01-01 and grows on demand.
+    def __init__(self, closures: Iterable[date] = (), bank_holidays_on: bool = True, span_years=(2000, 2060)):
+        self.closures: Set[date] = set(closures)
+        self.bank_holidays_on = bool(bank_holidays_on)
+        self._lo = self._hi = 0
+        self._cum = np.zeros(1, dtype=np.int64)
+        self._pos = np.zeros(0, dtype=np.int64)
+        self._build(date(span_years[0], 1, 1), date(span_years[1], 12, 31))
+
+    def _build(self, first: date, last: date) -> None:
+        lo = int(_as_day_numbers(date(first.year, 1, 1)))
+        hi = int(_as_day_numbers(date(last.year, 12, 31))) + 1
+        days = np.arange(lo, hi, dtype=np.int64)
+        working = ((days + 3) % 7) < 5   # 1970-01-01 was a Thursday
+        off: List[date] = [d for d in self.closures if first.year <= d.year <= last.year]
+        if self.bank_holidays_on:
+            for y in range(first.year, last.year + 1):
+                off += bank_holidays(y)
+        if off:
+            working[_as_day_numbers(off) - lo] = False
+        self._lo, self._hi = lo, hi
+        # _cum[i] = working days in [lo, lo + i); _pos[k] = offset of the (k+1)-th working day
+        self._cum = np.concatenate(([0], np.cumsum(working, dtype=np.int64)))
+        self._pos = np.flatnonzero(working)
+
+    def _ensure(self, lo: int, hi: int) -> None:
+        if lo >= self._lo and hi < self._hi:
+            return
+        epoch = date(1970, 1, 1)
+        first = epoch + timedelta(days=int(min(lo, self._lo)))
+        last = epoch + timedelta(days=int(max(hi, self._hi - 1)))
+        self._build(first, last)
+
+    def is_working_day(self, d: date) -> bool:
+        n = int(_as_day_numbers(d))
+        self._ensure(n, n)
+        i = n - self._lo
+        return bool(self._cum[i + 1] - self._cum[i])
+
+    def working_days_between(self, start: date, end: date) -> int:
+        # Inclusive of both ends; 0 when end < start.
+        if end < start:
+            return 0
+        a, b = int(_as_day_numbers(start)), int(_as_day_numbers(end))
+        self._ensure(a, b)
+        return int(self._cum[b - self._lo + 1] - self._cum[a - self._lo])
+
+    def working_days_between_many(self, start, ends) -> np.ndarray:
+        # Vectorized form: one start (or array of starts) against an array of end dates.
+        a = _as_day_numbers(start)
+        b = _as_day_numbers(ends)
+        if b.size == 0:
+            return np.zeros(b.shape, dtype=np.int64)
+        self._ensure(int(np.min(a)), int(max(np.max(b), np.max(a))))
+        bb = np.maximum(b, a)
+        out = self._cum[bb - self._lo + 1] - self._cum[a - self._lo]
+        return np.where(b < a, 0, out)
+
+    def nth_working_day(self, start: date, n: int) -> date:
+        # Date of the n-th working day counting `start` itself as day 1 (n >= 1).
+        if n < 1:
+            raise ValueError("n must be >= 1")
+        a = int(_as_day_numbers(start))
+        self._ensure(a, a)
+        k = int(self._cum[a - self._lo]) + int(n) - 1
+        while k >= len(self._pos):
+            self._ensure(a, self._hi + 366 * max(1, (k - len(self._pos)) // 200 + 1))
+            k = int(self._cum[a - self._lo]) + int(n) - 1
+        return date(1970, 1, 1) + timedelta(days=int(self._pos[k]) + self._lo)
+
+    def nth_working_day_many(self, start: date, n) -> np.ndarray:
+        # Vectorized nth_working_day; returns datetime64[D]. n must be >= 1.
+        n = np.asarray(n, dtype=np.int64)
+        if n.size and n.min() < 1:
+            raise ValueError("n must be >= 1")
+        if n.size:
+            self.nth_working_day(start, int(n.max()))   # grows the index if needed
+        a = int(_as_day_numbers(start))
+        k = self._cum[a - self._lo] + n - 1
+        return (self._pos[k] + self._lo).astype("datetime64[D]")
+
+    def add_working_days(self, start: date, n: int) -> date:
+        # Date reached after n further working days (n = 0 returns start).
+        if n <= 0:
+            return start
+        nxt = start + timedelta(days=1)
+        return self.nth_working_day(nxt, n)
+
+# ---------- Prison closures ----------
+PRISON_CLOSURES: Dict[str, Set[date]] = {}
+_CALENDARS: Dict[Optional[str], WorkingCalendar] = {}
+
+def register_closures(prison: str, days: Iterable[date]) -> None:
+    PRISON_CLOSURES.setdefault(prison, set()).update(days)
+    _CALENDARS.pop(prison, None)
+
+def get_calendar(prison: Optional[str] = None) -> WorkingCalendar:
+    key = prison if prison in PRISON_CLOSURES else None
+    cal = _CALENDARS.get(key)
+    if cal is None:
+        cal = WorkingCalendar(PRISON_CLOSURES.get(key, ()))
+        _CALENDARS[key] = cal
+    return cal